@@ -50,6 +50,8 @@ MAIN_DIALOG = {
     "selection_inside": "Inside",
     "selection_outside": "Outside",
     "selection_intersect": "Intersect",
+    "selection_inside_exact": "Inside (exact)",
+    "selection_intersect_exact": "Intersect (exact)",
     "mode_join": "Union",
     "mode_replace": "Replace",
     "mode_subtract": "Subtract",
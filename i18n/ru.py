@@ -50,6 +50,8 @@ MAIN_DIALOG = {
     "selection_inside": "Внутри",
     "selection_outside": "Снаружи",
     "selection_intersect": "Пересечение",
+    "selection_inside_exact": "Внутри (точно)",
+    "selection_intersect_exact": "Пересечение (точно)",
     "mode_join": "Объединить",
     "mode_replace": "Заменить",
     "mode_subtract": "Вычесть",
@@ -0,0 +1,53 @@
+"""
+Замер памяти доменной модели открытого DXF-документа.
+
+Запуск из корня плагина:
+    python scripts/benchmark_memory.py [dxf_examples/ex3.dxf ...]
+
+Считается память, удерживаемая DXFDocument после DXFReader.open (tracemalloc),
+отдельно от исходного содержимого файла, которое хранится в DXFContent как есть.
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+
+PLUGIN_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PLUGIN_PATH not in sys.path:
+    sys.path.insert(0, PLUGIN_PATH)
+
+from src.infrastructure.ezdxf import DXFReader  # noqa: E402
+
+
+def measure(filepath: str) -> None:
+    # Прогрев: импорты и кэши ezdxf не должны попадать в замер
+    DXFReader().open(filepath)
+    gc.collect()
+
+    tracemalloc.start()
+    result = DXFReader().open(filepath)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if result.is_fail:
+        print(f"{filepath}: {result.error}")
+        return
+
+    document = result.value
+    entities = sum(len(layer.entities) for layer in document.layers.values())
+    content = len(document.content.content) if document.content else 0
+    model = retained - content
+
+    print(
+        f"{os.path.basename(filepath)}: entities={entities}, "
+        f"model={model / 1024 / 1024:.2f} MiB ({model / max(entities, 1):.0f} B/entity), "
+        f"file content={content / 1024 / 1024:.2f} MiB, peak={peak / 1024 / 1024:.2f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or [os.path.join(PLUGIN_PATH, "dxf_examples", "ex3.dxf")]
+    for path in paths:
+        measure(path)
@@ -194,6 +194,23 @@ class DBSession:
             return AppResult.success(result.value)
         return AppResult.fail(result.error)
 
+    def drop_tables(self, tables: list[tuple[str, str]]) -> AppResult[Unit]:
+        """Удаляет таблицы (схема, таблица) одним запросом в текущей транзакции."""
+        if not self.is_connected:
+            return AppResult.fail("Connection failed")
+
+        if not tables:
+            return AppResult.success(Unit())
+
+        def quote(name: str) -> str:
+            return '"' + str(name).replace('"', '""') + '"'
+
+        targets = ", ".join(f"{quote(schema)}.{quote(table)}" for schema, table in tables)
+        result = self._connection.execute_query(f"DROP TABLE IF EXISTS {targets}")
+        if result.is_fail:
+            return AppResult.fail(f"Failed to drop tables: {result.error}")
+        return AppResult.success(Unit())
+
     def _quote_identifier(self, name: str) -> str:
         if not isinstance(name, str) or not name.strip():
             raise ValueError("Identifier is empty")
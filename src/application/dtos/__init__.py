@@ -9,6 +9,8 @@ from .dxf_layer_dto import DXFLayerDTO
 from .dxf_document_dto import DXFDocumentDTO
 from .connection_config_dto import ConnectionConfigDTO
 from .area_selection_request_dto import AreaSelectionRequestDTO
+from .document_change_set_dto import DocumentChangeSetDTO
+from .preview_render_options_dto import PreviewRenderOptionsDTO
 from ...domain.value_objects import SelectionMode, SelectionRule, ShapeType
 
 __all__ = [
@@ -23,6 +25,8 @@ __all__ = [
     'DXFDocumentDTO',
     'ConnectionConfigDTO',
     'AreaSelectionRequestDTO',
+    'DocumentChangeSetDTO',
+    'PreviewRenderOptionsDTO',
     'SelectionMode',
     'SelectionRule',
     'ShapeType'
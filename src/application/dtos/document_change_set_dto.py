@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable
+from uuid import UUID
+
+
+@dataclass(frozen=True)
+class DocumentChangeSetDTO:
+    """Изменения одного документа для инкрементального обновления подписчиков.
+
+    added_ids/removed_ids — структурные изменения (открытие/закрытие документа),
+    selection_changed_ids — объекты, у которых действительно изменился флаг выбора.
+    version растет с каждым изменением документа, что позволяет отбрасывать устаревшие наборы.
+    """
+
+    document_id: UUID
+    filename: str
+    version: int
+    added_ids: tuple[UUID, ...] = ()
+    removed_ids: tuple[UUID, ...] = ()
+    selection_changed_ids: tuple[UUID, ...] = ()
+
+    @property
+    def is_structural(self) -> bool:
+        return bool(self.added_ids or self.removed_ids)
+
+    @classmethod
+    def merge_all(cls, change_sets: Iterable[DocumentChangeSetDTO]) -> list[DocumentChangeSetDTO]:
+        """
+        Объединяет наборы изменений по документам: id без повторов, версия - последняя.
+
+        Добавленный и затем удаленный id попадает только в removed_ids, удаленный и
+        затем добавленный - только в added_ids.
+        """
+        merged: dict[UUID, DocumentChangeSetDTO] = {}
+        for change_set in change_sets:
+            previous = merged.get(change_set.document_id)
+            if previous is None:
+                merged[change_set.document_id] = change_set
+                continue
+            merged[change_set.document_id] = cls(
+                document_id=change_set.document_id,
+                filename=change_set.filename,
+                version=max(previous.version, change_set.version),
+                added_ids=_union(_without(previous.added_ids, change_set.removed_ids), change_set.added_ids),
+                removed_ids=_union(_without(previous.removed_ids, change_set.added_ids), change_set.removed_ids),
+                selection_changed_ids=_union(previous.selection_changed_ids, change_set.selection_changed_ids),
+            )
+        return list(merged.values())
+
+
+def _union(first: tuple[UUID, ...], second: tuple[UUID, ...]) -> tuple[UUID, ...]:
+    return tuple(dict.fromkeys(first + second))
+
+
+def _without(ids: tuple[UUID, ...], excluded: tuple[UUID, ...]) -> tuple[UUID, ...]:
+    return tuple(id for id in ids if id not in excluded)
@@ -9,3 +9,18 @@ class DXFDocumentDTO(DXFBaseDTO):
     filename: str
     filepath: str
     layers: List[DXFLayerDTO]
+
+    @property
+    def selected_layers_count(self) -> int:
+        """Число выбранных слоев"""
+        return sum(1 for layer in self.layers if layer.selected)
+
+    @property
+    def entities_count(self) -> int:
+        """Число сущностей во всех слоях"""
+        return sum(len(layer.entities) for layer in self.layers)
+
+    @property
+    def selected_entities_count(self) -> int:
+        """Число выбранных сущностей во всех слоях"""
+        return sum(layer.selected_count for layer in self.layers)
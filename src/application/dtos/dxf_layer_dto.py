@@ -7,3 +7,8 @@ from ...application.dtos import DXFBaseDTO, DXFEntityDTO
 class DXFLayerDTO(DXFBaseDTO):
     name: str
     entities: List[DXFEntityDTO]
+
+    @property
+    def selected_count(self) -> int:
+        """Число выбранных сущностей слоя"""
+        return sum(1 for entity in self.entities if entity.selected)
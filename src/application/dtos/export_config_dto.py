@@ -1,26 +1,57 @@
-
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from ...application.dtos import ExportMode
 
 @dataclass
 class ExportConfigDTO:
     """Конфигурация экспорта PostGIS → DXF."""
-    
+
     # Имя файла в БД
     filename: str = ''
-    
+
     # Место назначения: "file" или "qgis"
     export_mode: ExportMode = ExportMode.FILE
-    
+
     # Путь для сохранения
     output_path: str = ''
-    
+
     # Схема файлов
     file_schema: str = 'file_schema'
-    
+
+    # Фильтр по области (только для TABLES): (min_x, min_y, max_x, max_y)
+    extent_bbox: tuple[float, float, float, float] | None = None
+
+    # Фильтр по области в виде WKT-полигона (приоритетнее extent_bbox)
+    extent_wkt: str = ''
+
+    # SRID области фильтра; область переводится в SRID геометрий таблиц слоев (0 - координаты таблиц)
+    extent_srid: int = 0
+
+    # Фильтр по типам сущностей (например, ['LINE', 'LWPOLYLINE'])
+    entity_types: list[str] = field(default_factory=list)
+
+    # Фильтр по именам слоев
+    layer_names: list[str] = field(default_factory=list)
+
     @property
     def is_valid(self) -> bool:
         return (
             (self.export_mode == ExportMode.FILE and self.filename) or
             self.export_mode == ExportMode.QGIS
         )
+
+    @property
+    def extent_filter_wkt(self) -> str | None:
+        """WKT области фильтра или None, если область не задана"""
+        if self.extent_wkt:
+            return self.extent_wkt
+        if self.extent_bbox is None:
+            return None
+        min_x, min_y, max_x, max_y = self.extent_bbox
+        return (
+            f"POLYGON(({min_x} {min_y}, {max_x} {min_y}, {max_x} {max_y}, "
+            f"{min_x} {max_y}, {min_x} {min_y}))"
+        )
+
+    @property
+    def has_filters(self) -> bool:
+        return bool(self.extent_filter_wkt or self.entity_types or self.layer_names)
@@ -0,0 +1,26 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PreviewRenderOptionsDTO:
+    """Параметры растрового превью DXF."""
+
+    # Размер большей стороны изображения в пикселях
+    size_px: int = 2048
+
+    # Не рисовать TEXT/MTEXT/атрибуты
+    skip_text: bool = False
+
+    # Рисовать только контуры штриховок вместо узоров
+    skip_hatch_patterns: bool = True
+
+    # Бюджет времени отрисовки в секундах; оставшиеся сущности пропускаются
+    time_budget_s: float = 10.0
+
+    @property
+    def settings_key(self) -> str:
+        """Строка параметров для ключа кэша превью"""
+        return (
+            f"png/{self.size_px}/text={int(not self.skip_text)}"
+            f"/hatch={int(not self.skip_hatch_patterns)}/budget={self.time_budget_s:g}"
+        )
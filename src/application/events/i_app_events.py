@@ -1,7 +1,7 @@
 
 from uuid import UUID
 from ...application.events import IEvent
-from ...application.dtos import DXFDocumentDTO
+from ...application.dtos import DXFDocumentDTO, DocumentChangeSetDTO
 from abc import ABC, abstractmethod
 
 class IAppEvents(ABC):
@@ -26,6 +26,12 @@ class IAppEvents(ABC):
     def on_document_modified(self) -> IEvent[list[DXFDocumentDTO]]:
         pass
 
+    @property
+    @abstractmethod
+    def on_document_changes(self) -> IEvent[list[DocumentChangeSetDTO]]:
+        """Дельта изменений документов (добавленные, удаленные, изменившие выбор объекты)"""
+        pass
+
     @property
     @abstractmethod
     def on_language_changed(self) -> IEvent[str]:
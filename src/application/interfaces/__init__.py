@@ -4,11 +4,13 @@ from .i_logger import ILogger
 from .i_settings import ISettings
 from .i_dxf_preview_reader import IDXFPreviewReader
 from .i_qgis_connection_provider import IQgisConnectionProvider
+from .i_file_cache import IFileCache
 
 __all__ = [
     'ILocalization',
     'ILogger',
     'ISettings',
     'IDXFPreviewReader',
-    'IQgisConnectionProvider'
+    'IQgisConnectionProvider',
+    'IFileCache'
 ]
@@ -2,16 +2,34 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 
+from ...application.dtos import PreviewRenderOptionsDTO
+
 
 class IDXFPreviewReader(ABC):
-    """Прикладной контракт генерации SVG-превью DXF."""
+    """Прикладной контракт генерации превью DXF (SVG и PNG)."""
+
+    @abstractmethod
+    def render_svg_preview(
+        self,
+        filepath: str,
+        selected_handles: set[str] | None = None,
+        content: bytes | None = None,
+    ):
+        """
+        Возвращает объект результата с полями is_fail/error/value; value - текст SVG.
+
+        Открытый файл рисуется по уже разобранному документу; content - содержимое DXF
+        на случай, если файла нет среди открытых. selected_handles ограничивает модель.
+        """
+        pass
 
     @abstractmethod
-    def save_svg_preview(
+    def render_png_preview(
         self,
         filepath: str,
-        output_dir: str,
-        filename: str = "",
+        options: PreviewRenderOptionsDTO,
+        selected_handles: set[str] | None = None,
+        content: bytes | None = None,
     ):
-        """Возвращает объект результата с полями is_fail/error/value."""
+        """Растровое превью с уровнем детализации; value - байты PNG."""
         pass
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+
+
+class IFileCache(ABC):
+    """Прикладной контракт файлового кэша результатов (ключ -> файл на диске)."""
+
+    @abstractmethod
+    def get_path(self, key: str) -> str | None:
+        """Путь к закэшированному файлу или None, если записи нет."""
+        pass
+
+    @abstractmethod
+    def put(self, key: str, content: bytes) -> str | None:
+        """Сохраняет содержимое под ключом и возвращает путь к файлу."""
+        pass
+
+    @abstractmethod
+    def put_file(self, key: str, source_path: str) -> str | None:
+        """Копирует готовый файл в кэш под ключом, не читая его в память."""
+        pass
+
+    @abstractmethod
+    def copy_to(self, key: str, destination: str) -> bool:
+        """Копирует закэшированный файл в destination. False, если записи нет."""
+        pass
+
+    @abstractmethod
+    def remove(self, key: str) -> bool:
+        """Удаляет запись. False, если записи не было."""
+        pass
@@ -1,6 +1,10 @@
-
+from .dxf_views import DXFViewSequence, DXFDocumentView, DXFLayerView, DXFEntityView
 from .dxf_mapper import DXFMapper
 
 __all__ = [
-    'DXFMapper'
+    'DXFMapper',
+    'DXFViewSequence',
+    'DXFDocumentView',
+    'DXFLayerView',
+    'DXFEntityView'
 ]
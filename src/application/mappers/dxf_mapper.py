@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from ...domain.entities import DXFBase, DXFDocument, DXFLayer, DXFEntity
-from ...application.dtos import DXFBaseDTO, DXFDocumentDTO, DXFLayerDTO, DXFEntityDTO
+from ...application.dtos import DXFBaseDTO
+from .dxf_views import DXFDocumentView, DXFLayerView, DXFEntityView
 
 class DXFMapper:
     
@@ -13,31 +14,19 @@ class DXFMapper:
     
     @classmethod
     def _single_to_dto(cls, obj: DXFBase) -> DXFBaseDTO:
-        """Преобразование одного объекта в DTO"""
+        """
+        Представление одного объекта.
+
+        Возвращается ленивое read-only представление поверх доменного объекта:
+        дерево слоев и сущностей не копируется, DTO создаются только для
+        тех элементов, к которым обращается UI.
+        """
         
         if isinstance(obj, DXFDocument):
-            return DXFDocumentDTO(
-                id=obj.id,
-                selected=obj.is_selected,
-                filename=obj.filename,
-                filepath=obj.filepath,
-                layers=cls.to_dto(list(obj.layers.values()))
-            )
+            return DXFDocumentView(obj)
         elif isinstance(obj, DXFLayer):
-            return DXFLayerDTO(
-                id=obj.id,
-                selected=obj.is_selected,
-                name=obj.name,
-                entities=cls.to_dto(list(obj.entities.values()))
-            )
+            return DXFLayerView(obj)
         elif isinstance(obj, DXFEntity):
-            return DXFEntityDTO(
-                id=obj.id,
-                selected=obj.is_selected,
-                name=obj.name,
-                typename=obj.entity_type.value,
-                attributes=obj.attributes,
-                geometries=obj.geometries
-            )
+            return DXFEntityView(obj)
         else:
             raise ValueError(f"Unknown entity type: {type(obj)}")
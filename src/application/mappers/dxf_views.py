@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from types import MappingProxyType
+from typing import Any, Callable, Mapping
+from uuid import UUID
+
+from ...domain.entities import DXFDocument, DXFLayer, DXFEntity
+from ...application.dtos import DXFDocumentDTO, DXFLayerDTO, DXFEntityDTO
+
+
+class DXFViewSequence(Sequence):
+    """
+    Ленивая последовательность представлений поверх упорядоченного списка доменных объектов.
+
+    Представление создается только для элемента, к которому обратились;
+    доступ по индексу идет напрямую в список модели, без копирования.
+    """
+
+    __slots__ = ('_source', '_factory')
+
+    def __init__(self, source: Sequence[Any], factory: Callable[[Any], Any]):
+        self._source = source
+        self._factory = factory
+
+    def __len__(self) -> int:
+        return len(self._source)
+
+    def __iter__(self):
+        factory = self._factory
+        for obj in self._source:
+            yield factory(obj)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._factory(obj) for obj in self._source[index]]
+        return self._factory(self._source[index])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Sequence):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(len={len(self)})"
+
+
+class DXFEntityView(DXFEntityDTO):
+    """Read-only представление сущности: поля читаются из доменного объекта при обращении."""
+
+    __slots__ = ('_obj',)
+
+    def __init__(self, obj: DXFEntity):
+        self._obj = obj
+
+    @property
+    def id(self) -> UUID:
+        return self._obj.id
+
+    @property
+    def selected(self) -> bool:
+        return self._obj.is_selected
+
+    @property
+    def name(self) -> str:
+        return self._obj.name
+
+    @property
+    def typename(self) -> str:
+        return self._obj.entity_type.value
+
+    @property
+    def attributes(self) -> Mapping[str, Any]:
+        return MappingProxyType(self._obj.attributes)
+
+    @property
+    def geometries(self) -> Mapping[str, Any]:
+        return MappingProxyType(self._obj.geometries)
+
+
+class DXFLayerView(DXFLayerDTO):
+    """Read-only представление слоя; сущности отдаются ленивой последовательностью."""
+
+    __slots__ = ('_obj', '_entities')
+
+    def __init__(self, obj: DXFLayer):
+        self._obj = obj
+        self._entities: DXFViewSequence | None = None
+
+    @property
+    def id(self) -> UUID:
+        return self._obj.id
+
+    @property
+    def selected(self) -> bool:
+        return self._obj.is_selected
+
+    @property
+    def name(self) -> str:
+        return self._obj.name
+
+    @property
+    def entities(self) -> DXFViewSequence:
+        # Последовательность смотрит в живой список слоя, поэтому создается один раз на представление
+        if self._entities is None:
+            self._entities = DXFViewSequence(self._obj.entity_list, DXFEntityView)
+        return self._entities
+
+    @property
+    def selected_count(self) -> int:
+        return self._obj.selected_count
+
+
+class DXFDocumentView(DXFDocumentDTO):
+    """Read-only представление документа; слои отдаются ленивой последовательностью."""
+
+    __slots__ = ('_obj', '_layers')
+
+    def __init__(self, obj: DXFDocument):
+        self._obj = obj
+        self._layers: DXFViewSequence | None = None
+
+    @property
+    def id(self) -> UUID:
+        return self._obj.id
+
+    @property
+    def selected(self) -> bool:
+        return self._obj.is_selected
+
+    @property
+    def filename(self) -> str:
+        return self._obj.filename
+
+    @property
+    def filepath(self) -> str:
+        return self._obj.filepath
+
+    @property
+    def layers(self) -> DXFViewSequence:
+        if self._layers is None:
+            self._layers = DXFViewSequence(self._obj.layer_list, DXFLayerView)
+        return self._layers
+
+    @property
+    def selected_layers_count(self) -> int:
+        return self._obj.selected_layers_count
+
+    @property
+    def entities_count(self) -> int:
+        return self._obj.entities_count
+
+    @property
+    def selected_entities_count(self) -> int:
+        return self._obj.selected_entities_count
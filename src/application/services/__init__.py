@@ -1,9 +1,11 @@
 
 from .active_document_service import ActiveDocumentService
 from .connection_config_service import ConnectionConfigService
+from .preview_cache_service import PreviewCacheService
 
 __all__ = [
     'ActiveDocumentService',
-    'ConnectionConfigService'
+    'ConnectionConfigService',
+    'PreviewCacheService'
 ]
 
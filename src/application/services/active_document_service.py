@@ -33,34 +33,16 @@ class ActiveDocumentService:
     
     def _get_document_by_filename(self, filename: str) -> DXFDocument | None:
         """Получить domain entity документа по названию файла"""
-        for doc in self._documents:
-            if doc.filename == filename:
-                return doc
-        return None
+        result = self._active_repo.get_by_filename(filename)
+        return result.value if result.is_success else None
     
     def _get_by_id(self, id: UUID) -> DXFBase | None:
-        
-        result = self._active_repo.get_all()
-
-        if result.is_success:
-
-            for document in result.value:
-                if document.id == id:
-                    return document
-
-                if document.content.id == id:
-                    return document.content
-
-                if id in document.layers:
-                    return document.layers[id]
-
-                for layer in document.layers.values():
-                    if id in layer.entities:
-                        return layer.entities[id]
-        
-        else:
-            self._logger.error(f"Failed to get all active documents: {result.error}")
+        result = self._active_repo.find_object(id)
+        if result.is_fail:
             return None
+
+        _, _, entity = result.value
+        return entity
         
     def get_by_id(self, id: UUID) -> DXFBaseDTO | None:
         entity = self._get_by_id(id)
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import hashlib
+import os
+
+from ...application.dtos import ConnectionConfigDTO, PreviewRenderOptionsDTO
+from ...application.interfaces import IDXFPreviewReader, IFileCache, ILogger
+from ...application.results import AppResult
+
+
+class PreviewCacheService:
+    """
+    Превью DXF в дисковом кэше с адресацией по содержимому.
+
+    Ключ превью - sha256 содержимого DXF и версия настроек отрисовки: файлы с одинаковым
+    именем, но разным содержимым, не пересекаются, а измененный файл получает новое превью.
+    Ограничение объема, LRU-вытеснение и атомарную запись обеспечивает IFileCache.
+    Документ в БД связывается с превью короткой ссылкой (подключение, схема, имя файла ->
+    хэш и размер содержимого), чтобы список файлов БД находил превью без загрузки контента.
+
+    Небольшие файлы получают SVG-превью, файлы больше svg_max_bytes - растровое PNG
+    с уровнем детализации: SVG плотных чертежей занимает сотни мегабайт и не
+    открывается QSvgRenderer. Формат определяется размером содержимого.
+    """
+
+    # Меняется вместе с параметрами отрисовки SVG, чтобы старые превью не находились по ключу
+    RENDER_SETTINGS = "ezdxf-svg/modelspace/page-auto/v1"
+
+    # DXF больше этого размера получают растровое превью
+    SVG_MAX_BYTES = 8 * 1024 * 1024
+
+    # Размер блока чтения файла при подсчете хэша
+    HASH_CHUNK_BYTES = 1024 * 1024
+
+    def __init__(
+        self,
+        previews: IFileCache,
+        raster_previews: IFileCache,
+        links: IFileCache,
+        thumbnails: IFileCache,
+        preview_reader: IDXFPreviewReader,
+        logger: ILogger,
+        raster_options: PreviewRenderOptionsDTO | None = None,
+        svg_max_bytes: int = SVG_MAX_BYTES,
+        render_settings: str = RENDER_SETTINGS,
+    ):
+        self._previews = previews
+        self._raster_previews = raster_previews
+        self._links = links
+        self._thumbnails = thumbnails
+        self._preview_reader = preview_reader
+        self._logger = logger
+        self._raster_options = raster_options or PreviewRenderOptionsDTO()
+        self._svg_max_bytes = svg_max_bytes
+        self._render_settings = render_settings
+
+    @property
+    def thumbnails(self) -> IFileCache:
+        """Кэш растровых миниатюр превью (ключ строится от имени SVG в кэше)."""
+        return self._thumbnails
+
+    def get_preview(self, content: bytes) -> str | None:
+        """Путь к готовому превью для содержимого DXF или None."""
+        return self._cache_for(len(content)).get_path(self._preview_key(self._digest(content), len(content)))
+
+    def get_or_render(
+        self,
+        content: bytes,
+        source_path: str = "",
+        selected_handles: set[str] | None = None,
+    ) -> AppResult[str]:
+        """
+        Возвращает путь к превью, при промахе отрисовывает и кладет его в кэш.
+
+        source_path - открытый файл, из которого получено содержимое: превью рисуется
+        по его разобранному документу, ограниченному selected_handles. Если файл не открыт,
+        разбирается сам content, без записи на диск.
+        """
+        if not content:
+            return AppResult.fail("Empty DXF content")
+        return self._get_or_render(self._digest(content), len(content), source_path, selected_handles, content)
+
+    def get_or_render_file(
+        self,
+        filepath: str,
+        selected_handles: set[str] | None = None,
+    ) -> AppResult[str]:
+        """Превью файла DXF на диске: хэш считается чтением файла по блокам, рисуется открытый документ."""
+        try:
+            content_size = os.path.getsize(filepath)
+            digest = self._file_digest(filepath)
+        except OSError as exc:
+            return AppResult.fail(f"Failed to read DXF file '{filepath}': {exc}")
+        if not content_size:
+            return AppResult.fail("Empty DXF content")
+        return self._get_or_render(digest, content_size, filepath, selected_handles)
+
+    def _get_or_render(
+        self,
+        digest: str,
+        content_size: int,
+        source_path: str,
+        selected_handles: set[str] | None,
+        content: bytes | None = None,
+    ) -> AppResult[str]:
+        is_raster = self._is_raster(content_size)
+        cache = self._cache_for(content_size)
+        key = self._preview_key(digest, content_size)
+        cached_path = cache.get_path(key)
+        if cached_path:
+            return AppResult.success(cached_path)
+
+        try:
+            if is_raster:
+                render_result = self._preview_reader.render_png_preview(
+                    source_path, self._raster_options, selected_handles, content
+                )
+            else:
+                render_result = self._preview_reader.render_svg_preview(source_path, selected_handles, content)
+            if render_result.is_fail:
+                return AppResult.fail(render_result.error)
+
+            data = render_result.value if is_raster else render_result.value.encode("utf-8")
+            preview_path = cache.put(key, data)
+            if preview_path is None:
+                return AppResult.fail("Failed to write preview to cache")
+            return AppResult.success(preview_path)
+        except Exception as exc:
+            self._logger.error(f"Failed to build preview: {exc}")
+            return AppResult.fail(str(exc))
+
+    def link_document(
+        self,
+        connection: ConnectionConfigDTO,
+        file_schema: str,
+        filename: str,
+        content: bytes,
+    ) -> None:
+        """Запоминает, какому содержимому соответствует документ в БД."""
+        link = f"{self._digest(content)}\n{len(content)}"
+        self._links.put(self._link_key(connection, file_schema, filename), link.encode("utf-8"))
+
+    def find_document_preview(
+        self,
+        connection: ConnectionConfigDTO,
+        file_schema: str,
+        filename: str,
+        content_size: int | None = None,
+    ) -> str | None:
+        """
+        Путь к превью документа из БД или None.
+
+        content_size - текущий размер контента в БД: если он не совпадает с размером
+        на момент связывания, документ был изменен и превью считается отсутствующим.
+        """
+        link_path = self._links.get_path(self._link_key(connection, file_schema, filename))
+        if not link_path:
+            return None
+
+        try:
+            with open(link_path, "rt", encoding="utf-8") as link_file:
+                digest, _, size = link_file.read().partition("\n")
+        except OSError:
+            return None
+
+        try:
+            linked_size = int(size)
+        except ValueError:
+            return None
+        if content_size is not None and linked_size != content_size:
+            return None
+        return self._cache_for(linked_size).get_path(self._preview_key(digest.strip(), linked_size))
+
+    def unlink_document(self, connection: ConnectionConfigDTO, file_schema: str, filename: str) -> None:
+        """Забывает ссылку документа; само превью остается в кэше до вытеснения."""
+        self._links.remove(self._link_key(connection, file_schema, filename))
+
+    def _digest(self, content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def _file_digest(self, filepath: str) -> str:
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as source_file:
+            for chunk in iter(lambda: source_file.read(self.HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _is_raster(self, content_size: int) -> bool:
+        return content_size > self._svg_max_bytes
+
+    def _cache_for(self, content_size: int) -> IFileCache:
+        return self._raster_previews if self._is_raster(content_size) else self._previews
+
+    def _preview_key(self, digest: str, content_size: int) -> str:
+        if self._is_raster(content_size):
+            return f"{digest}|{self._raster_options.settings_key}"
+        return f"{digest}|{self._render_settings}"
+
+    def _link_key(self, connection: ConnectionConfigDTO, file_schema: str, filename: str) -> str:
+        return "|".join([
+            connection.db_type,
+            f"{connection.host}:{connection.port}",
+            connection.database,
+            file_schema,
+            filename,
+        ])
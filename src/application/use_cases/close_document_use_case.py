@@ -1,21 +1,47 @@
+from __future__ import annotations
+
 
 from uuid import UUID
 from ...domain.repositories import IActiveDocumentRepository
-from ...domain.services import IDXFWriter
+from ...domain.services import IDXFReader, IAreaSelector
+from ...application.dtos import DocumentChangeSetDTO
 from ...application.results import AppResult, Unit
 from ...application.events import IAppEvents
 
 class CloseDocumentUseCase:
     """Вариант использования: Закрыть DXF файл"""
 
-    def __init__(self, active_repo: IActiveDocumentRepository, dxf_writer: IDXFWriter, app_events: IAppEvents):
+    def __init__(
+        self,
+        active_repo: IActiveDocumentRepository,
+        dxf_reader: IDXFReader,
+        app_events: IAppEvents,
+        area_selector: IAreaSelector | None = None
+    ):
         self._active_repo = active_repo
-        self._dxf_writer = dxf_writer
+        self._dxf_reader = dxf_reader
         self._app_events = app_events
+        self._area_selector = area_selector
     
     def execute(self, document_id: UUID) -> AppResult[Unit]:
+        doc_result = self._active_repo.get_by_id(document_id)
         result = self._active_repo.remove(document_id)
         if result.is_success:
+            document = doc_result.value if doc_result.is_success else None
+            # Пространственный индекс и разобранный документ больше не нужны
+            if document and document.filepath:
+                self._dxf_reader.release(document.filepath)
+                if self._area_selector:
+                    self._area_selector.invalidate(document.filepath)
             self._app_events.on_document_closed.emit(document_id)
+            if document:
+                self._app_events.on_document_changes.emit([
+                    DocumentChangeSetDTO(
+                        document_id=document_id,
+                        filename=document.filename,
+                        version=document.bump_version(),
+                        removed_ids=(document_id,),
+                    )
+                ])
             return AppResult.success(Unit())
         return AppResult.fail(result.error)
\ No newline at end of file
@@ -1,22 +1,21 @@
 from __future__ import annotations
 
 import inject
-import os
 import re
-import tempfile
 
 from ...application.database import DBSession
 from ...application.dtos import ConnectionConfigDTO
 from ...application.interfaces import ILogger
+from ...application.services import PreviewCacheService
 from ...application.results import AppResult
-from ...domain.services import IDXFReader
 
 
 class DataViewerUseCase:
 	"""Вариант использования: чтение схем и DXF-файлов из БД."""
 
-	def __init__(self, logger: ILogger):
+	def __init__(self, logger: ILogger, preview_cache: PreviewCacheService | None = None):
 		self._logger = logger
+		self._preview_cache = preview_cache
 
 	def get_schemas(self, connection: ConnectionConfigDTO) -> AppResult[list[str]]:
 		"""Возвращает список схем для выбранного подключения."""
@@ -87,14 +86,24 @@ class DataViewerUseCase:
 		self,
 		connection: ConnectionConfigDTO,
 		file_schema: str,
+		after_filename: str | None = None,
+		limit: int | None = None,
 	) -> AppResult[list[dict]]:
-		"""Возвращает документы с базовой мета-информацией для UI экспорта."""
+		"""
+		Возвращает документы с мета-информацией (даты, размер, число слоев) для UI экспорта.
+
+		Все данные собираются одним запросом. Для постраничной загрузки используется
+		keyset-пагинация: after_filename — последнее имя предыдущей страницы, limit — размер страницы.
+		"""
 		if not connection:
 			return AppResult.fail("No connection")
 
 		if not file_schema:
 			return AppResult.fail("No file schema")
 
+		if limit is not None and limit <= 0:
+			return AppResult.fail("Page limit must be positive")
+
 		session = inject.instance(DBSession)
 
 		try:
@@ -109,40 +118,108 @@ class DataViewerUseCase:
 			if not schema_result.value:
 				return AppResult.success([])
 
-			doc_repo_result = session._get_document_repository(file_schema)
-			if doc_repo_result.is_fail:
-				return AppResult.fail(doc_repo_result.error)
+			query_result = self._build_documents_query(session, file_schema, after_filename, limit)
+			if query_result.is_fail:
+				return AppResult.fail(query_result.error)
 
-			docs_result = doc_repo_result.value.get_all()
-			if docs_result.is_fail:
-				return AppResult.fail(docs_result.error)
+			query, params = query_result.value
+			rows_result = session.execute_read_query(query, params)
+			if rows_result.is_fail:
+				return AppResult.fail(rows_result.error)
 
-			documents = sorted(
-				[
-					{
-						"id": doc.id,
-						"filename": doc.filename,
-						"upload_date": doc.upload_date,
-						"update_date": doc.update_date,
-					}
-					for doc in docs_result.value
-				],
-				key=lambda d: d["filename"],
-			)
-			return AppResult.success(documents)
+			return AppResult.success([self._to_document_meta(row) for row in rows_result.value])
 		except Exception as exc:
 			self._logger.error(f"Failed to load document metadata from '{file_schema}': {exc}")
 			return AppResult.fail(str(exc))
 		finally:
 			session.close()
 
+	def _to_document_meta(self, row: dict) -> dict:
+		return {
+			"id": row.get("id"),
+			"filename": row.get("filename"),
+			"upload_date": row.get("upload_date"),
+			"update_date": row.get("update_date"),
+			"file_size": int(row.get("file_size") or 0),
+			"layer_count": int(row.get("layer_count") or 0),
+		}
+
+	def _build_documents_query(
+		self,
+		session: DBSession,
+		file_schema: str,
+		after_filename: str | None,
+		limit: int | None,
+		filename: str | None = None,
+	) -> AppResult[tuple[str, tuple]]:
+		"""Собирает запрос метаданных документов с размером контента и числом слоев."""
+		doc_repo_result = session._get_document_repository(file_schema)
+		if doc_repo_result.is_fail:
+			return AppResult.fail(doc_repo_result.error)
+
+		schema_sql = self._quote_identifier(file_schema)
+		doc_sql = f"{schema_sql}.{self._quote_identifier(doc_repo_result.value.table_name)}"
+
+		size_sql = "0"
+		content_repo_result = session._get_content_repository(file_schema)
+		if content_repo_result.is_success:
+			content_table = content_repo_result.value.table_name
+			columns_result = session.get_table_columns(file_schema, content_table)
+			if columns_result.is_success:
+				columns = set(columns_result.value)
+				content_sql = f"{schema_sql}.{self._quote_identifier(content_table)}"
+				if {"document_id", "content"}.issubset(columns):
+					size_sql = (
+						f"(SELECT OCTET_LENGTH(c.content) FROM {content_sql} c "
+						f"WHERE c.document_id = d.id LIMIT 1)"
+					)
+				elif {"id", "file_content"}.issubset(columns):
+					size_sql = (
+						f"(SELECT OCTET_LENGTH(c.file_content) FROM {content_sql} c "
+						f"WHERE c.id = d.id LIMIT 1)"
+					)
+
+		layers_sql = "0"
+		layer_repo_result = session._get_layer_repository(file_schema)
+		if layer_repo_result.is_success:
+			layer_table = layer_repo_result.value.table_name
+			layers_sql = (
+				f"(SELECT COUNT(*) FROM {schema_sql}.{self._quote_identifier(layer_table)} l "
+				f"WHERE l.document_id = d.id)"
+			)
+
+		query = (
+			f"SELECT d.id, d.filename, d.upload_date, d.update_date, "
+			f"{size_sql} AS file_size, {layers_sql} AS layer_count "
+			f"FROM {doc_sql} d"
+		)
+		params: list = []
+		if filename is not None:
+			query += " WHERE d.filename = %s"
+			params.append(filename)
+		elif after_filename is not None:
+			query += " WHERE d.filename > %s"
+			params.append(after_filename)
+		query += " ORDER BY d.filename"
+		if limit is not None:
+			query += " LIMIT %s"
+			params.append(int(limit))
+
+		return AppResult.success((query, tuple(params)))
+
 	def delete_document_by_filename(
 		self,
 		connection: ConnectionConfigDTO,
 		file_schema: str,
 		filename: str,
 	) -> AppResult[bool]:
-		"""Удаляет документ и связанные записи контента/слоёв из схемы хранения."""
+		"""
+		Удаляет документ, связанные записи контента/слоёв и таблицы слоев документа.
+
+		Документ удаляется одним запросом DELETE ... RETURNING: контент и записи слоев
+		удаляются каскадно (FK ON DELETE CASCADE), затем таблицы слоев удаляются одним DROP.
+		Все изменения выполняются в одной транзакции.
+		"""
 		if not connection:
 			return AppResult.fail("No connection")
 
@@ -164,34 +241,23 @@ class DataViewerUseCase:
 				return AppResult.fail(doc_repo_result.error)
 			doc_repo = doc_repo_result.value
 
-			doc_result = doc_repo.get_by_filename(filename)
-			if doc_result.is_fail:
-				return AppResult.fail(doc_result.error)
-
-			doc = doc_result.value
-			if doc is None:
+			layer_repo_result = session._get_layer_repository(file_schema)
+			if layer_repo_result.is_fail:
+				return AppResult.fail(layer_repo_result.error)
+
+			# Контент и записи слоев удаляются каскадно по FK, созданному при импорте
+			remove_result = doc_repo.remove_by_filename(filename, layer_repo_result.value.table_name)
+			if remove_result.is_fail:
+				session.rollback()
+				return AppResult.fail(remove_result.error)
+			if remove_result.value is None:
 				return AppResult.success(False)
 
-			content_repo_result = session._get_content_repository(file_schema)
-			if content_repo_result.is_success:
-				content_result = content_repo_result.value.get_by_document_id(doc.id)
-				if content_result.is_success and content_result.value is not None:
-					remove_content_result = content_repo_result.value.remove(content_result.value.id)
-					if remove_content_result.is_fail:
-						return AppResult.fail(remove_content_result.error)
-
-			layer_repo_result = session._get_layer_repository(file_schema)
-			if layer_repo_result.is_success:
-				layers_result = layer_repo_result.value.get_all_by_document_id(doc.id)
-				if layers_result.is_success:
-					for layer in layers_result.value:
-						remove_layer_result = layer_repo_result.value.remove(layer.id)
-						if remove_layer_result.is_fail:
-							return AppResult.fail(remove_layer_result.error)
-
-			remove_doc_result = doc_repo.remove(doc.id)
-			if remove_doc_result.is_fail:
-				return AppResult.fail(remove_doc_result.error)
+			# Таблицы слоев, которые больше никем не используются, удаляются вместе с документом
+			drop_result = session.drop_tables(remove_result.value)
+			if drop_result.is_fail:
+				session.rollback()
+				return AppResult.fail(drop_result.error)
 
 			commit_result = session.commit()
 			if commit_result.is_fail:
@@ -228,68 +294,18 @@ class DataViewerUseCase:
 			if connect_result.is_fail:
 				return AppResult.fail(connect_result.error)
 
-			doc_repo_result = session._get_document_repository(file_schema)
-			if doc_repo_result.is_fail:
-				return AppResult.fail(doc_repo_result.error)
-			doc_repo = doc_repo_result.value
+			query_result = self._build_documents_query(session, file_schema, None, None, filename)
+			if query_result.is_fail:
+				return AppResult.fail(query_result.error)
 
-			doc_result = doc_repo.get_by_filename(filename)
-			if doc_result.is_fail:
-				return AppResult.fail(doc_result.error)
-			doc = doc_result.value
-			if doc is None:
+			query, params = query_result.value
+			rows_result = session.execute_read_query(query, params)
+			if rows_result.is_fail:
+				return AppResult.fail(rows_result.error)
+			if not rows_result.value:
 				return AppResult.fail("Document not found")
 
-			file_size = 0
-			content_repo_result = session._get_content_repository(file_schema)
-			if content_repo_result.is_success:
-				content_repo = content_repo_result.value
-				content_schema = getattr(content_repo, "_schema", file_schema)
-				content_table = getattr(content_repo, "_table_name", "content")
-
-				columns_result = session.get_table_columns(content_schema, content_table)
-				if columns_result.is_success:
-					columns = set(columns_result.value)
-					schema_sql = self._quote_identifier(content_schema)
-					table_sql = self._quote_identifier(content_table)
-
-					if {"document_id", "content"}.issubset(columns):
-						size_query = (
-							f"SELECT OCTET_LENGTH(content) AS size_bytes "
-							f"FROM {schema_sql}.{table_sql} "
-							f"WHERE document_id = %s LIMIT 1"
-						)
-						size_result = session.execute_read_query(size_query, (str(doc.id),))
-						if size_result.is_success and size_result.value:
-							file_size = int(size_result.value[0].get("size_bytes") or 0)
-
-					elif {"id", "file_content"}.issubset(columns):
-						size_query = (
-							f"SELECT OCTET_LENGTH(file_content) AS size_bytes "
-							f"FROM {schema_sql}.{table_sql} "
-							f"WHERE id = %s LIMIT 1"
-						)
-						size_result = session.execute_read_query(size_query, (str(doc.id),))
-						if size_result.is_success and size_result.value:
-							file_size = int(size_result.value[0].get("size_bytes") or 0)
-
-			layer_count = 0
-			layer_repo_result = session._get_layer_repository(file_schema)
-			if layer_repo_result.is_success:
-				layers_result = layer_repo_result.value.get_all_by_document_id(doc.id)
-				if layers_result.is_success:
-					layer_count = len(layers_result.value)
-
-			return AppResult.success(
-				{
-					"id": doc.id,
-					"filename": doc.filename,
-					"upload_date": doc.upload_date,
-					"update_date": doc.update_date,
-					"file_size": file_size,
-					"layer_count": layer_count,
-				}
-			)
+			return AppResult.success(self._to_document_meta(rows_result.value[0]))
 		except Exception as exc:
 			self._logger.error(f"Failed to load document info for '{filename}' from '{file_schema}': {exc}")
 			return AppResult.fail(str(exc))
@@ -306,22 +322,19 @@ class DataViewerUseCase:
 		connection: ConnectionConfigDTO,
 		file_schema: str,
 		filename: str,
-		output_dir: str,
 	) -> AppResult[str]:
-		"""Генерирует SVG-превью из DXF-контента в БД для указанного файла."""
+		"""Возвращает SVG-превью DXF-контента из БД, при промахе кэша превью строит его."""
 		if not connection:
 			return AppResult.fail("No connection")
 		if not file_schema:
 			return AppResult.fail("No file schema")
 		if not filename:
 			return AppResult.fail("No filename")
-		if not output_dir:
-			return AppResult.fail("No output directory")
+		if self._preview_cache is None:
+			return AppResult.fail("Preview cache is not configured")
 
 		session = inject.instance(DBSession)
-		dxf_reader = inject.instance(IDXFReader)
 
-		temp_path = ""
 		try:
 			connect_result = session.connect(connection)
 			if connect_result.is_fail:
@@ -347,24 +360,15 @@ class DataViewerUseCase:
 			if content_result.value is None or not content_result.value.content:
 				return AppResult.fail("Document content is empty")
 
-			fd, temp_path = tempfile.mkstemp(suffix=".dxf")
-			os.close(fd)
-			with open(temp_path, "wb") as temp_file:
-				temp_file.write(content_result.value.content)
-
-			preview_result = dxf_reader.save_svg_preview(
-				filepath=temp_path,
-				output_dir=output_dir,
-				filename=filename,
-			)
+			content = content_result.value.content
+			preview_result = self._preview_cache.get_or_render(content)
 			if preview_result.is_fail:
 				return AppResult.fail(preview_result.error)
 
+			self._preview_cache.link_document(connection, file_schema, filename, content)
 			return AppResult.success(preview_result.value)
 		except Exception as exc:
 			self._logger.error(f"Failed to generate preview for '{filename}': {exc}")
 			return AppResult.fail(str(exc))
 		finally:
-			if temp_path and os.path.exists(temp_path):
-				os.remove(temp_path)
 			session.close()
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+import hashlib
 import os
+import shutil
 import tempfile
+from collections.abc import Iterable
 
 import inject
 
 from ...application.database import DBSession
 from ...application.dtos import ConnectionConfigDTO, ExportConfigDTO, ExportMode
-from ...application.interfaces import ILogger
+from ...application.interfaces import IFileCache, ILogger
 from ...application.results import AppResult, Unit
 from ...domain.services import IDXFWriter
 
@@ -15,9 +18,18 @@ from ...domain.services import IDXFWriter
 class ExportUseCase:
 	"""Вариант использования: Экспортировать DXF из БД в файл."""
 
-	def __init__(self, dxf_writer: IDXFWriter, logger: ILogger):
+	# Сколько строк таблицы слоя читается из БД за раз при восстановлении DXF
+	ENTITY_BATCH_SIZE = 5000
+
+	def __init__(
+		self,
+		dxf_writer: IDXFWriter,
+		logger: ILogger,
+		export_cache: IFileCache | None = None,
+	):
 		self._dxf_writer = dxf_writer
 		self._logger = logger
+		self._export_cache = export_cache
 
 	def execute(
 		self,
@@ -67,15 +79,27 @@ class ExportUseCase:
 				report_lines.append(f"File schema verified: '{config.file_schema}'")
 				report_lines.append(f"\n--- Processing file: {config.filename} ---")
 
+				output_path = self._resolve_output_path(config)
+				if not output_path:
+					error_msg = "Output path is not defined"
+					report_lines.append(f"ERROR: {error_msg}")
+					return AppResult.fail(error_msg), "\n".join(report_lines)
+
 				if config.export_mode == ExportMode.TABLES:
-					content_result = self._read_table_entities(session, config.file_schema, config.filename)
-					if content_result.is_fail:
-						error_msg = f"Failed to reconstruct DXF content for '{config.filename}': {content_result.error}"
+					# Восстановленный DXF пишется прямо в файл назначения
+					export_result = self._export_table_entities(
+						session,
+						config.file_schema,
+						config.filename,
+						output_path,
+						config,
+					)
+					if export_result.is_fail:
+						error_msg = f"Failed to reconstruct DXF content for '{config.filename}': {export_result.error}"
 						report_lines.append(f"ERROR: {error_msg}")
 						return AppResult.fail(error_msg), "\n".join(report_lines)
 
-					content_bytes, reconstruction_report = content_result.value
-					report_lines.append(reconstruction_report)
+					report_lines.append(export_result.value)
 				else:
 					content_result = self._read_content(
 						session=session,
@@ -88,19 +112,11 @@ class ExportUseCase:
 						report_lines.append(f"ERROR: {error_msg}")
 						return AppResult.fail(error_msg), "\n".join(report_lines)
 
-					content_bytes = content_result.value
-
-				output_path = self._resolve_output_path(config)
-				if not output_path:
-					error_msg = "Output path is not defined"
-					report_lines.append(f"ERROR: {error_msg}")
-					return AppResult.fail(error_msg), "\n".join(report_lines)
-
-				write_result = self._write_file(output_path, content_bytes)
-				if write_result.is_fail:
-					error_msg = f"Failed to write file '{output_path}': {write_result.error}"
-					report_lines.append(f"ERROR: {error_msg}")
-					return AppResult.fail(error_msg), "\n".join(report_lines)
+					write_result = self._write_file(output_path, content_result.value)
+					if write_result.is_fail:
+						error_msg = f"Failed to write file '{output_path}': {write_result.error}"
+						report_lines.append(f"ERROR: {error_msg}")
+						return AppResult.fail(error_msg), "\n".join(report_lines)
 
 				report_lines.append(f"File exported successfully: '{output_path}'")
 
@@ -146,6 +162,35 @@ class ExportUseCase:
 		except Exception as exc:
 			return AppResult.fail(str(exc))
 
+	def _copy_file(self, source: str, path: str) -> AppResult[Unit]:
+		try:
+			dir_name = os.path.dirname(path)
+			if dir_name:
+				os.makedirs(dir_name, exist_ok=True)
+
+			shutil.copyfile(source, path)
+			return AppResult.success(Unit())
+		except Exception as exc:
+			return AppResult.fail(str(exc))
+
+	def _write_reconstructed(self, path: str, definitions: list, batches: Iterable[list]) -> AppResult[str]:
+		"""Пишет восстановленный из пачек сущностей DXF в файл; недописанный файл удаляется"""
+		try:
+			dir_name = os.path.dirname(path)
+			if dir_name:
+				os.makedirs(dir_name, exist_ok=True)
+
+			with open(path, 'wb') as dxf_file:
+				write_result = self._dxf_writer.write_reconstructed_batches(definitions, batches, dxf_file)
+		except Exception as exc:
+			write_result = AppResult.fail(str(exc))
+
+		if write_result.is_fail:
+			if os.path.exists(path):
+				os.remove(path)
+			return AppResult.fail(write_result.error)
+		return AppResult.success(write_result.value)
+
 	def _read_content(
 		self,
 		session: DBSession,
@@ -177,15 +222,32 @@ class ExportUseCase:
 
 		return AppResult.success(content_result.value.content)
 
-	def _read_table_entities(
+	def _export_table_entities(
 		self,
 		session: DBSession,
 		file_schema: str,
 		filename: str,
-	) -> AppResult[tuple[bytes, str]]:
+		output_path: str,
+		config: ExportConfigDTO | None = None,
+	) -> AppResult[str]:
+		"""
+		Восстанавливает DXF из таблиц слоев в output_path и возвращает отчет.
+
+		DXF пишется в файл назначения потоком, без промежуточной копии в памяти.
+		При попадании в кэш экспорта готовый файл копируется из кэша.
+		"""
 		report_lines: list[str] = []
 		report_lines.append(f"Reconstruction started for '{filename}' in schema '{file_schema}'")
 
+		extent_wkt = config.extent_filter_wkt if config else None
+		entity_types = list(config.entity_types) if config else []
+		layer_names = set(config.layer_names) if config else set()
+		if config is not None and config.has_filters:
+			report_lines.append(
+				f"Filters: extent={'yes' if extent_wkt else 'no'}, "
+				f"entity_types={entity_types or 'all'}, layers={sorted(layer_names) or 'all'}"
+			)
+
 		doc_repo_result = session._get_document_repository(file_schema)
 		if doc_repo_result.is_fail:
 			return AppResult.fail(doc_repo_result.error)
@@ -204,17 +266,20 @@ class ExportUseCase:
 		if layer_repo_result.is_fail:
 			return AppResult.fail(layer_repo_result.error)
 
-		layer_result = layer_repo_result.value.get_all_by_document_id(doc.id)
+		layer_repo = layer_repo_result.value
+		layer_result = layer_repo.get_all_by_document_id(doc.id)
 		if layer_result.is_fail:
 			return AppResult.fail(layer_result.error)
 
 		layers = layer_result.value
+		if layer_names:
+			layers = [layer for layer in layers if layer.name in layer_names]
 		if not layers:
 			return AppResult.fail("No layers found to export")
 
 		report_lines.append(f"Layers loaded: {len(layers)}")
 
-		table_entities = []
+		layer_repos = []
 		for layer in layers:
 			report_lines.append(
 				f"Layer '{layer.name}': schema='{layer.schema_name}', table='{layer.table_name}'"
@@ -225,27 +290,104 @@ class ExportUseCase:
 					f"Layer '{layer.name}': ERROR getting entity repository: {entity_repo_result.error}"
 				)
 				return AppResult.fail("\n".join(report_lines))
-
-			entity_result = entity_repo_result.value.get_all()
-			if entity_result.is_fail:
-				report_lines.append(
-					f"Layer '{layer.name}': ERROR loading entities: {entity_result.error}"
-				)
+			layer_repos.append((layer, entity_repo_result.value))
+
+		cache_key = self._build_cache_key(doc, layer_repo, layers, config)
+		if cache_key:
+			cached_path = self._export_cache.get_path(cache_key)
+			if cached_path:
+				copy_result = self._copy_file(cached_path, output_path)
+				if copy_result.is_fail:
+					return AppResult.fail(f"Failed to write file '{output_path}': {copy_result.error}")
+				report_lines.append("Document revision unchanged: reconstructed DXF taken from export cache")
+				return AppResult.success("\n".join(report_lines))
+
+		# Фильтр по области использует GiST-индекс: таблицы, импортированные до его появления,
+		# получают индекс при первом таком экспорте
+		if extent_wkt:
+			for layer, entity_repo in layer_repos:
+				index_result = entity_repo.ensure_spatial_index()
+				if index_result.is_fail:
+					report_lines.append(f"Layer '{layer.name}': WARNING: {index_result.error}")
+			commit_result = session.commit()
+			if commit_result.is_fail:
+				report_lines.append(f"WARNING: geometry indexes were not committed: {commit_result.error}")
+
+		# Слои и блоки нужны писателю до сущностей: отдельный запрос возвращает их определения
+		srid = config.extent_srid if config else 0
+		definitions = []
+		for layer, entity_repo in layer_repos:
+			definitions_result = entity_repo.get_definition_entities(
+				extent_wkt=extent_wkt,
+				entity_types=entity_types,
+				srid=srid,
+			)
+			if definitions_result.is_fail:
+				report_lines.append(f"Layer '{layer.name}': ERROR loading definitions: {definitions_result.error}")
 				return AppResult.fail("\n".join(report_lines))
-
-			entities = entity_result.value
-			report_lines.append(f"Layer '{layer.name}': entities loaded={len(entities)}")
-			table_entities.extend(entities)
-
-		if not table_entities:
-			report_lines.append("Reconstruction summary: reconstructed=0, skipped=0, by_type={}")
-			return AppResult.fail("\n".join(report_lines))
-
-		reconstruction_result = self._dxf_writer.reconstruct_from_entities(table_entities)
+			definitions.extend(definitions_result.value)
+
+		# Сущности читаются пачками через COPY; фильтрация выполняется в БД
+		loaded_by_layer: dict[str, int] = {}
+
+		def batches():
+			for layer, entity_repo in layer_repos:
+				batch_result = entity_repo.iter_batches(
+					batch_size=self.ENTITY_BATCH_SIZE,
+					extent_wkt=extent_wkt,
+					entity_types=entity_types,
+					srid=srid,
+				)
+				if batch_result.is_fail:
+					raise RuntimeError(f"Layer '{layer.name}': ERROR loading entities: {batch_result.error}")
+
+				loaded = 0
+				for batch in batch_result.value:
+					loaded += len(batch)
+					yield batch
+				loaded_by_layer[layer.name] = loaded
+
+		reconstruction_result = self._write_reconstructed(output_path, definitions, batches())
+		for layer, _ in layer_repos:
+			if layer.name in loaded_by_layer:
+				report_lines.append(f"Layer '{layer.name}': entities loaded={loaded_by_layer[layer.name]}")
 		if reconstruction_result.is_fail:
 			report_lines.append(f"ERROR: {reconstruction_result.error}")
 			return AppResult.fail("\n".join(report_lines))
 
-		content_bytes, reconstruction_report = reconstruction_result.value
-		report_lines.append(reconstruction_report)
-		return AppResult.success((content_bytes, "\n".join(report_lines)))
+		report_lines.append(reconstruction_result.value)
+
+		if cache_key:
+			self._export_cache.put_file(cache_key, output_path)
+
+		return AppResult.success("\n".join(report_lines))
+
+	def _build_cache_key(self, doc, layer_repo, layers: list, config: ExportConfigDTO | None) -> str | None:
+		"""
+		Ключ кэша экспорта: документ, его update_date, ревизии таблиц слоев и фильтры.
+
+		Ревизии таблиц (число строк и максимальный xmin) поддерживает PostgreSQL, поэтому
+		правка таблицы слоя в QGIS или SQL меняет ключ так же, как импорт.
+		None — кэш выключен или ревизии прочитать не удалось.
+		"""
+		if self._export_cache is None:
+			return None
+
+		revisions_result = layer_repo.get_table_revisions_by_document_id(doc.id)
+		if revisions_result.is_fail:
+			self._logger.warning(f"Export cache skipped: no layer table revisions: {revisions_result.error}")
+			return None
+
+		revisions = revisions_result.value
+		parts = [str(doc.id), str(doc.update_date)]
+		parts.extend(sorted(
+			f"{layer.schema_name}.{layer.table_name}={revisions.get((layer.schema_name, layer.table_name), '')}"
+			for layer in layers
+		))
+
+		if config is not None:
+			parts.append(f"extent={config.extent_filter_wkt or ''}@{config.extent_srid}")
+			parts.append(f"types={','.join(sorted(config.entity_types))}")
+			parts.append(f"layers={','.join(sorted(config.layer_names))}")
+
+		return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
@@ -1,6 +1,5 @@
 import inject
 import os
-import tempfile
 from datetime import datetime
 from unidecode import unidecode
 
@@ -12,6 +11,7 @@ from ...application.dtos import ImportConfigDTO, ConnectionConfigDTO, ImportMode
 from ...application.results import AppResult, Unit
 from ...application.interfaces import ILogger
 from ...application.database import DBSession
+from ...application.services import PreviewCacheService
 
 class ImportUseCase:
     """Вариант использования: Импортировать DXF файл"""
@@ -21,12 +21,14 @@ class ImportUseCase:
         active_repo: IActiveDocumentRepository,
         dxf_reader: IDXFReader,
         dxf_writer: IDXFWriter,
-        logger: ILogger
+        logger: ILogger,
+        preview_cache: PreviewCacheService | None = None
     ):
         self._active_repo = active_repo
         self._dxf_reader = dxf_reader
         self._dxf_writer = dxf_writer
         self._logger = logger
+        self._preview_cache = preview_cache
     
     def _transliterate_layer_name(self, layer_name: str) -> str:
         """Транслитерирует русские названия слоев в английские"""
@@ -229,10 +231,6 @@ class ImportUseCase:
 
         # start import
         try:
-            previews_dir = os.path.abspath(
-                os.path.join(os.path.dirname(__file__), "..", "..", "..", "previews")
-            )
-
             for config in configs:
                 report_lines.append(f"\n--- Processing file: {config.filename} ---")
                 report_lines.append(f"Settings: prefix_check={config.prefix_check}, transliterate={config.transliterate_layer_names}")
@@ -250,66 +248,39 @@ class ImportUseCase:
                 else:
                     selected_layers = list(source_doc.layers.values())
 
-                preview_source_path, temp_source_file = self._prepare_preview_source(source_doc)
-                temp_preview_file = ""
-                filtered_content = b""
-
-                try:
-                    if not preview_source_path:
-                        error_msg = f"Source file for '{config.filename}' is unavailable"
+                # Содержимое для БД собирается в памяти из уже разобранного документа
+                if use_selected_subset:
+                    serialize_result = self._dxf_writer.serialize_selected(
+                        source_filepath=source_doc.filepath,
+                        selected_handles=selected_handles,
+                        content=source_doc.content.content if source_doc.content else None,
+                    )
+                    if serialize_result.is_fail:
+                        error_msg = f"Failed to prepare selected DXF for '{config.filename}': {serialize_result.error}"
                         report_lines.append(f"ERROR: {error_msg}")
                         return AppResult.fail(error_msg), "\n".join(report_lines)
-
-                    if use_selected_subset:
-                        fd, temp_preview_file = tempfile.mkstemp(suffix=".dxf")
-                        os.close(fd)
-
-                        preview_save_result = self._dxf_writer.save_selected_by_handles(
-                            source_filepath=preview_source_path,
-                            output_path=temp_preview_file,
-                            selected_handles=selected_handles,
-                        )
-                        if preview_save_result.is_fail:
-                            error_msg = f"Failed to prepare selected DXF for '{config.filename}': {preview_save_result.error}"
-                            report_lines.append(f"ERROR: {error_msg}")
-                            return AppResult.fail(error_msg), "\n".join(report_lines)
-
-                        preview_result = self._dxf_reader.save_svg_preview(
-                            filepath=temp_preview_file,
-                            output_dir=previews_dir,
-                            filename=config.filename,
-                        )
-                        if preview_result.is_success:
-                            report_lines.append(f"Preview saved: {preview_result.value}")
-                        else:
-                            report_lines.append(f"WARNING: Failed to save preview for '{config.filename}': {preview_result.error}")
-
-                        with open(temp_preview_file, "rb") as preview_file:
-                            filtered_content = preview_file.read()
+                    filtered_content = serialize_result.value
+                elif source_doc.content:
+                    filtered_content = source_doc.content.content
+                elif source_doc.filepath and os.path.exists(source_doc.filepath):
+                    with open(source_doc.filepath, "rb") as source_file:
+                        filtered_content = source_file.read()
+                else:
+                    error_msg = f"Source file for '{config.filename}' is unavailable"
+                    report_lines.append(f"ERROR: {error_msg}")
+                    return AppResult.fail(error_msg), "\n".join(report_lines)
+
+                # Превью строится по тому содержимому, которое попадет в БД
+                if self._preview_cache is not None and filtered_content:
+                    preview_result = self._preview_cache.get_or_render(
+                        filtered_content,
+                        source_doc.filepath,
+                        selected_handles if use_selected_subset else None,
+                    )
+                    if preview_result.is_success:
+                        report_lines.append(f"Preview saved: {preview_result.value}")
                     else:
-                        preview_result = self._dxf_reader.save_svg_preview(
-                            filepath=preview_source_path,
-                            output_dir=previews_dir,
-                            filename=config.filename,
-                        )
-                        if preview_result.is_success:
-                            report_lines.append(f"Preview saved: {preview_result.value}")
-                        else:
-                            report_lines.append(f"WARNING: Failed to save preview for '{config.filename}': {preview_result.error}")
-
-                        if source_doc.content:
-                            filtered_content = source_doc.content.content
-                        elif preview_source_path and os.path.exists(preview_source_path):
-                            with open(preview_source_path, "rb") as preview_file:
-                                filtered_content = preview_file.read()
-                        else:
-                            filtered_content = b""
-
-                finally:
-                    if temp_source_file and os.path.exists(temp_source_file):
-                        os.remove(temp_source_file)
-                    if temp_preview_file and os.path.exists(temp_preview_file):
-                        os.remove(temp_preview_file)
+                        report_lines.append(f"WARNING: Failed to save preview for '{config.filename}': {preview_result.error}")
 
                 # Начинаем импорт
                 doc = source_doc
@@ -331,6 +302,12 @@ class ImportUseCase:
 
                     report_lines.append(f"All repositories initialized for schema '{config.file_schema}'")
 
+                    # Каскадное удаление контента и слоев вместе с документом
+                    for repo in (content_repo, layer_repo):
+                        link_result = repo.link_to_document_table(doc_repo.table_name)
+                        if link_result.is_fail:
+                            self._logger.warning(f"Document foreign key was not created: {link_result.error}")
+
                     # Поиск файлов с таким же названием
                     if doc_repo.exists(config.filename).value:
                         report_lines.append(f"Document already exists in database, updating...")
@@ -377,6 +354,9 @@ class ImportUseCase:
                         ).value
                         report_lines.append(f"Content record updated (size: {len(filtered_content)} bytes)")
 
+                    if self._preview_cache is not None and filtered_content:
+                        self._preview_cache.link_document(connection, config.file_schema, config.filename, filtered_content)
+
                     layers_processed = 0
 
                     # Поиск слоев в БД
@@ -439,6 +419,7 @@ class ImportUseCase:
                             continue
 
                         entity_repo = entity_repo_result.value
+                        self._ensure_spatial_index(entity_repo, report_lines)
                         entity_repo.delete_all()  # Удаляем все существующие объекты слоя
                         entities_processed = 0
 
@@ -472,6 +453,7 @@ class ImportUseCase:
                             continue
 
                         entity_repo = entity_repo_result.value
+                        self._ensure_spatial_index(entity_repo, report_lines)
                         entities_processed = 0
 
                         for entity in layer.entities.values():
@@ -514,6 +496,7 @@ class ImportUseCase:
                             continue
 
                         entity_repo = entity_repo_result.value
+                        self._ensure_spatial_index(entity_repo, report_lines)
                         entities_processed = 0
 
                         for entity in layer.entities.values():
@@ -553,6 +536,12 @@ class ImportUseCase:
             
             return AppResult.fail(str(e)), "\n".join(report_lines)
     
+    def _ensure_spatial_index(self, entity_repo, report_lines: list[str]) -> None:
+        """Пространственный индекс таблицы слоя создается вместе с записью ее сущностей"""
+        index_result = entity_repo.ensure_spatial_index()
+        if index_result.is_fail:
+            report_lines.append(f"WARNING: {index_result.error}")
+
     def generate_pre_import_report(
         self,
         connection: ConnectionConfigDTO,
@@ -684,25 +673,4 @@ class ImportUseCase:
         return "".join(report_lines)
 
     def _get_selected_handles(self, document: DXFDocument) -> set[str]:
-        selected_handles: set[str] = set()
-        for layer in document.layers.values():
-            for entity in layer.entities.values():
-                if not entity.is_selected:
-                    continue
-                handle = str(entity.attributes.get("handle", "")).strip().upper()
-                if handle:
-                    selected_handles.add(handle)
-        return selected_handles
-
-    def _prepare_preview_source(self, document: DXFDocument) -> tuple[str, str]:
-        if document.filepath and os.path.exists(document.filepath):
-            return document.filepath, ""
-
-        if not document.content:
-            return "", ""
-
-        fd, temp_source_file = tempfile.mkstemp(suffix=".dxf")
-        os.close(fd)
-        with open(temp_source_file, "wb") as tmp_file:
-            tmp_file.write(document.content.content)
-        return temp_source_file, temp_source_file
\ No newline at end of file
+        return document.get_selected_handles()
\ No newline at end of file
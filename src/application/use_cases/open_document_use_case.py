@@ -3,7 +3,7 @@ from ...domain.entities import DXFDocument
 from ...domain.repositories import IActiveDocumentRepository
 from ...domain.services import IDXFReader
 
-from ...application.dtos import DXFDocumentDTO
+from ...application.dtos import DXFDocumentDTO, DocumentChangeSetDTO
 from ...application.mappers import DXFMapper
 from ...application.results import AppResult
 from ...application.events import IAppEvents
@@ -54,6 +54,15 @@ class OpenDocumentUseCase:
         # Если сохранение прошло успешно, возвращаем DTO документа
         dtos = DXFMapper.to_dto(opened_files)
         self._app_events.on_document_opened.emit(dtos)
+        self._app_events.on_document_changes.emit([
+            DocumentChangeSetDTO(
+                document_id=doc.id,
+                filename=doc.filename,
+                version=doc.bump_version(),
+                added_ids=(doc.id,),
+            )
+            for doc in opened_files
+        ])
         return AppResult.success(dtos)
     
     def execute_single(self, filepath: str) -> AppResult[DXFDocumentDTO]:
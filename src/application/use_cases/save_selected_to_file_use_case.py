@@ -68,12 +68,4 @@ class SaveSelectedToFileUseCase:
         return AppResult.fail(save_result.error), "\n".join(report_lines)
 
     def _get_selected_handles(self, source_doc) -> set[str]:
-        selected_handles: set[str] = set()
-        for layer in source_doc.layers.values():
-            for entity in layer.entities.values():
-                if not entity.is_selected:
-                    continue
-                handle = str(entity.attributes.get("handle", "")).strip().upper()
-                if handle:
-                    selected_handles.add(handle)
-        return selected_handles
+        return source_doc.get_selected_handles()
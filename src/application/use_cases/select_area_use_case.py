@@ -1,17 +1,50 @@
 from __future__ import annotations
 
+from weakref import WeakKeyDictionary
+
 from ...application.dtos import (
     DXFDocumentDTO,
     AreaSelectionRequestDTO,
+    DocumentChangeSetDTO,
 )
 from ...application.events import IAppEvents
 from ...application.interfaces import ILogger
 from ...application.mappers import DXFMapper
 from ...application.results import AppResult
-from ...domain.entities import DXFDocument
+from ...domain.entities import DXFDocument, DXFEntity, DXFLayer
 from ...domain.repositories import IActiveDocumentRepository
 from ...domain.services import IAreaSelector
-from ...domain.value_objects import AreaSelectionParams
+from ...domain.value_objects import AreaSelectionParams, SelectionMask
+
+
+class _DocumentOrdinals:
+    """Порядковые номера сущностей документа: слой за слоем, непрерывными диапазонами."""
+
+    def __init__(self, document: DXFDocument):
+        self.entities: list[DXFEntity] = []
+        self.layer_ranges: list[tuple[DXFLayer, int, int]] = []
+        self.ordinal_by_handle: dict[str, int] = {}
+
+        for layer in document.layers.values():
+            start = len(self.entities)
+            for entity in layer.entities.values():
+                handle = entity.handle
+                if handle:
+                    self.ordinal_by_handle.setdefault(handle, len(self.entities))
+                self.entities.append(entity)
+            self.layer_ranges.append((layer, start, len(self.entities) - start))
+
+    def selection(self) -> SelectionMask:
+        """Текущий выбор документа: маски слоев, поддерживаемые set_selected, склеиваются сдвигами."""
+        bits = 0
+        for layer, start, _ in self.layer_ranges:
+            bits |= layer.selection_mask().bits << start
+        return SelectionMask(len(self.entities), bits)
+
+    def matches(self, document: DXFDocument) -> bool:
+        return len(self.layer_ranges) == len(document.layers) and all(
+            count == len(layer.entities) for layer, _, count in self.layer_ranges
+        )
 
 
 class SelectAreaUseCase:
@@ -28,6 +61,7 @@ class SelectAreaUseCase:
         self._area_selector = area_selector
         self._app_events = app_events
         self._logger = logger
+        self._ordinals: WeakKeyDictionary[DXFDocument, _DocumentOrdinals] = WeakKeyDictionary()
 
     def execute(
         self,
@@ -65,26 +99,35 @@ class SelectAreaUseCase:
                 self._logger.error(f"Area selector failed: {select_result.error}")
                 return AppResult.fail(select_result.error)
 
-            selected_handles = set(select_result.value)
+            selected_handles = {DXFEntity.normalize_handle(handle) for handle in select_result.value}
             self._logger.message(f"Area selector returned handles: {len(selected_handles)}")
 
-            changed_count = 0
-            total_count = 0
-            for layer in document.layers.values():
-                for entity in layer.entities.values():
-                    total_count += 1
-                    handle = str(entity.attributes.get("handle", "")).strip().lower()
-                    new_selected = handle in selected_handles and handle != ""
-                    if entity.is_selected != new_selected:
-                        changed_count += 1
-                    entity.set_selected(new_selected)
+            ordinals = self._get_ordinals(document)
+            ordinal_by_handle = ordinals.ordinal_by_handle
+            current = ordinals.selection()
+            area = SelectionMask.from_ordinals(
+                len(ordinals.entities),
+                (ordinal_by_handle[handle] for handle in selected_handles if handle in ordinal_by_handle),
+            )
+            selection = current.apply(area, params.selection_mode)
+
+            # В модель попадают только сущности, чей бит изменился
+            changed_ids = []
+            for ordinal in current.flipped(selection).ordinals():
+                entity = ordinals.entities[ordinal]
+                entity.set_selected(not entity.is_selected)
+                changed_ids.append(entity.id)
+            changed_count = len(changed_ids)
 
             self._logger.message(
                 f"Selection synced from ezdxf result: changed_entities={changed_count}, "
-                f"total_entities={total_count}"
+                f"total_entities={len(ordinals.entities)}"
             )
-            
-            self._refresh_parent_selection(document)
+
+            changed_ids.extend(self._refresh_parent_selection(document))
+            if not changed_ids:
+                self._logger.message("SelectAreaUseCase completed: selection unchanged")
+                return AppResult.success(DXFMapper.to_dto(document))
 
             update_result = self._active_repo.update(document)
             if update_result.is_fail:
@@ -92,6 +135,14 @@ class SelectAreaUseCase:
 
             dto = DXFMapper.to_dto(document)
             self._app_events.on_document_modified.emit([dto])
+            self._app_events.on_document_changes.emit([
+                DocumentChangeSetDTO(
+                    document_id=document.id,
+                    filename=document.filename,
+                    version=document.bump_version(),
+                    selection_changed_ids=tuple(changed_ids),
+                )
+            ])
             self._logger.message("SelectAreaUseCase completed successfully")
             return AppResult.success(dto)
         except Exception as e:
@@ -107,12 +158,25 @@ class SelectAreaUseCase:
             shape_args=request.shape_args,
         )
 
-    def _refresh_parent_selection(self, document: DXFDocument):
-        any_doc_selected = False
+    def _get_ordinals(self, document: DXFDocument) -> _DocumentOrdinals:
+        ordinals = self._ordinals.get(document)
+        if ordinals is None or not ordinals.matches(document):
+            ordinals = _DocumentOrdinals(document)
+            self._ordinals[document] = ordinals
+        return ordinals
 
-        for layer in document.layers.values():
-            any_layer_selected = any(entity.is_selected for entity in layer.entities.values())
-            layer.set_selected(any_layer_selected)
-            any_doc_selected = any_doc_selected or any_layer_selected
+    def _refresh_parent_selection(self, document: DXFDocument) -> list:
+        """Пересчитывает флаги слоев и документа по счетчикам выбора; возвращает id объектов, чей флаг изменился."""
+        changed_ids = []
 
-        document.set_selected(any_doc_selected)
+        for layer in document.layers.values():
+            any_layer_selected = layer.selected_count > 0
+            if layer.is_selected != any_layer_selected:
+                layer.set_selected(any_layer_selected)
+                changed_ids.append(layer.id)
+
+        any_doc_selected = document.selected_layers_count > 0
+        if document.is_selected != any_doc_selected:
+            document.set_selected(any_doc_selected)
+            changed_ids.append(document.id)
+        return changed_ids
@@ -4,7 +4,7 @@ from uuid import UUID
 from ...domain.entities import DXFBase, DXFDocument, DXFLayer
 from ...domain.repositories import IActiveDocumentRepository
 
-from ...application.dtos import DXFDocumentDTO
+from ...application.dtos import DXFDocumentDTO, DocumentChangeSetDTO
 from ...application.mappers import DXFMapper
 from ...application.results import AppResult
 from ...application.events import IAppEvents
@@ -24,20 +24,16 @@ class SelectEntityUseCase:
         if not entities:
             return AppResult.fail("No entities provided for select")
         
-        # Получаем все документы
-        result = self._active_repo.get_all()
-        if result.is_fail:
-            return AppResult.fail(result.error)
-        
-        documents = result.value
         modified_documents: dict[UUID, DXFDocument] = {}
+        # Объекты, у которых флаг выбора действительно изменился, по документам
+        changed_ids: dict[UUID, list[UUID]] = {}
 
         for entity_id, selected in entities.items():
-            target_doc, entity = self._find_entity_by_id(documents, entity_id)
+            target_doc, entity = self._find_entity_by_id(entity_id)
             if entity is None or target_doc is None:
                 continue
 
-            self._set_selected_recursive(entity, selected)
+            self._set_selected_recursive(entity, selected, changed_ids.setdefault(target_doc.id, []))
             modified_documents[target_doc.id] = target_doc
         
         updated_docs = list(modified_documents.values())
@@ -49,6 +45,19 @@ class SelectEntityUseCase:
         
         dtos = DXFMapper.to_dto(updated_docs)
         self._app_events.on_document_modified.emit(dtos)
+
+        change_sets = [
+            DocumentChangeSetDTO(
+                document_id=doc.id,
+                filename=doc.filename,
+                version=doc.bump_version(),
+                selection_changed_ids=tuple(changed_ids[doc.id]),
+            )
+            for doc in updated_docs
+            if changed_ids.get(doc.id)
+        ]
+        if change_sets:
+            self._app_events.on_document_changes.emit(change_sets)
         return AppResult.success(dtos)
     
     def execute_single(self, entity_id: UUID, selected: bool) -> AppResult[DXFDocumentDTO]:
@@ -63,32 +72,24 @@ class SelectEntityUseCase:
         
         return AppResult.fail(f"Unexpected error: object '{entity_id}' was not returned in result")
     
-    def _find_entity_by_id(self, documents: list[DXFDocument], entity_id: UUID) -> tuple[DXFDocument | None, DXFBase | None]:
+    def _find_entity_by_id(self, entity_id: UUID) -> tuple[DXFDocument | None, DXFBase | None]:
+        result = self._active_repo.find_object(entity_id)
+        if result.is_fail:
+            return None, None
 
-        for document in documents:
-            # Проверяем документ
-            if document.id == entity_id:
-                return document, document
-            
-            # Проверяем слои документа
-            if entity_id in document.layers:
-                return document, document.layers[entity_id]
-            
-            # Проверяем сущности в слоях
-            for layer in document.layers.values():
-                if entity_id in layer.entities:
-                    return document, layer.entities[entity_id]
-        
-        return None, None
+        document, _, entity = result.value
+        return document, entity
 
-    def _set_selected_recursive(self, entity: DXFBase, selected: bool) -> None:
-        entity.set_selected(selected)
+    def _set_selected_recursive(self, entity: DXFBase, selected: bool, changed_ids: list[UUID]) -> None:
+        if entity.is_selected != selected:
+            entity.set_selected(selected)
+            changed_ids.append(entity.id)
 
         if isinstance(entity, DXFDocument):
             for layer in entity.layers.values():
-                self._set_selected_recursive(layer, selected)
+                self._set_selected_recursive(layer, selected, changed_ids)
             return
 
         if isinstance(entity, DXFLayer):
             for layer_entity in entity.entities.values():
-                self._set_selected_recursive(layer_entity, selected)
\ No newline at end of file
+                self._set_selected_recursive(layer_entity, selected, changed_ids)
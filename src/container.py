@@ -5,13 +5,14 @@ from .domain.repositories import IActiveDocumentRepository, IConnectionFactory,
 
 from .application.interfaces import ISettings, ILogger, ILocalization, IDXFPreviewReader, IQgisConnectionProvider
 from .application.events import IEvent, IAppEvents
-from .application.services import ActiveDocumentService, ConnectionConfigService
+from .application.services import ActiveDocumentService, ConnectionConfigService, PreviewCacheService
 from .application.database import DBSession
 from .application.use_cases import OpenDocumentUseCase, CloseDocumentUseCase, SelectEntityUseCase, SelectAreaUseCase, ImportUseCase, ExportUseCase, DataViewerUseCase, SaveSelectedToFileUseCase
 
 from .infrastructure.qgis import Settings, Logger, QtEvent, QtAppEvents, QgisConnectionProvider
 from .infrastructure.localization.localization import Localization
-from .infrastructure.ezdxf import DXFReader, DXFWriter, EzdxfAreaSelector
+from .infrastructure.ezdxf import DXFReader, DXFWriter, EzdxfAreaSelector, EzdxfDrawingStore
+from .infrastructure.cache import DiskLRUCache
 from .infrastructure.database import (
     ActiveDocumentRepository,
     ConnectionFactory,
@@ -28,6 +29,9 @@ from .infrastructure.database.postgis import (
 
 class Container:
 
+    # Ключ настроек: предельный объем кэша превью в мегабайтах
+    _PREVIEW_CACHE_QUOTA_KEY = "preview_cache_max_mb"
+
     @classmethod
     def configure_di(cls):
         """Конфигурация DI"""
@@ -37,19 +41,43 @@ class Container:
             settings = Settings()
             logger = Logger(settings)
             localization = Localization(settings, logger, app_events)
-            dxfreader = DXFReader()
-            dxfwriter = DXFWriter()
-            area_selector = EzdxfAreaSelector()
+            # Разобранные документы открытых файлов общие для чтения, превью, записи и выбора по области
+            drawing_store = EzdxfDrawingStore()
+            dxfreader = DXFReader(drawing_store)
+            dxfwriter = DXFWriter(drawing_store)
+            area_selector = EzdxfAreaSelector(drawing_store)
             active_repo = ActiveDocumentRepository()
+            # Кэш восстановленных из таблиц DXF (LRU, не более 512 МБ)
+            export_cache = DiskLRUCache(
+                os.path.join(os.path.dirname(__file__), '..', 'cache', 'exports'),
+                512 * 1024 * 1024,
+                suffix='.dxf'
+            )
+            # Кэш превью по хэшу содержимого DXF; общий объем задается настройкой (МБ, по умолчанию 256)
+            # и делится между SVG, PNG, миниатюрами и ссылками документов
+            previews_dir = os.path.join(os.path.dirname(__file__), '..', 'cache', 'previews')
+            preview_quota = int(settings.get_value(cls._PREVIEW_CACHE_QUOTA_KEY, 256, int)) * 1024 * 1024
+            links_quota = min(4 * 1024 * 1024, preview_quota // 64)
+            thumbs_quota = preview_quota // 8
+            vector_quota = (preview_quota - links_quota - thumbs_quota) // 2
+            raster_quota = preview_quota - links_quota - thumbs_quota - vector_quota
+            preview_cache = PreviewCacheService(
+                DiskLRUCache(previews_dir, vector_quota, suffix='.svg'),
+                DiskLRUCache(os.path.join(previews_dir, 'raster'), raster_quota, suffix='.png'),
+                DiskLRUCache(os.path.join(previews_dir, 'links'), links_quota, suffix='.link'),
+                DiskLRUCache(os.path.join(previews_dir, 'thumbs'), thumbs_quota, suffix='.png'),
+                dxfreader,
+                logger
+            )
             active_doc_service = ActiveDocumentService(active_repo, logger)
             
             open_use_case = OpenDocumentUseCase(active_repo, dxfreader, app_events, logger)
-            close_use_case = CloseDocumentUseCase(active_repo, dxfreader, app_events)
+            close_use_case = CloseDocumentUseCase(active_repo, dxfreader, app_events, area_selector)
             select_use_case = SelectEntityUseCase(active_repo, app_events, logger)
             select_area_use_case = SelectAreaUseCase(active_repo, area_selector, app_events, logger)
-            import_use_case = ImportUseCase(active_repo, dxfreader, dxfwriter, logger)
-            export_use_case = ExportUseCase(dxfwriter, logger)
-            data_viewer_use_case = DataViewerUseCase(logger)
+            import_use_case = ImportUseCase(active_repo, dxfreader, dxfwriter, logger, preview_cache)
+            export_use_case = ExportUseCase(dxfwriter, logger, export_cache)
+            data_viewer_use_case = DataViewerUseCase(logger, preview_cache)
             save_selected_to_file_use_case = SaveSelectedToFileUseCase(active_repo, dxfwriter, logger)
 
             # Реализации репозиториев и подключений к разным БД
@@ -85,6 +113,7 @@ class Container:
             binder.bind(IActiveDocumentRepository, active_repo)
             binder.bind(ActiveDocumentService, active_doc_service)
             binder.bind(ConnectionConfigService, connection_config_service)
+            binder.bind(PreviewCacheService, preview_cache)
             binder.bind(IQgisConnectionProvider, qgis_provider)
             
             binder.bind(OpenDocumentUseCase, open_use_case)
@@ -4,6 +4,8 @@ from uuid import uuid4, UUID
 from typing import Optional
 
 class DXFBase(ABC):
+    # __slots__ во всей иерархии: объектов в документе миллионы, __dict__ на каждом слишком дорог
+    __slots__ = ('_id', '_selected', '__weakref__')
     
     def __init__(self, id: Optional[UUID] = None, selected: bool = True):
         self._id = id or uuid4()
@@ -4,6 +4,7 @@ from uuid import UUID
 from ...domain.entities import DXFBase
 
 class DXFContent(DXFBase):
+    __slots__ = ('_document_id', '_content')
         
     def __init__(
         self,
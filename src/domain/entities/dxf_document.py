@@ -1,10 +1,12 @@
-
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Set
 from uuid import UUID
-from ...domain.entities import DXFBase, DXFLayer, DXFContent
+from ...domain.entities import DXFBase, DXFEntity, DXFLayer, DXFContent
 
 class DXFDocument(DXFBase):
+    __slots__ = ('_filename', '_upload_date', '_update_date', '_content', '_filepath', '_layers', '_layer_list', '_version',
+        '_selected_layers_count', '_entities_count', '_selected_entities_count',
+    )
     
     def __init__(
         self, 
@@ -24,7 +26,15 @@ class DXFDocument(DXFBase):
 
         self._content = content
         self._filepath = filepath
-        self._layers = {layer.id: layer for layer in (layers or [])}
+        self._layers: Dict[UUID, DXFLayer] = {}
+        # Те же слои в порядке layers для доступа по индексу
+        self._layer_list: List[DXFLayer] = []
+        self._version = 0
+        # Счетчики поддерживаются слоями при изменении выбора и состава сущностей
+        self._selected_layers_count = 0
+        self._entities_count = 0
+        self._selected_entities_count = 0
+        self.add_layers(layers or [])
     
     @classmethod
     def create(
@@ -52,7 +62,12 @@ class DXFDocument(DXFBase):
     def layers(self) -> Dict[int, DXFLayer]:
         """id: layer"""
         return self._layers
-    
+
+    @property
+    def layer_list(self) -> Sequence[DXFLayer]:
+        """Слои в порядке layers с доступом по индексу (только для чтения)"""
+        return self._layer_list
+
     @property
     def upload_date(self) -> Optional[datetime]:
         return self._upload_date
@@ -65,6 +80,30 @@ class DXFDocument(DXFBase):
     def update_date(self, value: datetime):
         self._update_date = value
 
+    @property
+    def version(self) -> int:
+        """Номер версии документа в памяти; растет при каждом опубликованном изменении"""
+        return self._version
+
+    def bump_version(self) -> int:
+        self._version += 1
+        return self._version
+
+    @property
+    def selected_layers_count(self) -> int:
+        """Число выбранных слоев"""
+        return self._selected_layers_count
+
+    @property
+    def entities_count(self) -> int:
+        """Число сущностей во всех слоях"""
+        return self._entities_count
+
+    @property
+    def selected_entities_count(self) -> int:
+        """Число выбранных сущностей во всех слоях"""
+        return self._selected_entities_count
+
     @property
     def content(self) -> Optional[DXFContent]:
         return self._content
@@ -74,7 +113,14 @@ class DXFDocument(DXFBase):
 
     def add_layers(self, layers: List[DXFLayer]):
         for layer in layers:
+            previous = self._layers.get(layer.id)
+            if previous is not None:
+                self._detach_layer(previous)
+                self._layer_list[self._layer_list.index(previous)] = layer
+            else:
+                self._layer_list.append(layer)
             self._layers[layer.id] = layer
+            self._attach_layer(layer)
 
     def get_layer_by_id(self, layer_id: int) -> Optional[DXFLayer]:
         return self._layers.get(layer_id)
@@ -85,15 +131,53 @@ class DXFDocument(DXFBase):
                 return layer
         return None
 
+    def find_entity_by_handle(self, handle: str) -> Optional[DXFEntity]:
+        """Сущность по handle (без учета регистра) через индексы слоев"""
+        for layer in self._layers.values():
+            entity = layer.find_entity_by_handle(handle)
+            if entity is not None:
+                return entity
+        return None
+
+    def get_selected_handles(self) -> Set[str]:
+        """Нормализованные handle выбранных сущностей; стоимость пропорциональна числу выбранных"""
+        selected_handles: Set[str] = set()
+        for layer in self._layers.values():
+            selected_handles.update(layer.selected_handles)
+        return selected_handles
+
     def remove_layer(self, layer: DXFLayer, recursive: bool = False) -> bool:
         if layer.id in self._layers:
+            stored = self._layers.pop(layer.id)
+            self._layer_list.remove(stored)
+            self._detach_layer(stored)
             if recursive:
-                self._layers[layer.id].clear()
-            del self._layers[layer.id]
+                stored.clear()
             return True
         return False
 
     def clear(self):
+        for layer in self._layers.values():
+            self._detach_layer(layer)
         self._layers.clear()
+        self._layer_list.clear()
         self._filepath = ""
-        self._filename = ""
\ No newline at end of file
+        self._filename = ""
+
+    def _attach_layer(self, layer: DXFLayer):
+        layer._owner = self
+        self._on_layer_entities_changed(len(layer.entities), layer.selected_count)
+        self._selected_layers_count += layer.is_selected
+
+    def _detach_layer(self, layer: DXFLayer):
+        if layer._owner is self:
+            layer._owner = None
+        self._on_layer_entities_changed(-len(layer.entities), -layer.selected_count)
+        self._selected_layers_count -= layer.is_selected
+
+    def _on_layer_selection_changed(self, layer: DXFLayer):
+        self._selected_layers_count += 1 if layer.is_selected else -1
+
+    def _on_layer_entities_changed(self, count_delta: int, selected_delta: int):
+        self._entities_count += count_delta
+        self._selected_entities_count += selected_delta
@@ -6,6 +6,7 @@ from ...domain.entities import DXFBase
 from ...domain.value_objects import DxfEntityType
 
 class DXFEntity(DXFBase):
+    __slots__ = ('_entity_type', '_name', '_attributes', '_geometries', '_extra_data', '_owner', '_ordinal')
         
     def __init__(
         self,
@@ -23,6 +24,9 @@ class DXFEntity(DXFBase):
         self._attributes = attributes or {}
         self._geometries = geometries or {}
         self._extra_data = extra_data or {}
+        self._owner = None
+        # Порядковый номер в слое-владельце (бит в его маске выбора)
+        self._ordinal = -1
     
     @classmethod
     def create(
@@ -37,6 +41,16 @@ class DXFEntity(DXFBase):
     ) -> 'DXFEntity':
         return cls(id, selected, entity_type, name, attributes, geometries, extra_data)
 
+    @staticmethod
+    def normalize_handle(handle: Any) -> str:
+        """Handle в каноническом виде DXF: без пробелов, в верхнем регистре"""
+        return "" if handle is None else str(handle).strip().upper()
+
+    @property
+    def handle(self) -> str:
+        """Нормализованный handle сущности (пустая строка, если его нет)"""
+        return self.normalize_handle(self._attributes.get("handle"))
+
     @property
     def entity_type(self) -> DxfEntityType:
         return self._entity_type
@@ -57,7 +71,18 @@ class DXFEntity(DXFBase):
     def extra_data(self) -> Dict[str, Any]:
         return self._extra_data
 
+    def set_selected(self, value: bool):
+        changed = self._selected != value
+        super().set_selected(value)
+        if changed and self._owner is not None:
+            self._owner._on_entity_selection_changed(self)
+
     def add_attributes(self, attributes: Dict[str, Any]):
+        if self._owner is not None and "handle" in attributes:
+            self._owner._unindex_entity(self)
+            self._attributes.update(attributes)
+            self._owner._index_entity(self)
+            return
         self._attributes.update(attributes)
 
     def add_geometries(self, geometries: Dict[str, Any]):
@@ -68,6 +93,6 @@ class DXFEntity(DXFBase):
 
     def clear(self, recursive: bool = True):
         self._name = ""
-        self._parent = None
+        self._owner = None
         self._attributes.clear()
         self._geometries.clear()
\ No newline at end of file
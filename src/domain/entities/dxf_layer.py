@@ -1,9 +1,15 @@
 
-from typing import Dict, List, Optional
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set
 from uuid import UUID
 from ...domain.entities import DXFBase, DXFEntity
+from ...domain.value_objects import SelectionMask
 
 class DXFLayer(DXFBase):
+    __slots__ = (
+        '_document_id', '_name', '_schema_name', '_table_name',
+        '_entities', '_entity_list', '_entities_by_handle', '_selected_handles',
+        '_selected_count', '_selection_bits', '_owner',
+    )
     
     def __init__(
         self,
@@ -21,7 +27,18 @@ class DXFLayer(DXFBase):
         self._schema_name = schema_name
         self._table_name = table_name
 
-        self._entities = {entity.id: entity for entity in (entities or [])}
+        self._entities: Dict[UUID, DXFEntity] = {}
+        # Те же сущности в порядке entities: позиция в списке - порядковый номер сущности
+        self._entity_list: List[DXFEntity] = []
+        # Индекс нормализованный handle -> сущность и множество handle выбранных сущностей
+        self._entities_by_handle: Dict[str, DXFEntity] = {}
+        self._selected_handles: Set[str] = set()
+        # Число выбранных сущностей поддерживается при set_selected; _owner - документ слоя
+        self._selected_count = 0
+        # Маска выбора: бит i - сущность с порядковым номером i (порядок добавления в слой)
+        self._selection_bits = bytearray()
+        self._owner = None
+        self.add_entities(entities or [])
     
     @classmethod
     def create(
@@ -65,9 +82,60 @@ class DXFLayer(DXFBase):
         """id: entity"""
         return self._entities
 
+    @property
+    def entity_list(self) -> Sequence[DXFEntity]:
+        """Сущности в порядке entities с доступом по индексу (только для чтения)"""
+        return self._entity_list
+
+    @property
+    def selected_count(self) -> int:
+        """Число выбранных сущностей слоя"""
+        return self._selected_count
+
+    @property
+    def selected_handles(self) -> FrozenSet[str]:
+        """Handle выбранных сущностей слоя (поддерживается при set_selected)"""
+        return frozenset(self._selected_handles)
+
+    def selection_mask(self) -> SelectionMask:
+        """Маска выбора сущностей слоя в порядке entities (поддерживается при set_selected)"""
+        return SelectionMask.from_bytes(len(self._entities), self._selection_bits)
+
+    def set_selected(self, value: bool):
+        changed = self._selected != value
+        super().set_selected(value)
+        if changed and self._owner is not None:
+            self._owner._on_layer_selection_changed(self)
+
     def add_entities(self, entities: List[DXFEntity]):
+        count_delta = 0
+        selected_delta = 0
         for entity in entities:
+            previous = self._entities.get(entity.id)
+            if previous is not None:
+                self._unindex_entity(previous)
+                previous._owner = None
+                count_delta -= 1
+                selected_delta -= previous.is_selected
+                # Замена по id сохраняет место в словаре, а значит и порядковый номер
+                entity._ordinal = previous._ordinal
+                self._entity_list[entity._ordinal] = entity
+            else:
+                entity._ordinal = len(self._entities)
+                self._entity_list.append(entity)
             self._entities[entity.id] = entity
+            entity._owner = self
+            self._set_selection_bit(entity)
+            self._index_entity(entity)
+            count_delta += 1
+            selected_delta += entity.is_selected
+
+        self._selected_count += selected_delta
+        if self._owner is not None and (count_delta or selected_delta):
+            self._owner._on_layer_entities_changed(count_delta, selected_delta)
+    
+    def find_entity_by_handle(self, handle: str) -> Optional[DXFEntity]:
+        return self._entities_by_handle.get(DXFEntity.normalize_handle(handle))
     
     def find_entity_by_id(self, entity_id: int) -> Optional[DXFEntity]:
         return self._entities.get(entity_id)
@@ -78,7 +146,55 @@ class DXFLayer(DXFBase):
                 return entity
         return None
     
+    def _index_entity(self, entity: DXFEntity):
+        handle = entity.handle
+        if not handle:
+            return
+        self._entities_by_handle[handle] = entity
+        if entity.is_selected:
+            self._selected_handles.add(handle)
+        else:
+            self._selected_handles.discard(handle)
+
+    def _unindex_entity(self, entity: DXFEntity):
+        handle = entity.handle
+        if handle and self._entities_by_handle.get(handle) is entity:
+            del self._entities_by_handle[handle]
+            self._selected_handles.discard(handle)
+
+    def _set_selection_bit(self, entity: DXFEntity):
+        position = entity._ordinal >> 3
+        if position >= len(self._selection_bits):
+            self._selection_bits.extend(bytes(position + 1 - len(self._selection_bits)))
+        if entity.is_selected:
+            self._selection_bits[position] |= 1 << (entity._ordinal & 7)
+        else:
+            self._selection_bits[position] &= ~(1 << (entity._ordinal & 7)) & 0xFF
+
+    def _on_entity_selection_changed(self, entity: DXFEntity):
+        delta = 1 if entity.is_selected else -1
+        self._selected_count += delta
+        self._set_selection_bit(entity)
+        if self._owner is not None:
+            self._owner._on_layer_entities_changed(0, delta)
+
+        handle = entity.handle
+        if not handle or self._entities_by_handle.get(handle) is not entity:
+            return
+        if entity.is_selected:
+            self._selected_handles.add(handle)
+        else:
+            self._selected_handles.discard(handle)
+
     def clear(self, recursive: bool = True):
+        if self._owner is not None and self._entities:
+            self._owner._on_layer_entities_changed(-len(self._entities), -self._selected_count)
+        for entity in self._entities.values():
+            entity._owner = None
         self.entities.clear()
-        self._parent = None
+        self._entity_list.clear()
+        self._selected_count = 0
+        self._selection_bits = bytearray()
+        self._entities_by_handle.clear()
+        self._selected_handles.clear()
         self._name = None
\ No newline at end of file
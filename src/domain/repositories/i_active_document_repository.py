@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from abc import abstractmethod
-from ...domain.entities import DXFDocument
+from uuid import UUID
+from ...domain.entities import DXFBase, DXFDocument, DXFLayer
 from ...domain.value_objects import Result
 from ...domain.repositories import IRepository
 
@@ -13,6 +14,11 @@ class IActiveDocumentRepository(IRepository[DXFDocument]):
         """Найти активный документ по имени"""
         pass
     
+    @abstractmethod
+    def find_object(self, id: UUID) -> Result[tuple[DXFDocument, DXFLayer | None, DXFBase]]:
+        """Найти документ, слой или сущность по UUID: (документ, слой или None, объект)"""
+        pass
+
     @abstractmethod
     def get_all(self) -> Result[list[DXFDocument]]:
         """Все активные документы"""
@@ -2,13 +2,24 @@ from __future__ import annotations
 
 from abc import abstractmethod
 from uuid import UUID
-from ...domain.value_objects import Result
+from ...domain.value_objects import Result, Unit
 from ...domain.entities import DXFContent
 from ...domain.repositories import IRepository
 
 class IContentRepository(IRepository[DXFContent]):
     """Репозиторий для содержимого файлов"""
 
+    @property
+    @abstractmethod
+    def table_name(self) -> str:
+        """Имя таблицы контента без схемы"""
+        pass
+
     @abstractmethod
     def get_by_document_id(self, document_id: UUID) -> Result[DXFContent | None]:
         pass
+
+    @abstractmethod
+    def link_to_document_table(self, document_table: str) -> Result[Unit]:
+        """Связать контент с таблицей документов внешним ключом ON DELETE CASCADE"""
+        pass
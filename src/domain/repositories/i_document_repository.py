@@ -8,11 +8,22 @@ from ...domain.repositories import IRepository
 class IDocumentRepository(IRepository[DXFDocument]):
     """Репозиторий для документов"""
 
+    @property
+    @abstractmethod
+    def table_name(self) -> str:
+        """Имя таблицы документов без схемы"""
+        pass
+
     @abstractmethod
     def get_by_filename(self, filename: str) -> Result[DXFDocument | None]:
         """Найти по имени"""
         pass
     
+    @abstractmethod
+    def remove_by_filename(self, filename: str, layer_table: str) -> Result[list[tuple[str, str]] | None]:
+        """Удалить документ по имени вместе с контентом и слоями; вернуть таблицы слоев только этого документа"""
+        pass
+
     @abstractmethod
     def get_all(self) -> Result[list[DXFDocument]]:
         """Все сохраненные документы"""
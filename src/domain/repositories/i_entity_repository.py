@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from abc import abstractmethod
+from collections.abc import Iterator
 from ...domain.value_objects import Result, DxfEntityType, Unit
 from ...domain.entities import DXFEntity
 from ...domain.repositories import IRepository
@@ -18,7 +19,33 @@ class IEntityRepository(IRepository[DXFEntity]):
     def get_all(self) -> list[DXFEntity]:
         """Все сохраненные сущности"""
         pass
-    
+
+    @abstractmethod
+    def get_definition_entities(
+        self,
+        extent_wkt: str | None = None,
+        entity_types: list[str] | None = None,
+        srid: int = 0
+    ) -> Result[list[DXFEntity]]:
+        """Сущности с определениями слоев и блоков (по одной на слой и на имя блока), с теми же фильтрами"""
+        pass
+
+    @abstractmethod
+    def iter_batches(
+        self,
+        batch_size: int = 5000,
+        extent_wkt: str | None = None,
+        entity_types: list[str] | None = None,
+        srid: int = 0
+    ) -> Result[Iterator[list[DXFEntity]]]:
+        """Сущности пачками по мере чтения из БД: пересекающие область (WKT) и/или заданных типов"""
+        pass
+
+    @abstractmethod
+    def ensure_spatial_index(self) -> Result[Unit]:
+        """Создать пространственный индекс для фильтров по области (в текущей транзакции)"""
+        pass
+
     @abstractmethod
     def delete_all(self) -> Result:
         """Удалить все сущности из таблицы"""
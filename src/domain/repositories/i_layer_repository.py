@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from abc import abstractmethod
 from uuid import UUID
-from ...domain.value_objects import Result
+from ...domain.value_objects import Result, Unit
 from ...domain.entities import DXFLayer
 from ...domain.repositories import IRepository
 
@@ -10,6 +10,12 @@ from ...domain.repositories import IRepository
 class ILayerRepository(IRepository[DXFLayer]):
     """Репозиторий для слоев"""
 
+    @property
+    @abstractmethod
+    def table_name(self) -> str:
+        """Имя таблицы слоев без схемы"""
+        pass
+
     @abstractmethod
     def get_by_document_id_and_layer_name(self, document_id: UUID, layer_name: str) -> Result[DXFLayer | None]:
         """Получить по док id и имя слоя"""
@@ -24,3 +30,13 @@ class ILayerRepository(IRepository[DXFLayer]):
     def get_all(self) -> Result[list[DXFLayer]]:
         """Все сохраненные слои"""
         pass
+
+    @abstractmethod
+    def get_table_revisions_by_document_id(self, document_id: UUID) -> Result[dict[tuple[str, str], str]]:
+        """Ревизии таблиц слоев документа по данным БД: (схема, таблица) -> ревизия"""
+        pass
+
+    @abstractmethod
+    def link_to_document_table(self, document_table: str) -> Result[Unit]:
+        """Связать слои с таблицей документов внешним ключом ON DELETE CASCADE"""
+        pass
@@ -14,3 +14,8 @@ class IAreaSelector(ABC):
     ) -> Result[list[str]]:
         """Возвращает список handle сущностей, попавших в область выбора."""
         pass
+
+    @abstractmethod
+    def invalidate(self, filepath: str) -> None:
+        """Сбрасывает закэшированные данные выбора (индекс) для файла."""
+        pass
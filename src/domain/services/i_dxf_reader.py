@@ -10,10 +10,15 @@ class IDXFReader(ABC):
         pass
 
     @abstractmethod
-    def save_svg_preview(
+    def release(self, filepath: str) -> None:
+        """Освобождает разобранный документ закрытого файла"""
+        pass
+
+    @abstractmethod
+    def render_svg_preview(
         self,
         filepath: str,
-        output_dir: str,
-        filename: str = "",
+        selected_handles: set[str] | None = None,
+        content: bytes | None = None,
     ) -> Result[str]:
         pass
@@ -1,6 +1,7 @@
 
 from abc import ABC, abstractmethod
-from typing import Sequence
+from collections.abc import Iterable
+from typing import BinaryIO, Sequence
 from ...domain.entities import DXFDocument
 from ...domain.entities import DXFEntity
 from ...domain.value_objects import Result, Unit
@@ -24,7 +25,37 @@ class IDXFWriter(ABC):
         """
         pass
 
+    @abstractmethod
+    def serialize_selected(
+        self,
+        source_filepath: str,
+        selected_handles: set[str],
+        content: bytes | None = None,
+    ) -> Result[bytes]:
+        """Возвращает DXF только с сущностями из selected_handles, не записывая файлов.
+
+        content - содержимое исходного файла, если его документ не открыт.
+        """
+        pass
+
     @abstractmethod
     def reconstruct_from_entities(self, entities: Sequence[DXFEntity]) -> Result[tuple[bytes, str]]:
         """Собирает DXF из сущностей, созданных из таблиц, и возвращает bytes + детальный отчет."""
         pass
+
+    @abstractmethod
+    def write_reconstructed(self, entities: Sequence[DXFEntity], stream: BinaryIO) -> Result[str]:
+        """Собирает DXF из сущностей таблиц и пишет его прямо в двоичный поток, возвращает отчет."""
+        pass
+
+    @abstractmethod
+    def write_reconstructed_batches(
+        self,
+        definitions: Iterable[DXFEntity],
+        batches: Iterable[Sequence[DXFEntity]],
+        stream: BinaryIO,
+    ) -> Result[str]:
+        """Как write_reconstructed, но сущности приходят пачками (читаются один раз), а слои и блоки -
+        заранее из definitions
+        """
+        pass
@@ -2,6 +2,7 @@
 from .connection_config import ConnectionConfig
 from .area_selection import AreaSelectionParams, SelectionMode, SelectionRule, ShapeType
 from .dxf_entity_type import DxfEntityType
+from .selection_mask import SelectionMask
 from .result import Result, Unit
 
 __all__ = [
@@ -10,6 +11,7 @@ __all__ = [
     'SelectionMode',
     'SelectionRule',
     'ShapeType',
+    'SelectionMask',
     'DxfEntityType',
     'Result',
     'Unit'
@@ -9,6 +9,8 @@ class SelectionRule(Enum):
     INSIDE = "inside"
     OUTSIDE = "outside"
     INTERSECT = "intersect"
+    INSIDE_EXACT = "inside_exact"
+    INTERSECT_EXACT = "intersect_exact"
 
 
 class ShapeType(Enum):
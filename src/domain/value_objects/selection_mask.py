@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from .area_selection import SelectionMode
+
+_NONZERO_BYTE = re.compile(rb"[^\x00]")
+# Номера установленных битов для каждого значения байта
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+
+@dataclass(frozen=True)
+class SelectionMask:
+    """
+    Битовая маска выбора сущностей документа: бит i соответствует сущности с порядковым номером i.
+
+    Маска хранится в одном целом числе, поэтому режимы выбора (JOIN/REPLACE/SUBTRACT)
+    и поиск изменившихся сущностей выполняются словами по 64 бита, без обхода сущностей.
+    Постоянные маски выбора ведут слои (DXFLayer.selection_mask).
+    """
+
+    size: int
+    bits: int = 0
+
+    @classmethod
+    def from_ordinals(cls, size: int, ordinals: Iterable[int]) -> SelectionMask:
+        # Биты ставятся в байтовом буфере, в целое число он переводится одним вызовом
+        buffer = bytearray((size + 7) >> 3)
+        for ordinal in ordinals:
+            buffer[ordinal >> 3] |= 1 << (ordinal & 7)
+        return cls.from_bytes(size, buffer)
+
+    @classmethod
+    def from_bytes(cls, size: int, data: bytes | bytearray) -> SelectionMask:
+        """Маска из битового буфера: бит i - младший бит байта i // 8, сдвинутый на i % 8"""
+        return cls(size, int.from_bytes(data, "little"))
+
+    def apply(self, area: SelectionMask, mode: SelectionMode) -> SelectionMask:
+        """Новая маска после применения выбора по области в заданном режиме."""
+        if mode == SelectionMode.JOIN:
+            return SelectionMask(self.size, self.bits | area.bits)
+        if mode == SelectionMode.REPLACE:
+            return SelectionMask(self.size, area.bits)
+        if mode == SelectionMode.SUBTRACT:
+            return SelectionMask(self.size, self.bits & ~area.bits)
+        raise ValueError(f"Unsupported selection mode: {mode}")
+
+    def flipped(self, other: SelectionMask) -> SelectionMask:
+        """Маска сущностей, у которых выбор отличается от other."""
+        return SelectionMask(self.size, self.bits ^ other.bits)
+
+    def any_in_range(self, start: int, count: int) -> bool:
+        return bool((self.bits >> start) & ((1 << count) - 1))
+
+    def ordinals(self) -> Iterator[int]:
+        """Порядковые номера установленных битов по возрастанию; нулевые байты пропускаются без обхода в Python."""
+        data = self.bits.to_bytes((self.size + 7) >> 3, "little")
+        for match in _NONZERO_BYTE.finditer(data):
+            position = match.start()
+            base = position << 3
+            for bit in _BYTE_BITS[data[position]]:
+                yield base + bit
+
+    def count(self) -> int:
+        return bin(self.bits).count("1")
+
+    def __contains__(self, ordinal: int) -> bool:
+        return bool((self.bits >> ordinal) & 1)
@@ -0,0 +1,5 @@
+from .disk_lru_cache import DiskLRUCache
+
+__all__ = [
+    'DiskLRUCache'
+]
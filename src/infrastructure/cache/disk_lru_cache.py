@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+from ...application.interfaces import IFileCache
+
+
+class DiskLRUCache(IFileCache):
+    """
+    Файловый кэш на локальном диске с ограничением суммарного размера.
+
+    Имя файла — хэш ключа. Порядок LRU определяется временем модификации файла:
+    при каждом обращении файл "трогается", при переполнении удаляются самые старые.
+    Запись атомарная (временный файл + os.replace), поэтому читатель никогда
+    не видит недописанный файл.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ""):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._suffix = suffix
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def _path_for(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self._directory, f"{digest}{self._suffix}")
+
+    def get_path(self, key: str) -> str | None:
+        path = self._path_for(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key: str, content: bytes) -> str | None:
+        def write(temp_file) -> None:
+            temp_file.write(content)
+
+        return self._store(key, write)
+
+    def put_file(self, key: str, source_path: str) -> str | None:
+        def write(temp_file) -> None:
+            with open(source_path, "rb") as source_file:
+                shutil.copyfileobj(source_file, temp_file, 1024 * 1024)
+
+        return self._store(key, write)
+
+    def _store(self, key: str, write) -> str | None:
+        path = self._path_for(key)
+        with self._lock:
+            try:
+                os.makedirs(self._directory, exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as temp_file:
+                        write(temp_file)
+                    os.replace(temp_path, path)
+                except Exception:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+            except OSError:
+                return None
+
+            self._evict(keep=path)
+        return path
+
+    def copy_to(self, key: str, destination: str) -> bool:
+        path = self.get_path(key)
+        if path is None:
+            return False
+        try:
+            dir_name = os.path.dirname(destination)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+            shutil.copyfile(path, destination)
+            return True
+        except OSError:
+            return False
+
+    def remove(self, key: str) -> bool:
+        path = self._path_for(key)
+        with self._lock:
+            try:
+                os.remove(path)
+                return True
+            except OSError:
+                return False
+
+    def _evict(self, keep: str) -> None:
+        """Удаляет самые давно использованные файлы, пока кэш больше лимита."""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self._directory) as it:
+                for entry in it:
+                    if not entry.is_file() or entry.name.endswith(".tmp"):
+                        continue
+                    if self._suffix and not entry.name.endswith(self._suffix):
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            return
+
+        if total <= self._max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self._max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
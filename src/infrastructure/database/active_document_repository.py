@@ -1,48 +1,121 @@
-
 from uuid import UUID
-from typing import List, Optional
-from ...domain.entities import DXFDocument
+from typing import Dict, List, Optional, Tuple
+from ...domain.entities import DXFBase, DXFDocument, DXFLayer
 from ...domain.value_objects import Result, Unit
 from ...domain.repositories import IActiveDocumentRepository
 
 class ActiveDocumentRepository(IActiveDocumentRepository):
-    """Репозиторий для активных (открытых) документов в памяти"""
+    """
+    Репозиторий для активных (открытых) документов в памяти.
+
+    Поддерживает индексы UUID -> (документ, слой, объект) и имя файла -> документ,
+    поэтому поиск объекта не требует обхода всех документов, слоев и сущностей.
+    """
 
     def __init__(self):
-        self._documents: List[DXFDocument] = []
+        self._documents: Dict[UUID, DXFDocument] = {}
+        self._by_filename: Dict[str, DXFDocument] = {}
+        self._objects: Dict[UUID, Tuple[DXFDocument, Optional[DXFLayer], DXFBase]] = {}
+        # Для каждого документа: проиндексированные id и число объектов на момент индексации
+        self._indexed_ids: Dict[UUID, List[UUID]] = {}
+        self._indexed_sizes: Dict[UUID, int] = {}
 
     def create(self, entity: DXFDocument) -> Result[DXFDocument]:
-        self._documents.append(entity)
+        self._documents[entity.id] = entity
+        self._by_filename.setdefault(entity.filename, entity)
+        self._index_document(entity)
         return Result.success(entity)
-    
+
     def update(self, entity: DXFDocument) -> Result[DXFDocument]:
-        for idx, doc in enumerate(self._documents):
-            if doc.id == entity.id:
-                self._documents[idx] = entity
-                return Result.success(entity)
-        return Result.fail(f"Document with id {entity.id} not found")
-    
+        current = self._documents.get(entity.id)
+        if current is None:
+            return Result.fail(f"Document with id {entity.id} not found")
+
+        self._documents[entity.id] = entity
+        if current is not entity or current.filename != entity.filename:
+            self._refresh_filename(current.filename)
+            self._by_filename.setdefault(entity.filename, entity)
+        if current is not entity or self._is_stale(entity):
+            self._index_document(entity)
+        return Result.success(entity)
+
     def remove(self, id: UUID) -> Result[Unit]:
-        for idx, doc in enumerate(self._documents):
-            if doc.id == id:
-                del self._documents[idx]
-                return Result.success(Unit())
-        return Result.fail(f"Document with id {id} not found")
-    
+        document = self._documents.pop(id, None)
+        if document is None:
+            return Result.fail(f"Document with id {id} not found")
+
+        self._unindex_document(id)
+        self._refresh_filename(document.filename)
+        return Result.success(Unit())
+
     def get_by_id(self, id: UUID) -> Result[Optional[DXFDocument]]:
-        for doc in self._documents:
-            if doc.id == id:
-                return Result.success(doc)
+        document = self._documents.get(id)
+        if document is not None:
+            return Result.success(document)
         return Result.fail(f"Document with id {id} not found")
 
     def get_by_filename(self, filename: str) -> Result[Optional[DXFDocument]]:
-        for doc in self._documents:
-            if doc.filename == filename:
-                return Result.success(doc)
+        document = self._by_filename.get(filename)
+        if document is not None and document.filename == filename:
+            return Result.success(document)
         return Result.fail(f"Document with filename {filename} not found")
-    
+
+    def find_object(self, id: UUID) -> Result[Tuple[DXFDocument, Optional[DXFLayer], DXFBase]]:
+        located = self._objects.get(id)
+        if located is None:
+            # Объекты могли быть добавлены в документ без update - переиндексируем устаревшие
+            for document in self._documents.values():
+                if self._is_stale(document):
+                    self._index_document(document)
+            located = self._objects.get(id)
+
+        if located is not None:
+            return Result.success(located)
+        return Result.fail(f"Object with id {id} not found")
+
     def get_all(self) -> Result[List[DXFDocument]]:
-        return Result.success(self._documents.copy())
-    
+        return Result.success(list(self._documents.values()))
+
     def count(self) -> Result[int]:
-        return Result.success(len(self._documents))
\ No newline at end of file
+        return Result.success(len(self._documents))
+
+    def _document_size(self, document: DXFDocument) -> int:
+        size = len(document.layers) + sum(len(layer.entities) for layer in document.layers.values())
+        return size + (1 if document.content is not None else 0)
+
+    def _is_stale(self, document: DXFDocument) -> bool:
+        return self._indexed_sizes.get(document.id) != self._document_size(document)
+
+    def _index_document(self, document: DXFDocument):
+        self._unindex_document(document.id)
+
+        ids = [document.id]
+        self._objects[document.id] = (document, None, document)
+        if document.content is not None:
+            ids.append(document.content.id)
+            self._objects[document.content.id] = (document, None, document.content)
+
+        for layer in document.layers.values():
+            ids.append(layer.id)
+            self._objects[layer.id] = (document, layer, layer)
+            for entity_id, entity in layer.entities.items():
+                ids.append(entity_id)
+                self._objects[entity_id] = (document, layer, entity)
+
+        self._indexed_ids[document.id] = ids
+        self._indexed_sizes[document.id] = self._document_size(document)
+
+    def _unindex_document(self, document_id: UUID):
+        for object_id in self._indexed_ids.pop(document_id, []):
+            located = self._objects.get(object_id)
+            if located is not None and located[0].id == document_id:
+                del self._objects[object_id]
+        self._indexed_sizes.pop(document_id, None)
+
+    def _refresh_filename(self, filename: str):
+        """Имя файла указывает на первый открытый документ с этим именем."""
+        self._by_filename.pop(filename, None)
+        for document in self._documents.values():
+            if document.filename == filename:
+                self._by_filename[filename] = document
+                break
@@ -6,6 +6,7 @@ from ....domain.value_objects import Result, Unit
 from ....domain.entities import DXFContent
 from ....domain.repositories import IContentRepository
 from .postgis_connection import PostGISConnection
+from .postgis_document_link import link_to_document_table
 
 
 class PostGISContentRepository(IContentRepository):
@@ -24,6 +25,10 @@ class PostGISContentRepository(IContentRepository):
         self._init_schema()
         self._init_table()
 
+    @property
+    def table_name(self) -> str:
+        return self._table_name
+
     @property  
     def full_name(self) -> str:
         """Полное имя таблицы со схемой"""
@@ -49,6 +54,18 @@ class PostGISContentRepository(IContentRepository):
             if hasattr(result, 'is_fail') and result.is_fail:
                 # Откатываем транзакцию при ошибке инициализации таблицы
                 self._connection.rollback()
+                return
+
+            # Индекс для выборок и агрегатов по документу (legacy-таблица без document_id пропускается)
+            if 'document_id' not in self._get_columns():
+                return
+            index_query = f"""
+                CREATE INDEX IF NOT EXISTS "{self._table_name}_document_id_idx"
+                ON {self.full_name} (document_id)
+            """
+            result = self._connection.execute_query(index_query)
+            if hasattr(result, 'is_fail') and result.is_fail:
+                self._connection.rollback()
         except Exception as e:
             # Откатываем транзакцию при ошибке инициализации таблицы
             try:
@@ -204,3 +221,13 @@ class PostGISContentRepository(IContentRepository):
             
         except Exception as e:
             return Result.fail(f"Failed to get content by document ID: {e}")
+
+    def link_to_document_table(self, document_table: str) -> Result[Unit]:
+        """Добавляет проверенный FK document_id -> {document_table}(id) с ON DELETE CASCADE, если его еще нет"""
+        try:
+            # Legacy-таблица хранит контент в самой таблице файлов
+            if 'document_id' not in self._get_columns():
+                return Result.success(Unit())
+            return link_to_document_table(self._connection, self._schema, self._table_name, document_table)
+        except Exception as e:
+            return Result.fail(f"Failed to link to document table: {e}")
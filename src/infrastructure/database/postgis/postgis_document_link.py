@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from psycopg2 import sql
+
+from ....domain.value_objects import Result, Unit
+from .postgis_connection import PostGISConnection
+
+
+def link_to_document_table(
+    connection: PostGISConnection,
+    schema: str,
+    table_name: str,
+    document_table: str
+) -> Result[Unit]:
+    """
+    Добавляет проверенный FK document_id -> schema.document_table(id) с ON DELETE CASCADE.
+
+    Строки, ссылающиеся на удаленные документы, удаляются до проверки ключа.
+    Ключ, созданный ранее как NOT VALID, проверяется повторно.
+
+    Изменения выполняются под точкой сохранения: при ошибке отменяются только они,
+    незафиксированная работа вызывающей транзакции остается, а откатывать ли ее,
+    решает сессия вызывающего кода.
+    """
+    constraint_name = f"{table_name[:50]}_document_fk"
+    check_query = """
+        SELECT c.convalidated
+        FROM pg_constraint c
+        JOIN pg_class t ON c.conrelid = t.oid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE c.contype = 'f'
+          AND n.nspname = %(schema)s
+          AND t.relname = %(table)s
+          AND c.conname = %(name)s
+        LIMIT 1
+    """
+    check_result = connection.execute_query(check_query, {
+        'schema': schema,
+        'table': table_name,
+        'name': constraint_name,
+    })
+    if check_result.is_fail:
+        return Result.fail(f"Failed to check document foreign key. {check_result.error}")
+    if check_result.value and check_result.value[0].get('convalidated'):
+        return Result.success(Unit())
+
+    identifiers = {
+        'table': sql.Identifier(schema, table_name),
+        'name': sql.Identifier(constraint_name),
+        'documents': sql.Identifier(schema, document_table),
+    }
+    orphans_query = sql.SQL(
+        "DELETE FROM {table} t "
+        "WHERE NOT EXISTS (SELECT 1 FROM {documents} d WHERE d.id = t.document_id)"
+    ).format(**identifiers)
+    validate_query = sql.SQL("ALTER TABLE {table} VALIDATE CONSTRAINT {name}").format(**identifiers)
+
+    queries = [("SAVEPOINT document_link", None), (orphans_query, None)]
+    if not check_result.value:
+        # NOT VALID + VALIDATE: проверка строк не блокирует запись в таблицу
+        alter_query = sql.SQL(
+            "ALTER TABLE {table} ADD CONSTRAINT {name} "
+            "FOREIGN KEY (document_id) REFERENCES {documents} (id) ON DELETE CASCADE NOT VALID"
+        ).format(**identifiers)
+        queries.append((alter_query, None))
+    queries.extend([
+        (validate_query, None),
+        ("RELEASE SAVEPOINT document_link", None),
+    ])
+
+    result = connection.execute_queries(queries)
+    if result.is_fail:
+        connection.execute_query("ROLLBACK TO SAVEPOINT document_link")
+        return Result.fail(f"Failed to create document foreign key. {result.error}")
+    return Result.success(Unit())
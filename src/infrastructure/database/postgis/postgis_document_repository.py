@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from typing import List, Optional
 from uuid import UUID
+from psycopg2 import sql
 from ....domain.entities import DXFDocument
 from ....domain.repositories import IDocumentRepository
 from ....domain.value_objects import Result, Unit
@@ -24,6 +25,10 @@ class PostGISDocumentRepository(IDocumentRepository):
         self._init_schema()
         self._init_table()
     
+    @property
+    def table_name(self) -> str:
+        return self._table_name
+
     @property  
     def full_name(self) -> str:
         """Полное имя таблицы со схемой"""
@@ -120,6 +125,47 @@ class PostGISDocumentRepository(IDocumentRepository):
         except Exception as e:
             return Result.fail(f"Failed to remove document: {e}")
     
+    def remove_by_filename(self, filename: str, layer_table: str) -> Result[Optional[List[tuple[str, str]]]]:
+        """
+        Удаление документа по имени одним запросом DELETE ... RETURNING.
+
+        Контент и записи слоев удаляются каскадно по FK. Таблицы слоев, которыми
+        пользовался только этот документ, читаются в том же запросе до каскада.
+        None, если документа нет.
+        """
+        try:
+            query = sql.SQL("""
+                WITH removed AS (
+                    DELETE FROM {documents} WHERE filename = %(filename)s RETURNING id
+                )
+                SELECT removed.id, l.schema_name, l.table_name
+                FROM removed
+                LEFT JOIN {layers} l
+                  ON l.document_id = removed.id
+                 AND NOT EXISTS (
+                     SELECT 1 FROM {layers} o
+                     WHERE o.schema_name = l.schema_name
+                       AND o.table_name = l.table_name
+                       AND o.document_id <> l.document_id
+                 )
+            """).format(
+                documents=sql.Identifier(self._schema, self._table_name),
+                layers=sql.Identifier(self._schema, layer_table),
+            )
+            result = self._connection.execute_query(query, {'filename': filename})
+            if result.is_fail:
+                return Result.fail(f"Failed to remove document. {result.error}")
+            if not result.value:
+                return Result.success(None)
+            tables = {
+                (row['schema_name'], row['table_name']): None
+                for row in result.value
+                if row.get('table_name')
+            }
+            return Result.success(list(tables))
+        except Exception as e:
+            return Result.fail(f"Failed to remove document: {e}")
+
     def get_by_id(self, id: UUID) -> Result[Optional[DXFDocument]]:
         """Получение документа по UUID"""
         try:
@@ -142,8 +142,9 @@ class PostGISEntityConverter:
         return extra_data
 
     def _get_geometry_value(self, entity: DXFEntity, key: str, default=None):
-        """Безопасное получение значения из geometries"""
-        return entity.geometries.get(key, default)
+        """Безопасное получение значения из geometries (массивы координат NumPy -> списки)"""
+        value = entity.geometries.get(key, default)
+        return value.tolist() if hasattr(value, 'tolist') else value
 
     def _get_attribute_value(self, entity: DXFEntity, key: str, default=None):
         """Безопасное получение значения из attributes"""
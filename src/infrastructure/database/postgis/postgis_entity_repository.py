@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import csv
+import hashlib
 import inject
 import json
+import tempfile
+from itertools import islice
 from uuid import UUID
-from typing import List, Optional, Any
+from typing import Iterator, List, Optional, Any
 from ....domain.value_objects import Result, Unit, DxfEntityType
 from ....domain.entities import DXFEntity
 from ....domain.repositories import IEntityRepository
@@ -13,6 +17,8 @@ from .postgis_entity_converter import PostGISEntityConverter
 
 
 class PostGISEntityRepository(IEntityRepository):
+    # Выгрузка COPY больше этого объема уходит из памяти во временный файл
+    COPY_SPOOL_BYTES = 64 * 1024 * 1024
     
     def __init__(
         self,
@@ -24,6 +30,7 @@ class PostGISEntityRepository(IEntityRepository):
         self._schema = schema
         self._table_name = table_name
         self._converter = PostGISEntityConverter()
+        self._srid: int | None = None
         try:
             self._logger = inject.instance(ILogger)
         except:
@@ -189,6 +196,42 @@ class PostGISEntityRepository(IEntityRepository):
             if self._logger:
                 self._logger.warning(f"Failed to migrate entity table structure for {self.full_name}: {exc}")
     
+    @property
+    def geometry_index_name(self) -> str:
+        """Имя GiST-индекса по geometry (укладывается в лимит 63 символа PostgreSQL)"""
+        digest = hashlib.md5(self._table_name.encode('utf-8')).hexdigest()[:8]
+        return f"{self._table_name[:40]}_geom_{digest}_gix"
+
+    def ensure_spatial_index(self) -> Result[Unit]:
+        """
+        Создает GiST-индекс по geometry для фильтров ST_Intersects, если его еще нет.
+
+        Вызывается при импорте и перед первым экспортом с фильтром по области. Индекс
+        создается в текущей транзакции и фиксируется вместе с ней; ошибка откатывается
+        до точки сохранения и не прерывает вызывающую операцию. Существующий индекс
+        проверяется по каталогу без блокировки таблицы.
+        """
+        exists_result = self._connection.execute_query(
+            "SELECT to_regclass(%(index)s) IS NOT NULL AS index_exists",
+            {'index': f'"{self._schema}"."{self.geometry_index_name}"'}
+        )
+        if exists_result.is_success and exists_result.value and exists_result.value[0].get('index_exists'):
+            return Result.success(Unit())
+
+        query = f"""
+            CREATE INDEX IF NOT EXISTS "{self.geometry_index_name}"
+            ON {self.full_name} USING GIST (geometry)
+        """
+        result = self._connection.execute_queries([
+            ("SAVEPOINT spatial_index", None),
+            (query, None),
+            ("RELEASE SAVEPOINT spatial_index", None),
+        ])
+        if result.is_fail:
+            self._connection.execute_query("ROLLBACK TO SAVEPOINT spatial_index")
+            return Result.fail(f"Failed to create geometry index for {self.full_name}: {result.error}")
+        return Result.success(Unit())
+
     def _make_serializable(self, obj: Any) -> Any:
         """Преобразует non-JSON-serializable объекты в совместимые типы"""
         if obj is None or isinstance(obj, (int, float, str, bool)):
@@ -199,6 +242,10 @@ class PostGISEntityRepository(IEntityRepository):
         
         if isinstance(obj, (list, tuple)):
             return [self._make_serializable(v) for v in obj]
+
+        # Массивы координат NumPy и их скаляры
+        if hasattr(obj, 'tolist'):
+            return obj.tolist()
         
         # Для ezdxf Vec3, Vec2 и похожих объектов с координатами
         if hasattr(obj, 'x') and hasattr(obj, 'y'):
@@ -308,22 +355,24 @@ class PostGISEntityRepository(IEntityRepository):
         except Exception as e:
             return Result.fail(f"Failed to remove layer: {e}")
     
+    def _row_to_entity(self, row: dict) -> DXFEntity:
+        """Собирает сущность из строки таблицы (id, name, data)"""
+        payload = row['data'] if isinstance(row['data'], dict) else json.loads(row['data'])
+        return DXFEntity.create(
+            id=row['id'],
+            entity_type=payload.get('entity_type'),
+            name=row['name'],
+            attributes=payload.get('attributes', {}),
+            geometries=payload.get('geometries', {}),
+            extra_data=payload.get('extra_data', {})
+        )
+
     def get_by_id(self, id: UUID) -> Result[DXFEntity | None]:
         try:
             query = f"SELECT * FROM {self.full_name} WHERE id = %(id)s::uuid"
             result = self._connection.execute_query(query, {'id': str(id)}).value
             if result and len(result) > 0:
-                row = result[0]
-                payload = row['data'] if isinstance(row['data'], dict) else json.loads(row['data'])
-                entity = DXFEntity.create(
-                    id=row['id'],
-                    entity_type=payload.get('entity_type'),
-                    name=row['name'],
-                    attributes=payload.get('attributes', {}),
-                    geometries=payload.get('geometries', {}),
-                    extra_data=payload.get('extra_data', {})
-                )
-                return Result.success(entity)
+                return Result.success(self._row_to_entity(result[0]))
             return Result.success(None)
         except Exception as e:
             return Result.fail(f"Failed to get entity: {e}")
@@ -334,18 +383,7 @@ class PostGISEntityRepository(IEntityRepository):
             result = self._connection.execute_query(query, {'name': str(name), 'entity_type': type.value}).value
             
             if result and len(result) > 0:
-                row = result[0]
-                payload = row['data'] if isinstance(row['data'], dict) else json.loads(row['data'])
-                
-                entity = DXFEntity.create(
-                    id=row['id'],
-                    entity_type=payload.get('entity_type'),
-                    name=row['name'],
-                    attributes=payload.get('attributes', {}),
-                    geometries=payload.get('geometries', {}),
-                    extra_data=payload.get('extra_data', {})
-                )
-                return Result.success(entity)
+                return Result.success(self._row_to_entity(result[0]))
             
             return Result.success(None)
         except Exception as e:
@@ -355,23 +393,144 @@ class PostGISEntityRepository(IEntityRepository):
         try:
             query = f"SELECT * FROM {self.full_name}"
             result = self._connection.execute_query(query).value
-            entities = []
-            for row in result:
-                payload = row['data'] if isinstance(row['data'], dict) else json.loads(row['data'])
-                
-                entity = DXFEntity.create(
-                    id=row['id'],
-                    entity_type=payload.get('entity_type'),
-                    name=row['name'],
-                    attributes=payload.get('attributes', {}),
-                    geometries=payload.get('geometries', {}),
-                    extra_data=payload.get('extra_data', {})
-                )
-                entities.append(entity)
-            return Result.success(entities)
+            return Result.success([self._row_to_entity(row) for row in result])
         except Exception as e:
             return Result.fail(f"Failed to get all entities: {e}")
     
+    def _decode_rows(self, rows: list[list[str]]) -> list[DXFEntity]:
+        """Собирает сущности из строк COPY (id, name, data)"""
+        loads = json.loads
+        create = DXFEntity.create
+        entities = []
+        for entity_id, name, data in rows:
+            payload = loads(data) if data else {}
+            entities.append(create(
+                id=UUID(entity_id),
+                entity_type=payload.get('entity_type'),
+                name=name,
+                attributes=payload.get('attributes', {}),
+                geometries=payload.get('geometries', {}),
+                extra_data=payload.get('extra_data', {})
+            ))
+        return entities
+
+    def get_definition_entities(
+        self,
+        extent_wkt: str | None = None,
+        entity_types: list[str] | None = None,
+        srid: int = 0
+    ) -> Result[List[DXFEntity]]:
+        """
+        По одной сущности на слой (с layer_dxf_attribs) и на имя блока INSERT.
+
+        Запрос возвращает единицы строк, поэтому писатель DXF получает таблицы слоев
+        и блоки до потокового чтения самих сущностей.
+        """
+        try:
+            where, params = self._filter_clause(extent_wkt, entity_types, srid)
+            condition = f"{where} AND" if where else " WHERE"
+            query = f"""
+                SELECT DISTINCT ON (definition_key) id, name, data
+                FROM (
+                    SELECT id, name, data, false AS has_block,
+                           'layer:' || COALESCE(data->'extra_data'->>'layer_name', data->'attributes'->>'layer', '') AS definition_key
+                    FROM {self.full_name}{condition} data->'extra_data' ? 'layer_dxf_attribs'
+                    UNION ALL
+                    SELECT id, name, data, data->'extra_data' ? 'block_entities',
+                           'block:' || COALESCE(data->'attributes'->>'name', data->'extra_data'->'dxf_attribs'->>'name', '')
+                    FROM {self.full_name}{condition} data->>'entity_type' = 'INSERT'
+                ) AS definitions
+                ORDER BY definition_key, has_block DESC
+            """
+            result = self._connection.execute_query(query, params)
+            if result.is_fail:
+                return Result.fail(f"Failed to get layer and block definitions. {result.error}")
+            return Result.success([self._row_to_entity(row) for row in result.value])
+        except Exception as e:
+            return Result.fail(f"Failed to get layer and block definitions: {e}")
+
+    def iter_batches(
+        self,
+        batch_size: int = 5000,
+        extent_wkt: str | None = None,
+        entity_types: list[str] | None = None,
+        srid: int = 0
+    ) -> Result[Iterator[List[DXFEntity]]]:
+        """
+        Сущности пачками через COPY ... TO STDOUT (CSV) с фильтрами по области и типам.
+
+        Строки не проходят через курсор построчно: COPY выгружает их в буфер (в памяти,
+        а сверх COPY_SPOOL_BYTES - во временном файле), который разбирается пачками.
+        Геометрия не выгружается: сущности восстанавливаются из data. Чтение начинается
+        при обходе итератора; ошибка БД при обходе выбрасывается исключением.
+        """
+        native = self._connection.get_connection() if hasattr(self._connection, 'get_connection') else None
+        if native is None:
+            return Result.fail("No active database connection")
+
+        where, params = self._filter_clause(extent_wkt, entity_types, srid)
+        query = f"SELECT id, name, data FROM {self.full_name}{where}"
+
+        def batches() -> Iterator[List[DXFEntity]]:
+            with tempfile.SpooledTemporaryFile(max_size=self.COPY_SPOOL_BYTES) as buffer:
+                with native.cursor() as cursor:
+                    select = cursor.mogrify(query, params or None).decode('utf-8')
+                    cursor.copy_expert(
+                        f"COPY ({select}) TO STDOUT WITH (FORMAT csv, ENCODING 'UTF8')",
+                        buffer
+                    )
+                buffer.seek(0)
+                reader = csv.reader(line.decode('utf-8') for line in buffer)
+                while True:
+                    rows = list(islice(reader, batch_size))
+                    if not rows:
+                        break
+                    yield self._decode_rows(rows)
+
+        return Result.success(batches())
+
+    def _filter_clause(
+        self,
+        extent_wkt: str | None,
+        entity_types: list[str] | None,
+        srid: int
+    ) -> tuple[str, dict[str, Any]]:
+        conditions = []
+        params: dict[str, Any] = {}
+
+        if extent_wkt:
+            # Область приводится к SRID геометрий таблицы; константное выражение
+            # позволяет планировщику использовать GiST-индекс
+            table_srid = self._geometry_srid()
+            if srid and table_srid and int(srid) != table_srid:
+                extent_sql = "ST_Transform(ST_GeomFromText(%(extent)s, %(srid)s), %(table_srid)s)"
+            else:
+                # SRID области не задан или у таблицы его нет: координаты считаются общими
+                extent_sql = "ST_GeomFromText(%(extent)s, %(table_srid)s)"
+            conditions.append(f"ST_Intersects(geometry, {extent_sql})")
+            params['extent'] = extent_wkt
+            params['srid'] = int(srid)
+            params['table_srid'] = table_srid
+
+        if entity_types:
+            conditions.append("data->>'entity_type' = ANY(%(entity_types)s)")
+            params['entity_types'] = [str(t).upper() for t in entity_types]
+
+        if not conditions:
+            return "", params
+        return " WHERE " + " AND ".join(conditions), params
+
+    def _geometry_srid(self) -> int:
+        """SRID геометрий таблицы (0, если он не задан или таблица пуста)"""
+        if self._srid is None:
+            result = self._connection.execute_query(
+                f"SELECT ST_SRID(geometry) AS srid FROM {self.full_name} WHERE geometry IS NOT NULL LIMIT 1"
+            )
+            if result.is_fail:
+                return 0
+            self._srid = int(result.value[0].get('srid') or 0) if result.value else 0
+        return self._srid
+
     def delete_all(self) -> Result[Unit]:
         """Удалить все сущности из таблицы"""
         try:
@@ -2,10 +2,13 @@ from __future__ import annotations
 
 from uuid import UUID
 from typing import List, Optional
+
+from psycopg2 import sql
 from ....domain.value_objects import Result, Unit
 from ....domain.entities import DXFLayer
 from ....domain.repositories import ILayerRepository
 from .postgis_connection import PostGISConnection
+from .postgis_document_link import link_to_document_table
 
 
 class PostGISLayerRepository(ILayerRepository):
@@ -24,6 +27,10 @@ class PostGISLayerRepository(ILayerRepository):
         self._init_schema()
         self._init_table()
 
+    @property
+    def table_name(self) -> str:
+        return self._table_name
+
     @property  
     def full_name(self) -> str:
         """Полное имя таблицы со схемой"""
@@ -51,6 +58,16 @@ class PostGISLayerRepository(ILayerRepository):
             if hasattr(result, 'is_fail') and result.is_fail:
                 # Откатываем транзакцию при ошибке инициализации таблицы
                 self._connection.rollback()
+                return
+
+            # Индекс для выборок и агрегатов по документу
+            index_query = f"""
+                CREATE INDEX IF NOT EXISTS "{self._table_name}_document_id_idx"
+                ON {self.full_name} (document_id)
+            """
+            result = self._connection.execute_query(index_query)
+            if hasattr(result, 'is_fail') and result.is_fail:
+                self._connection.rollback()
         except Exception as e:
             # Откатываем транзакцию при ошибке инициализации таблицы
             try:
@@ -205,4 +222,53 @@ class PostGISLayerRepository(ILayerRepository):
             return Result.success(layers)
         except Exception as e:
             return Result.fail(f"Failed to get all layers: {e}")
-    
+
+    def get_table_revisions_by_document_id(self, document_id: UUID) -> Result[dict[tuple[str, str], str]]:
+        """
+        Ревизии таблиц слоев документа: число строк и максимальный xmin каждой таблицы.
+
+        Их поддерживает сам PostgreSQL: любая вставка или изменение строки дает новый xmin,
+        удаление уменьшает число строк. Поэтому правки таблицы в QGIS или SQL меняют
+        ревизию так же, как импорт. Все таблицы читаются одним запросом UNION ALL.
+        """
+        try:
+            tables_query = f"""
+                SELECT DISTINCT schema_name, table_name
+                FROM {self.full_name}
+                WHERE document_id = %(document_id)s
+            """
+            tables_result = self._connection.execute_query(tables_query, {'document_id': str(document_id)})
+            if tables_result.is_fail:
+                return Result.fail(f"Failed to get layer tables. {tables_result.error}")
+
+            tables = [(row['schema_name'], row['table_name']) for row in tables_result.value]
+            if not tables:
+                return Result.success({})
+
+            revisions_query = sql.SQL(" UNION ALL ").join(
+                sql.SQL(
+                    "SELECT {schema} AS schema_name, {table} AS table_name, count(*) AS row_count, "
+                    "max(xmin::text::bigint) AS max_xmin FROM {full_name}"
+                ).format(
+                    schema=sql.Literal(schema_name),
+                    table=sql.Literal(table_name),
+                    full_name=sql.Identifier(schema_name, table_name),
+                )
+                for schema_name, table_name in tables
+            )
+            result = self._connection.execute_query(revisions_query)
+            if result.is_fail:
+                return Result.fail(f"Failed to get layer table revisions. {result.error}")
+            return Result.success({
+                (row['schema_name'], row['table_name']): f"{row['row_count']}:{row['max_xmin'] or 0}"
+                for row in result.value
+            })
+        except Exception as e:
+            return Result.fail(f"Failed to get layer table revisions: {e}")
+
+    def link_to_document_table(self, document_table: str) -> Result[Unit]:
+        """Добавляет проверенный FK document_id -> {document_table}(id) с ON DELETE CASCADE, если его еще нет"""
+        try:
+            return link_to_document_table(self._connection, self._schema, self._table_name, document_table)
+        except Exception as e:
+            return Result.fail(f"Failed to link to document table: {e}")
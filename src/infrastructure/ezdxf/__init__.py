@@ -1,9 +1,11 @@
 from .dxf_reader import DXFReader
 from .dxf_writer import DXFWriter
 from .area_selector import EzdxfAreaSelector
+from .drawing_store import EzdxfDrawingStore
 
 __all__ = [
     'DXFReader',
     'DXFWriter',
-    'EzdxfAreaSelector'
+    'EzdxfAreaSelector',
+    'EzdxfDrawingStore'
 ]
@@ -1,37 +1,83 @@
 from __future__ import annotations
 
-import ezdxf
-from ezdxf import select
+import os
+import threading
+from collections.abc import Callable
+
+import shapely
 
 from ...domain.services import IAreaSelector
-from ...domain.value_objects import Result, AreaSelectionParams, ShapeType, SelectionRule
+from ...domain.value_objects import Result, AreaSelectionParams, ShapeType
+from .drawing_store import EzdxfDrawingStore, load_drawing
+from .entity_spatial_index import EntitySpatialIndex
 
 
 class EzdxfAreaSelector(IAreaSelector):
+    """
+    Выбор сущностей по области через пространственный индекс габаритов.
+
+    Правила INSIDE/OUTSIDE/INTERSECT сравнивают габариты, точные правила
+    (INSIDE_EXACT/INTERSECT_EXACT) дополнительно проверяют реальную геометрию кандидатов.
+
+    Индекс строится лениво при первом выборе в документе и хранится до закрытия
+    документа (invalidate) или изменения файла на диске. Источник индекса и точной
+    геометрии - документ открытого файла из хранилища; файл читается с диска, только
+    если документа в хранилище нет, и этот документ не удерживается после выбора.
+    """
+
+    def __init__(self, store: EzdxfDrawingStore | None = None):
+        self._store = store or EzdxfDrawingStore()
+        self._indexes: dict[str, tuple[float, EntitySpatialIndex]] = {}
+        self._lock = threading.Lock()
+
     def select_handles(
         self,
         filepath: str,
         params: AreaSelectionParams,
     ) -> Result[list[str]]:
         try:
-            drawing = ezdxf.readfile(filepath)
-            model_space = drawing.modelspace()
-
             shape = self._build_shape(params)
-            selector = self._get_selector(params.selection_rule)
-
-            handles = [
-                str(getattr(entity.dxf, "handle", ""))
-                for entity in selector(shape, model_space)
-            ]
-            handles = [handle.strip().lower() for handle in handles if handle]
-            return Result.success(handles)
+            with self._store.locked(filepath) as drawing:
+                index = self._get_index(filepath, drawing)
+                return Result.success(index.query(shape, params.selection_rule, self._resolver(filepath, drawing)))
         except Exception as e:
             return Result.fail(
                 f"EzdxfAreaSelector failed: file='{filepath}', shape={params.shape_type.value}, "
                 f"rule={params.selection_rule.value}, args_count={len(params.shape_args)}, error={e}"
             )
 
+    def invalidate(self, filepath: str) -> None:
+        with self._lock:
+            self._indexes.pop(self._key(filepath), None)
+
+    def _key(self, filepath: str) -> str:
+        return os.path.normcase(os.path.abspath(filepath))
+
+    def _get_index(self, filepath: str, drawing) -> EntitySpatialIndex:
+        key = self._key(filepath)
+        mtime = os.path.getmtime(filepath)
+
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+            source = drawing if drawing is not None else load_drawing(filepath)
+            index = EntitySpatialIndex.from_modelspace(source.modelspace())
+            self._indexes[key] = (mtime, index)
+            return index
+
+    def _resolver(self, filepath: str, drawing) -> Callable:
+        """Сущность по handle для точных правил; без открытого документа файл читается при первом запросе"""
+        source = [drawing]
+
+        def resolve(handle: str):
+            if source[0] is None:
+                source[0] = load_drawing(filepath)
+            return source[0].entitydb.get(str(handle).upper())
+
+        return resolve
+
     def _build_shape(self, params: AreaSelectionParams):
         shape_args = params.shape_args
 
@@ -39,7 +85,7 @@ class EzdxfAreaSelector(IAreaSelector):
             if len(shape_args) != 4:
                 raise ValueError("Rectangle requires x_min, x_max, y_min, y_max")
             x_min, x_max, y_min, y_max = shape_args
-            return select.Window((float(x_min), float(y_min)), (float(x_max), float(y_max)))
+            return shapely.box(float(x_min), float(y_min), float(x_max), float(y_max))
 
         if params.shape_type == ShapeType.CIRCLE:
             if len(shape_args) != 2:
@@ -49,26 +95,14 @@ class EzdxfAreaSelector(IAreaSelector):
             if hasattr(center_point, "x") and hasattr(center_point, "y"):
                 center = (float(center_point.x()), float(center_point.y()))
             else:
-                center = center_point
+                center = (float(center_point[0]), float(center_point[1]))
 
-            return select.Circle(center, float(radius))
+            return shapely.Point(center).buffer(float(radius), quad_segs=64)
 
         if params.shape_type == ShapeType.POLYGON:
             if len(shape_args) != 1:
                 raise ValueError("Polygon requires sequence of points")
-            points = shape_args[0]
-            return select.Polygon(points)
+            points = [(float(point[0]), float(point[1])) for point in shape_args[0]]
+            return shapely.Polygon(points)
 
         raise ValueError(f"Unsupported shape type: {params.shape_type}")
-
-    def _get_selector(self, selection_rule: SelectionRule):
-        selectors = {
-            SelectionRule.INSIDE: select.bbox_inside,
-            SelectionRule.OUTSIDE: select.bbox_outside,
-            SelectionRule.INTERSECT: select.bbox_overlap,
-        }
-
-        if selection_rule not in selectors:
-            raise ValueError(f"Unsupported selection rule: {selection_rule}")
-
-        return selectors[selection_rule]
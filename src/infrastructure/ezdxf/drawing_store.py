@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import io
+import os
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+import ezdxf
+from ezdxf.document import Drawing
+from ezdxf.entities import DXFEntity
+from ezdxf.lldxf.tagger import binary_tags_loader
+from ezdxf.filemanagement import dxf_stream_info
+
+# Сигнатура двоичного DXF
+BINARY_DXF_SENTINEL = b"AutoCAD Binary DXF\r\n\x1a\x00"
+
+
+class EzdxfDrawingStore:
+    """
+    Разобранные документы ezdxf открытых файлов: один документ на файл.
+
+    Документ кладется при открытии файла и переиспользуется фильтрацией, отрисовкой
+    превью и сериализацией вместо повторного чтения файла. Запись сверяется со временем
+    изменения файла, поэтому измененный на диске файл не подменяется старым документом.
+    Операции, временно меняющие документ (фильтрация модели), выполняются под lock.
+    """
+
+    def __init__(self):
+        self._drawings: dict[str, tuple[float, Drawing, threading.RLock]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, filepath: str, drawing: Drawing) -> None:
+        key = self._key(filepath)
+        try:
+            mtime = os.path.getmtime(filepath)
+        except OSError:
+            return
+        with self._lock:
+            self._drawings[key] = (mtime, drawing, threading.RLock())
+
+    def get(self, filepath: str) -> Drawing | None:
+        entry = self._entry(filepath)
+        return entry[1] if entry else None
+
+    def discard(self, filepath: str) -> None:
+        with self._lock:
+            self._drawings.pop(self._key(filepath), None)
+
+    @contextmanager
+    def locked(self, filepath: str) -> Iterator[Drawing | None]:
+        """Документ файла с исключительным доступом или None, если его нет в хранилище"""
+        entry = self._entry(filepath)
+        if entry is None:
+            yield None
+            return
+        with entry[2]:
+            yield entry[1]
+
+    def _entry(self, filepath: str) -> tuple[float, Drawing, threading.RLock] | None:
+        if not filepath:
+            return None
+        key = self._key(filepath)
+        with self._lock:
+            entry = self._drawings.get(key)
+        if entry is None:
+            return None
+        try:
+            if os.path.getmtime(filepath) != entry[0]:
+                self.discard(filepath)
+                return None
+        except OSError:
+            # Файл удален: документ в памяти остается актуальным для открытого файла
+            pass
+        return entry
+
+    def _key(self, filepath: str) -> str:
+        return os.path.normcase(os.path.abspath(filepath))
+
+
+def load_drawing(filepath: str = "", content: bytes | None = None) -> Drawing:
+    """Разбирает DXF из памяти, если передано содержимое, иначе с диска"""
+    if content is None:
+        return ezdxf.readfile(filepath)
+
+    if content.startswith(BINARY_DXF_SENTINEL):
+        return Drawing.load(binary_tags_loader(content))
+
+    data = content.replace(b"\r\n", b"\n")
+    # Кодировка задается в HEADER, который всегда в ASCII
+    info = dxf_stream_info(io.StringIO(data.decode("utf-8", errors="ignore")))
+    return ezdxf.read(io.StringIO(data.decode(info.encoding, errors="surrogateescape")))
+
+
+def handle_filter(selected_handles: set[str] | None) -> Callable[[DXFEntity], bool] | None:
+    """Предикат отбора сущностей по handle; None, если отбирать не нужно"""
+    normalized = {h.strip().upper() for h in selected_handles or () if h.strip()}
+    if not normalized:
+        return None
+    return lambda entity: str(getattr(entity.dxf, "handle", "")).strip().upper() in normalized
+
+
+@contextmanager
+def modelspace_subset(drawing: Drawing, selected_handles: set[str] | None) -> Iterator[int]:
+    """
+    Временно оставляет в модели только сущности с выбранными handle.
+
+    Возвращает число скрытых сущностей. Документ не изменяется: список сущностей модели
+    подменяется на время блока и восстанавливается при выходе.
+    """
+    is_selected = handle_filter(selected_handles)
+    if is_selected is None:
+        yield 0
+        return
+
+    entity_space = drawing.modelspace().entity_space
+    original = entity_space.entities
+    entity_space.entities = [entity for entity in original if is_selected(entity)]
+    try:
+        yield len(original) - len(entity_space.entities)
+    finally:
+        entity_space.entities = original
+
+
+@contextmanager
+def text_writer(drawing: Drawing, stream: io.IOBase) -> Iterator[io.TextIOWrapper]:
+    """Текстовый поток ASCII DXF поверх двоичного (файл или BytesIO) в кодировке документа"""
+    text_stream = io.TextIOWrapper(stream, encoding=drawing.output_encoding, errors="dxfreplace", newline="")
+    try:
+        yield text_stream
+        text_stream.flush()
+    finally:
+        # Поток принадлежит вызывающему коду и не должен закрываться вместе с оберткой
+        text_stream.detach()
+
+
+def write_drawing(drawing: Drawing, stream: io.IOBase) -> None:
+    """Пишет ASCII DXF в двоичный поток без временных файлов"""
+    with text_writer(drawing, stream) as text_stream:
+        drawing.write(text_stream)
+
+
+def drawing_to_bytes(drawing: Drawing) -> bytes:
+    buffer = io.BytesIO()
+    write_drawing(drawing, buffer)
+    return buffer.getvalue()
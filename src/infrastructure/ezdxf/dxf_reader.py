@@ -1,12 +1,18 @@
 
 import os
+import sys
+from contextlib import contextmanager
 import ezdxf
+import numpy as np
 from ezdxf.addons.drawing import Frontend, RenderContext, layout, svg
 from ezdxf.entities import DXFEntity as EzDXFEntity
 from ezdxf.math import Vec3
 from ...domain.value_objects import Result, DxfEntityType
 from ...domain.entities import DXFDocument, DXFContent, DXFLayer, DXFEntity
 from ...domain.services import IDXFReader
+from ...application.dtos import PreviewRenderOptionsDTO
+from .drawing_store import EzdxfDrawingStore, handle_filter, load_drawing
+from .raster_preview import RasterPreviewRenderer
 
 class DXFReader(IDXFReader):
     """
@@ -14,8 +20,13 @@ class DXFReader(IDXFReader):
     
     Выполняет полную экстракцию всех необходимых геометрических и атрибутивных
     данных из DXF сущностей для корректной конвертации в PostGIS формат.
+    Разобранный документ остается в хранилище, пока файл открыт: превью
+    строятся по нему без повторного чтения файла.
     """
 
+    def __init__(self, store: EzdxfDrawingStore | None = None):
+        self._store = store or EzdxfDrawingStore()
+
     def open(self, filepath: str) -> Result[DXFDocument]:
         try:
             # Открываем DXF файл с помощью ezdxf и выполняем базовую проверку
@@ -26,6 +37,9 @@ class DXFReader(IDXFReader):
             self._drawing = drawing
             # track visited blocks to avoid infinite recursion when blocks reference other blocks
             self._visited_blocks = set()
+            # Общие для всех сущностей словари стилей слоев и сериализованных блоков
+            self._layer_styles = {}
+            self._block_payloads = {}
 
             filename = os.path.basename(filepath)
 
@@ -75,8 +89,11 @@ class DXFReader(IDXFReader):
                     
                     # Добавляем сущность в слой
                     layer.add_entities([entity])
+            self._store.put(filepath, drawing)
             # clear drawing reference and visited state
             self._drawing = None
+            self._layer_styles = {}
+            self._block_payloads = {}
             try:
                 del self._visited_blocks
             except Exception:
@@ -88,7 +105,7 @@ class DXFReader(IDXFReader):
 
     def _extract_base_attributes(self, dxfentity: EzDXFEntity, entity: DXFEntity):
         """Извлекает базовые атрибуты DXF сущности"""
-        attributes = dxfentity.dxfattribs()
+        attributes = self._intern_dict(dxfentity.dxfattribs())
         
         # Добавляем базовые DXF атрибуты
         attributes['color'] = dxfentity.dxf.color
@@ -109,7 +126,7 @@ class DXFReader(IDXFReader):
         
         for key, value in attributes.items():
             if hasattr(value, "x"): # Векторы
-                extra_data["dxf_attribs"][key] = [value.x, getattr(value, "y", 0.0), getattr(value, "z", 0.0)]
+                extra_data["dxf_attribs"][key] = (value.x, getattr(value, "y", 0.0), getattr(value, "z", 0.0))
             elif isinstance(value, (int, float, str, bool, list, tuple)):
                 extra_data["dxf_attribs"][key] = value
             else:
@@ -118,33 +135,62 @@ class DXFReader(IDXFReader):
         # Preserve source layer style so ByLayer entities keep visual appearance after TABLES reconstruction.
         try:
             layer_name = str(getattr(dxfentity.dxf, 'layer', '') or '')
-            if layer_name and hasattr(self, '_drawing') and self._drawing is not None and layer_name in self._drawing.layers:
-                layer = self._drawing.layers.get(layer_name)
-                layer_attribs = {}
-                for key in ('color', 'linetype', 'lineweight', 'plot', 'true_color', 'transparency', 'ltscale'):
-                    try:
-                        value = getattr(layer.dxf, key)
-                    except Exception:
-                        continue
-
-                    if value is None:
-                        continue
-
-                    if hasattr(value, 'x'):
-                        layer_attribs[key] = [value.x, getattr(value, 'y', 0.0), getattr(value, 'z', 0.0)]
-                    elif isinstance(value, (int, float, str, bool, list, tuple)):
-                        layer_attribs[key] = value
-                    else:
-                        layer_attribs[key] = str(value)
-
-                if layer_attribs:
-                    extra_data['layer_name'] = layer_name
-                    extra_data['layer_dxf_attribs'] = layer_attribs
+            layer_attribs = self._get_layer_style(layer_name) if layer_name else None
+            if layer_attribs:
+                extra_data['layer_name'] = sys.intern(layer_name)
+                extra_data['layer_dxf_attribs'] = layer_attribs
         except Exception:
             pass
                 
         entity.add_extra_data(extra_data)
 
+    def _get_layer_style(self, layer_name: str) -> dict | None:
+        """Стиль слоя источника; один словарь на слой, общий для всех его сущностей"""
+        layer_styles = getattr(self, '_layer_styles', None)
+        if layer_styles is not None and layer_name in layer_styles:
+            return layer_styles[layer_name]
+
+        if not (hasattr(self, '_drawing') and self._drawing is not None and layer_name in self._drawing.layers):
+            return None
+
+        layer = self._drawing.layers.get(layer_name)
+        layer_attribs = {}
+        for key in ('color', 'linetype', 'lineweight', 'plot', 'true_color', 'transparency', 'ltscale'):
+            try:
+                value = getattr(layer.dxf, key)
+            except Exception:
+                continue
+
+            if value is None:
+                continue
+
+            if hasattr(value, 'x'):
+                layer_attribs[key] = (value.x, getattr(value, 'y', 0.0), getattr(value, 'z', 0.0))
+            elif isinstance(value, (int, float, str, bool, list, tuple)):
+                layer_attribs[key] = value
+            else:
+                layer_attribs[key] = str(value)
+
+        layer_attribs = self._intern_dict(layer_attribs) or None
+        if layer_styles is not None:
+            layer_styles[layer_name] = layer_attribs
+        return layer_attribs
+
+    def _intern_dict(self, values: dict) -> dict:
+        """Интернирует ключи и короткие строковые значения (слой, тип линии, стиль повторяются у тысяч сущностей)"""
+        return {
+            sys.intern(key) if isinstance(key, str) else key:
+                sys.intern(value) if isinstance(value, str) and len(value) <= 64 else value
+            for key, value in values.items()
+        }
+
+    def _points_array(self, points) -> np.ndarray:
+        """Координаты вершин компактным массивом float64 (N x k) вместо списка списков"""
+        rows = [tuple(point) for point in points]
+        if not rows:
+            return np.empty((0, 3), dtype=np.float64)
+        return np.array(rows, dtype=np.float64)
+
     def _extract_geometry_data(self, dxfentity: EzDXFEntity, entity: DXFEntity):
         """Извлекает все геометрические данные в зависимости от типа сущности"""
         entity_type = dxfentity.dxftype()
@@ -208,7 +254,7 @@ class DXFReader(IDXFReader):
 
     def _extract_polyline_data(self, dxfentity: EzDXFEntity, entity: DXFEntity):
         """POLYLINE"""
-        points = [self._vec3_to_list(v) for v in dxfentity.points()]
+        points = self._points_array(dxfentity.points())
         geometry = {
             'points': points,
             'is_closed': dxfentity.is_closed
@@ -218,12 +264,10 @@ class DXFReader(IDXFReader):
 
     def _extract_lwpolyline_data(self, dxfentity: EzDXFEntity, entity: DXFEntity):
         """LWPOLYLINE"""
-        points = []
         try:
-            for point in dxfentity.get_points("xyseb"):
-                points.append(list(point))
+            points = self._points_array(dxfentity.get_points("xyseb"))
         except Exception:
-            points = [list(v) for v in dxfentity.vertices_in_ocs()]
+            points = self._points_array(dxfentity.vertices_in_ocs())
         geometry = {
             'points': points,
             'is_closed': dxfentity.is_closed,
@@ -277,7 +321,7 @@ class DXFReader(IDXFReader):
     def _extract_spline_data(self, dxfentity: EzDXFEntity, entity: DXFEntity):
         """SPLINE"""
         try:
-            points = [list(v) for v in dxfentity.flattening(0.01)]
+            points = self._points_array(dxfentity.flattening(0.01))
             geometry = {
                 'points': points,
                 'degree': dxfentity.dxf.degree
@@ -367,12 +411,21 @@ class DXFReader(IDXFReader):
         # If the referenced block exists in the drawing, serialize its entities recursively.
         try:
             block_name = dxfentity.dxf.name
-            serialized = self._serialize_block_entities(block_name)
+            serialized = self._get_block_payload(block_name)
             # Keep block name even if serialized content is empty, so writer can create placeholder definition.
             entity.add_extra_data({'block_name': block_name, 'block_entities': serialized or []})
         except Exception:
             pass
 
+    def _get_block_payload(self, block_name: str) -> list[dict]:
+        """Сериализованное содержимое блока; один список на блок, общий для всех его вставок"""
+        block_payloads = getattr(self, '_block_payloads', None)
+        if block_payloads is None or block_name in getattr(self, '_visited_blocks', ()):
+            return self._serialize_block_entities(block_name)
+        if block_name not in block_payloads:
+            block_payloads[block_name] = self._serialize_block_entities(block_name)
+        return block_payloads[block_name]
+
     def _serialize_block_entities(self, block_name: str) -> list[dict]:
         if not (hasattr(self, '_drawing') and self._drawing is not None):
             return []
@@ -415,7 +468,7 @@ class DXFReader(IDXFReader):
             if dxfentity.dxftype() == 'INSERT':
                 nested_block_name = getattr(dxfentity.dxf, 'name', '')
                 if nested_block_name:
-                    nested = self._serialize_block_entities(nested_block_name)
+                    nested = self._get_block_payload(nested_block_name)
                     payload['block_name'] = nested_block_name
                     payload['block_entities'] = nested or []
 
@@ -721,30 +774,57 @@ class DXFReader(IDXFReader):
         except:
             pass
 
-    def save_svg_preview(
+    def release(self, filepath: str) -> None:
+        self._store.discard(filepath)
+
+    def render_svg_preview(
         self,
         filepath: str,
-        output_dir: str,
-        filename: str = "",
+        selected_handles: set[str] | None = None,
+        content: bytes | None = None,
     ) -> Result[str]:
-        if not filepath:
+        if not filepath and content is None:
             return Result.fail("Empty filepath")
 
         try:
-            os.makedirs(output_dir, exist_ok=True)
-
-            drawing = ezdxf.readfile(filepath)
-            msp = drawing.modelspace()
-
-            stem = os.path.splitext(filename or os.path.basename(filepath))[0]
-            preview_path = os.path.join(output_dir, f"{stem}.svg")
+            with self._source_drawing(filepath, content) as drawing:
+                backend = svg.SVGBackend()
+                Frontend(RenderContext(drawing), backend).draw_layout(
+                    drawing.modelspace(),
+                    filter_func=handle_filter(selected_handles),
+                )
 
-            backend = svg.SVGBackend()
-            Frontend(RenderContext(drawing), backend).draw_layout(msp)
+            return Result.success(backend.get_string(layout.Page(0, 0)))
+        except Exception as e:
+            return Result.fail(f"Failed to render SVG preview: {e}")
 
-            with open(preview_path, "wt", encoding="utf-8") as preview_file:
-                preview_file.write(backend.get_string(layout.Page(0, 0)))
+    def render_png_preview(
+        self,
+        filepath: str,
+        options: PreviewRenderOptionsDTO,
+        selected_handles: set[str] | None = None,
+        content: bytes | None = None,
+    ) -> Result[bytes]:
+        if not filepath and content is None:
+            return Result.fail("Empty filepath")
 
-            return Result.success(preview_path)
+        renderer = RasterPreviewRenderer(
+            options.size_px,
+            skip_text=options.skip_text,
+            skip_hatch_patterns=options.skip_hatch_patterns,
+            time_budget_s=options.time_budget_s,
+        )
+        try:
+            with self._source_drawing(filepath, content) as drawing:
+                return renderer.render(drawing, handle_filter(selected_handles))
         except Exception as e:
-            return Result.fail(f"Failed to save SVG preview: {e}")
+            return Result.fail(f"Failed to render PNG preview: {e}")
+
+    @contextmanager
+    def _source_drawing(self, filepath: str, content: bytes | None):
+        """Документ открытого файла из хранилища, иначе разобранный из content или с диска"""
+        with self._store.locked(filepath) as drawing:
+            if drawing is not None:
+                yield drawing
+                return
+        yield load_drawing(filepath, content)
@@ -1,19 +1,63 @@
 from __future__ import annotations
 
+import io
 import os
-import tempfile
-from typing import Sequence
+from collections import Counter
+from collections.abc import Iterable
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import BinaryIO, Sequence
 
 import ezdxf
+from ezdxf.lldxf.tagwriter import TagWriter
 
 from ...domain.entities import DXFDocument, DXFEntity
 from ...domain.services import IDXFWriter
 from ...domain.value_objects import Result, Unit
+from .drawing_store import EzdxfDrawingStore, drawing_to_bytes, load_drawing, modelspace_subset, text_writer, write_drawing
+from .entity_filter import copy_selected_entities, is_binary_dxf
+
+
+# Сколько ошибок восстановления попадает в отчет целиком
+_FAILURE_SAMPLE_SIZE = 20
+
+
+@dataclass
+class _ReconstructionStats:
+	"""Сводная диагностика восстановления: счетчики и выборка ошибок вместо строки на сущность"""
+	total: int = 0
+	reconstructed: int = 0
+	skipped: int = 0
+	by_type: Counter = field(default_factory=Counter)
+	failures_by_reason: Counter = field(default_factory=Counter)
+	failure_sample: list[str] = field(default_factory=list)
+
+	def fail(self, reason: str, details: str) -> None:
+		self.skipped += 1
+		self.failures_by_reason[reason] += 1
+		if len(self.failure_sample) < _FAILURE_SAMPLE_SIZE:
+			self.failure_sample.append(details)
+
+	def summary_lines(self) -> list[str]:
+		lines = [
+			f"Reconstruction summary: reconstructed={self.reconstructed}, skipped={self.skipped}, by_type={dict(self.by_type)}"
+		]
+		if self.skipped:
+			lines.append(f"Failures by reason: {dict(self.failures_by_reason)}")
+			lines.append(f"Failure sample ({len(self.failure_sample)} of {self.skipped}):")
+			lines.extend(f"  FAILED {details}" for details in self.failure_sample)
+		return lines
 
 
 class DXFWriter(IDXFWriter):
 	"""Инфраструктурный адаптер для операций записи DXF через ezdxf."""
 
+	# Число handle, резервируемых в $HANDSEED под сущности потоковой сборки
+	HANDLE_RESERVE = 1 << 40
+
+	def __init__(self, store: EzdxfDrawingStore | None = None):
+		self._store = store or EzdxfDrawingStore()
+
 	def save(self, document: DXFDocument, filepath: str) -> Result[Unit]:
 		if not document.filepath:
 			return Result.fail("Source file path is empty")
@@ -28,168 +72,241 @@ class DXFWriter(IDXFWriter):
 		selected_handles: set[str],
 	) -> Result[int]:
 		try:
-			drawing = ezdxf.readfile(source_filepath)
-			modelspace = drawing.modelspace()
-
-			normalized_handles = {h.strip().upper() for h in selected_handles if h.strip()}
-
-			removed_count = 0
-			for dxf_entity in list(modelspace):
-				handle = str(getattr(dxf_entity.dxf, "handle", "")).strip().upper()
-				if normalized_handles and handle not in normalized_handles:
-					modelspace.delete_entity(dxf_entity)
-					removed_count += 1
-
 			output_dir = os.path.dirname(output_path)
 			if output_dir:
 				os.makedirs(output_dir, exist_ok=True)
 
-			drawing.saveas(output_path)
+			# Файл фильтруется потоком на уровне тегов; ezdxf нужен только для двоичного DXF
+			# и для перезаписи исходного файла, который нельзя читать во время записи
+			if not self._is_same_file(source_filepath, output_path) and not is_binary_dxf(source_filepath):
+				with open(output_path, "wb") as output_file:
+					return Result.success(copy_selected_entities(source_filepath, output_file, selected_handles))
+
+			with self._selected(source_filepath, selected_handles) as (drawing, removed_count):
+				with open(output_path, "wb") as output_file:
+					write_drawing(drawing, output_file)
 			return Result.success(removed_count)
 
 		except Exception as exc:
 			return Result.fail(f"Failed to save DXF file: {str(exc)}")
 
-	def reconstruct_from_entities(self, entities: Sequence[DXFEntity]) -> Result[tuple[bytes, str]]:
+	def serialize_selected(
+		self,
+		source_filepath: str,
+		selected_handles: set[str],
+		content: bytes | None = None,
+	) -> Result[bytes]:
 		try:
-			report_lines: list[str] = []
-			report_lines.append(f"Reconstruction started for {len(entities)} entity(ies)")
-
-			temp_doc = ezdxf.new()
-			temp_modelspace = temp_doc.modelspace()
+			with self._selected(source_filepath, selected_handles, content) as (drawing, _):
+				return Result.success(drawing_to_bytes(drawing))
+		except Exception as exc:
+			return Result.fail(f"Failed to serialize DXF: {str(exc)}")
 
-			# Restore layer table attributes so ByLayer entities keep original visual styles.
-			layer_definitions = self._collect_layer_definitions_from_entities(entities)
-			report_lines.append(f"Layer definitions collected: {len(layer_definitions)}")
-			for layer_name, layer_attribs in layer_definitions.items():
-				try:
-					if layer_name in temp_doc.layers:
-						layer = temp_doc.layers.get(layer_name)
-						for key, value in layer_attribs.items():
-							try:
-								setattr(layer.dxf, key, value)
-							except Exception:
-								pass
-					else:
-						temp_doc.layers.new(name=layer_name, dxfattribs=layer_attribs)
-				except Exception:
-					continue
+	def _is_same_file(self, first: str, second: str) -> bool:
+		try:
+			return os.path.samefile(first, second)
+		except OSError:
+			return False
+
+	@contextmanager
+	def _selected(self, source_filepath: str, selected_handles: set[str], content: bytes | None = None):
+		"""Документ, в модели которого на время блока оставлены только выбранные сущности"""
+		with self._store.locked(source_filepath) as drawing:
+			if drawing is None:
+				drawing = load_drawing(source_filepath, content)
+			with modelspace_subset(drawing, selected_handles) as removed_count:
+				yield drawing, removed_count
 
-			dxf_entities_to_write = []
-			skipped_entities = 0
-			reconstructed_by_type: dict[str, int] = {}
+	def reconstruct_from_entities(self, entities: Sequence[DXFEntity]) -> Result[tuple[bytes, str]]:
+		buffer = io.BytesIO()
+		write_result = self.write_reconstructed(entities, buffer)
+		if write_result.is_fail:
+			return Result.fail(write_result.error)
+		return Result.success((buffer.getvalue(), write_result.value))
 
-			from ezdxf.entities import factory as ezdxf_factory
+	def write_reconstructed(self, entities: Sequence[DXFEntity], stream: BinaryIO) -> Result[str]:
+		return self.write_reconstructed_batches(entities, [entities], stream)
 
-			for entity in entities:
-				dxftype = self._resolve_entity_dxftype(entity)
-				entity_name = self._resolve_entity_name(entity)
-				if not dxftype:
-					skipped_entities += 1
-					report_lines.append(
-						f"skipped entity id={getattr(entity, 'id', None)}, name='{entity_name}' because dxftype could not be resolved"
-					)
-					continue
+	def write_reconstructed_batches(
+		self,
+		definitions: Iterable[DXFEntity],
+		batches: Iterable[Sequence[DXFEntity]],
+		stream: BinaryIO,
+	) -> Result[str]:
+		"""
+		Потоковая сборка DXF из сущностей таблиц.
+
+		Слои и блоки берутся из definitions (сущностей, несущих их определения), поэтому
+		HEADER, TABLES и BLOCKS пишутся в поток до чтения пачек. Затем сущности каждой пачки
+		строятся, пишутся прямо в ENTITIES и освобождаются: память - O(блоки + пачка).
+		$HANDSEED резервирует HANDLE_RESERVE handle для сущностей; если их не хватит,
+		сборка завершается ошибкой. Пустой набор пачек дает корректный DXF без сущностей.
+		"""
+		try:
+			stats = _ReconstructionStats()
+			layer_definitions: dict[str, dict] = {}
+			block_definitions: dict[str, list[dict]] = {}
+			for entity in definitions:
+				layer_definitions.update(self._collect_layer_definitions_from_entities([entity]))
+				for block_name, block_entities in self._collect_block_definitions_from_entities([entity]).items():
+					# Заглушка для INSERT заменяется определением, найденным в следующих сущностях
+					if block_name not in block_definitions or (block_entities and not block_definitions[block_name]):
+						block_definitions[block_name] = block_entities
+
+			report_lines: list[str] = [
+				f"Layer definitions collected: {len(layer_definitions)}",
+				f"Block definitions collected: {len(block_definitions)}",
+			]
 
-				attribs = self._build_ezdxf_attribs(entity, dxftype)
-				try:
-					if dxftype == "ATTRIB":
-						attrib_text = (entity.geometries or {}).get("text") or (entity.attributes or {}).get("text") or ""
-						text_attribs = dict(attribs)
-						text_attribs["text"] = attrib_text
-						for color_key in ("color", "true_color", "transparency"):
-							if color_key not in text_attribs and (entity.geometries or {}).get(color_key) is not None:
-								text_attribs[color_key] = (entity.geometries or {}).get(color_key)
-						text_entity = ezdxf_factory.new("TEXT", dxfattribs=self._clean_ezdxf_attribs(text_attribs, "TEXT"))
-						self._apply_geometry_dict(text_entity, entity.geometries or {}, "TEXT")
-						ez_entity = text_entity
-					elif dxftype == "MULTILEADER":
-						# MULTILEADER builder attaches entity to modelspace immediately,
-						# so do not append it again to dxf_entities_to_write.
-						self._build_multileader(temp_modelspace, entity, attribs)
-						ez_entity = None
-					elif dxftype == "LEADER":
-						ez_entity = ezdxf_factory.new(dxftype, dxfattribs=attribs)
-						self._apply_entity_geometry(ez_entity, entity, dxftype)
-					else:
-						ez_entity = ezdxf_factory.new(dxftype, dxfattribs=attribs)
-						self._apply_entity_geometry(ez_entity, entity, dxftype)
-					if ez_entity is not None:
-						dxf_entities_to_write.append(ez_entity)
-					reconstructed_by_type[dxftype] = reconstructed_by_type.get(dxftype, 0) + 1
-					report_lines.append(
-						f"ok entity id={getattr(entity, 'id', None)}, name='{entity_name}', dxftype={dxftype}, attr_keys={sorted(list(attribs.keys()))[:12]}, geom_keys={sorted(list((entity.geometries or {}).keys()))[:12]}"
-					)
-				except Exception as exc:
-					skipped_entities += 1
-					report_lines.append(
-						f"FAILED entity id={getattr(entity, 'id', None)}, name='{entity_name}', dxftype={dxftype}, error={type(exc).__name__}: {exc}, attr_keys={sorted(list(attribs.keys()))[:12]}, geom_keys={sorted(list((entity.geometries or {}).keys()))[:12]}"
-					)
+			temp_doc = ezdxf.new()
+			self._add_layer_definitions(temp_doc, layer_definitions)
+			self._add_block_definitions(temp_doc, block_definitions)
+			# Определения больше не нужны: блоки уже в документе
+			block_definitions.clear()
 
-			if not dxf_entities_to_write:
-				report_lines.append(
-					f"Reconstruction summary: reconstructed=0, skipped={skipped_entities}, by_type={reconstructed_by_type}"
-				)
+			temp_modelspace = temp_doc.modelspace()
+			with text_writer(temp_doc, stream) as text_stream:
+				temp_doc.commit_pending_changes()
+				temp_doc.update_all()
+				handle_limit = int(str(temp_doc.entitydb.handles), 16) + self.HANDLE_RESERVE
+				temp_doc.header["$HANDSEED"] = f"{handle_limit:X}"
+
+				tagwriter = TagWriter(text_stream, dxfversion=temp_doc.dxfversion, write_handles=True)
+				temp_doc.header.export_dxf(tagwriter)
+				temp_doc.classes.export_dxf(tagwriter)
+				temp_doc.tables.export_dxf(tagwriter)
+				temp_doc.blocks.export_dxf(tagwriter)
+
+				tagwriter.write_str("  0\nSECTION\n  2\nENTITIES\n")
+				for batch in batches:
+					stats.total += len(batch)
+					for entity in batch:
+						self._add_reconstructed_entity(temp_modelspace, entity, stats)
+					self._flush_modelspace(temp_doc, tagwriter)
+					if int(str(temp_doc.entitydb.handles), 16) > handle_limit:
+						return Result.fail(
+							f"Table reconstruction failed: entities need more than {self.HANDLE_RESERVE} handles "
+							f"reserved in $HANDSEED"
+						)
+				tagwriter.write_tag2(0, "ENDSEC")
+
+				temp_doc.objects.export_dxf(tagwriter)
+				tagwriter.write_tag2(0, "EOF")
+
+			report_lines.insert(0, f"Reconstruction finished for {stats.total} entity(ies)")
+			report_lines.extend(stats.summary_lines())
+			if stats.total and not stats.reconstructed:
 				return Result.fail("\n".join(report_lines))
+			return Result.success("\n".join(report_lines))
+		except Exception as exc:
+			return Result.fail(f"Table reconstruction failed: {type(exc).__name__}: {str(exc)}")
 
-			report_lines.append(
-				f"Reconstruction summary: reconstructed={len(dxf_entities_to_write)}, skipped={skipped_entities}, by_type={reconstructed_by_type}"
-			)
-
-			# Build all block definitions recursively from serialized payloads.
-			block_definitions = self._collect_block_definitions_from_entities(entities)
-			report_lines.append(f"Block definitions collected: {len(block_definitions)}")
-
-			from ezdxf.entities import factory as ezdxf_factory
-			for block_name in block_definitions.keys():
-				try:
-					temp_doc.blocks.new(name=block_name)
-				except Exception:
-					# block may already exist or have invalid name; continue and attempt to fill if possible
-					pass
+	def _add_layer_definitions(self, temp_doc, layer_definitions: dict[str, dict]) -> None:
+		# Restore layer table attributes so ByLayer entities keep original visual styles.
+		for layer_name, layer_attribs in layer_definitions.items():
+			try:
+				if layer_name in temp_doc.layers:
+					layer = temp_doc.layers.get(layer_name)
+					for key, value in layer_attribs.items():
+						try:
+							setattr(layer.dxf, key, value)
+						except Exception:
+							pass
+				else:
+					temp_doc.layers.new(name=layer_name, dxfattribs=layer_attribs)
+			except Exception:
+				continue
 
-			for block_name, block_entities in block_definitions.items():
-				try:
-					block_layout = temp_doc.blocks.get(block_name)
-				except Exception:
-					continue
+	def _add_block_definitions(self, temp_doc, block_definitions: dict[str, list[dict]]) -> None:
+		from ezdxf.entities import factory as ezdxf_factory
 
-				for block_entity in block_entities:
-					try:
-						b_dxftype = str(block_entity.get("dxftype", "")).upper()
-						if not b_dxftype:
-							continue
+		for block_name in block_definitions.keys():
+			try:
+				temp_doc.blocks.new(name=block_name)
+			except Exception:
+				# block may already exist or have invalid name; continue and attempt to fill if possible
+				pass
 
-						b_attribs = dict(block_entity.get("dxf_attribs", {}) or {})
-						b_attribs.update(block_entity.get("attributes", {}) or {})
-						b_attribs = self._clean_ezdxf_attribs(b_attribs, b_dxftype)
+		for block_name, block_entities in block_definitions.items():
+			try:
+				block_layout = temp_doc.blocks.get(block_name)
+			except Exception:
+				continue
 
-						b_ez_entity = ezdxf_factory.new(b_dxftype, dxfattribs=b_attribs)
-						self._apply_geometry_dict(b_ez_entity, block_entity.get("geometries", {}) or {}, b_dxftype)
-						block_layout.add_entity(b_ez_entity)
-					except Exception:
+			for block_entity in block_entities:
+				try:
+					b_dxftype = str(block_entity.get("dxftype", "")).upper()
+					if not b_dxftype:
 						continue
 
-			# add modelspace entities after blocks are defined
-			for ez_entity in dxf_entities_to_write:
-				temp_modelspace.add_entity(ez_entity)
+					b_attribs = dict(block_entity.get("dxf_attribs", {}) or {})
+					b_attribs.update(block_entity.get("attributes", {}) or {})
+					b_attribs = self._clean_ezdxf_attribs(b_attribs, b_dxftype)
 
-			with tempfile.NamedTemporaryFile(suffix=".dxf", delete=False) as temp_file:
-				tmp_path = temp_file.name
+					b_ez_entity = ezdxf_factory.new(b_dxftype, dxfattribs=b_attribs)
+					self._apply_geometry_dict(b_ez_entity, block_entity.get("geometries", {}) or {}, b_dxftype)
+					block_layout.add_entity(b_ez_entity)
+				except Exception:
+					continue
 
-			try:
-				temp_doc.saveas(tmp_path)
-				with open(tmp_path, "rb") as file_handle:
-					data = file_handle.read()
-			finally:
-				try:
-					os.remove(tmp_path)
-				except OSError:
-					pass
+	def _add_reconstructed_entity(self, temp_modelspace, entity: DXFEntity, stats: _ReconstructionStats) -> None:
+		from ezdxf.entities import factory as ezdxf_factory
 
-			return Result.success((data, "\n".join(report_lines)))
+		dxftype = self._resolve_entity_dxftype(entity)
+		entity_name = self._resolve_entity_name(entity)
+		if not dxftype:
+			stats.fail(
+				"unresolved dxftype",
+				f"entity id={getattr(entity, 'id', None)}, name='{entity_name}': dxftype could not be resolved",
+			)
+			return
+
+		attribs = self._build_ezdxf_attribs(entity, dxftype)
+		if dxftype == "INSERT" and (not attribs.get("name") or attribs["name"] not in temp_modelspace.doc.blocks):
+			# BLOCKS уже записан: вставка неизвестного блока сделала бы файл некорректным
+			stats.fail(
+				"INSERT: undefined block",
+				f"entity id={getattr(entity, 'id', None)}, name='{entity_name}', block='{attribs.get('name')}'",
+			)
+			return
+		try:
+			if dxftype == "ATTRIB":
+				attrib_text = (entity.geometries or {}).get("text") or (entity.attributes or {}).get("text") or ""
+				text_attribs = dict(attribs)
+				text_attribs["text"] = attrib_text
+				for color_key in ("color", "true_color", "transparency"):
+					if color_key not in text_attribs and (entity.geometries or {}).get(color_key) is not None:
+						text_attribs[color_key] = (entity.geometries or {}).get(color_key)
+				ez_entity = ezdxf_factory.new("TEXT", dxfattribs=self._clean_ezdxf_attribs(text_attribs, "TEXT"))
+				self._apply_geometry_dict(ez_entity, entity.geometries or {}, "TEXT")
+			elif dxftype == "MULTILEADER":
+				# MULTILEADER builder attaches entity to modelspace immediately.
+				self._build_multileader(temp_modelspace, entity, attribs)
+				ez_entity = None
+			else:
+				ez_entity = ezdxf_factory.new(dxftype, dxfattribs=attribs)
+				self._apply_entity_geometry(ez_entity, entity, dxftype)
+			if ez_entity is not None:
+				temp_modelspace.add_entity(ez_entity)
+			stats.reconstructed += 1
+			stats.by_type[dxftype] += 1
 		except Exception as exc:
-			return Result.fail(f"Table reconstruction failed: {type(exc).__name__}: {str(exc)}")
+			stats.fail(
+				f"{dxftype}: {type(exc).__name__}",
+				f"entity id={getattr(entity, 'id', None)}, name='{entity_name}', dxftype={dxftype}, "
+				f"error={type(exc).__name__}: {exc}, attr_keys={sorted(attribs.keys())[:12]}",
+			)
+
+	def _flush_modelspace(self, temp_doc, tagwriter: TagWriter) -> None:
+		"""Пишет накопленные сущности модели и освобождает их"""
+		entity_space = temp_doc.modelspace().entity_space
+		entities = entity_space.entities
+		entity_space.clear()
+		for ez_entity in entities:
+			ez_entity.export_dxf(tagwriter)
+		for ez_entity in entities:
+			ez_entity.destroy()
+		temp_doc.entitydb.purge()
 
 	def _build_ezdxf_attribs(self, entity: DXFEntity, dxftype: str) -> dict:
 		attribs = dict((entity.extra_data or {}).get("dxf_attribs", {}))
@@ -219,6 +336,14 @@ class DXFWriter(IDXFWriter):
 		geometry = entity.geometries or {}
 		self._apply_geometry_dict(ez_entity, geometry, dxftype)
 
+	def _as_point_list(self, points) -> list:
+		"""Вершины в виде списка (в модели они могут храниться массивом NumPy)"""
+		if points is None:
+			return []
+		if hasattr(points, "tolist"):
+			return points.tolist()
+		return list(points)
+
 	def _apply_geometry_dict(self, ez_entity, geometry: dict, dxftype: str) -> None:
 		if dxftype == "POINT":
 			location = geometry.get("location")
@@ -358,7 +483,7 @@ class DXFWriter(IDXFWriter):
 						pass
 
 		elif dxftype == "POLYLINE":
-			points = geometry.get("points") or []
+			points = self._as_point_list(geometry.get("points"))
 			if points:
 				try:
 					for point in points:
@@ -372,7 +497,7 @@ class DXFWriter(IDXFWriter):
 					pass
 
 		elif dxftype == "LWPOLYLINE":
-			points = geometry.get("points") or []
+			points = self._as_point_list(geometry.get("points"))
 			if points:
 				try:
 					ez_entity.append_points(points, format="xyseb")
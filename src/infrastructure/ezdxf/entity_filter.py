@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import mmap
+import shutil
+from typing import BinaryIO
+
+from .drawing_store import BINARY_DXF_SENTINEL
+
+# Подчиненные сущности следуют за родителем (POLYLINE, INSERT) и разделяют его судьбу
+_CHAINED_TYPES = {b"VERTEX", b"ATTRIB", b"SEQEND"}
+
+
+def is_binary_dxf(path: str) -> bool:
+    with open(path, "rb") as source:
+        return source.read(len(BINARY_DXF_SENTINEL)) == BINARY_DXF_SENTINEL
+
+
+def copy_selected_entities(source_path: str, output: BinaryIO, selected_handles: set[str]) -> int:
+    """
+    Копирует ASCII DXF, оставляя в секции ENTITIES только сущности модели с выбранными handle.
+
+    Файл не разбирается ezdxf: пары тегов (код, значение) читаются из отображенного в память
+    файла, а сохраняемые участки пишутся срезами без копирования, поэтому расход памяти
+    не зависит от размера файла. HEADER, TABLES и BLOCKS переносятся как есть, из OBJECTS
+    убираются только объекты, принадлежащие удаленным сущностям, и их содержимое; сущности
+    листов (код 67) не фильтруются. Возвращает число удаленных сущностей.
+    Для двоичного DXF выбрасывает ValueError.
+    """
+    normalized = {h.strip().upper().encode("ascii", "ignore") for h in selected_handles if h.strip()}
+
+    with open(source_path, "rb") as source:
+        if not normalized:
+            shutil.copyfileobj(source, output, 1024 * 1024)
+            return 0
+
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[:len(BINARY_DXF_SENTINEL)] == BINARY_DXF_SENTINEL:
+                raise ValueError("Binary DXF is not supported by the tag filter")
+            view = memoryview(mapped)
+            try:
+                return _filter_entities(mapped, view, output, normalized)
+            finally:
+                view.release()
+
+
+def _filter_entities(mapped: mmap.mmap, view: memoryview, output: BinaryIO, handles: set[bytes]) -> int:
+    copy_from = 0
+    removed = 0
+    section = b""
+    section_name_expected = False
+    keep_chain = True
+    # Объекты удаленных сущностей (словари расширений, история тел): handle -> владелец
+    owned_by: dict[bytes, bytes] = {}
+    # Удаленные объекты, чьи дочерние объекты тоже удаляются
+    orphan_owners: set[bytes] = set()
+
+    start = -1
+    dxftype = b""
+    handle = b""
+    owner = b""
+    paperspace = False
+    references: list[bytes] = []
+    in_app_data = False
+
+    while True:
+        tag_start = mapped.tell()
+        code = mapped.readline()
+        if not code:
+            break
+        value = mapped.readline().strip()
+        code = code.strip()
+
+        if code == b"0":
+            if start >= 0:
+                # Запись заканчивается перед следующим тегом с кодом 0
+                if section == b"OBJECTS":
+                    keep = owned_by.get(handle) != owner and owner not in orphan_owners
+                    if not keep and handle:
+                        orphan_owners.add(handle)
+                elif dxftype in _CHAINED_TYPES:
+                    keep = keep_chain
+                else:
+                    keep = paperspace or handle in handles
+                    keep_chain = keep
+                    if not keep:
+                        removed += 1
+                        owned_by.update((reference, handle) for reference in references)
+                if not keep:
+                    output.write(view[copy_from:start])
+                    copy_from = tag_start
+                start = -1
+
+            if value == b"SECTION":
+                section_name_expected = True
+            elif value == b"ENDSEC":
+                section = b""
+            elif section == b"ENTITIES" or (section == b"OBJECTS" and owned_by):
+                start = tag_start
+                dxftype = value
+                handle = owner = b""
+                paperspace = in_app_data = False
+                references = []
+        elif section_name_expected:
+            section_name_expected = False
+            section = value if code == b"2" else b""
+        elif start >= 0:
+            if code == b"5" and not handle:
+                handle = value.upper()
+            elif code == b"102":
+                # Группы {ACAD_REACTORS ...} содержат коды 330, не являющиеся владельцем
+                in_app_data = value.startswith(b"{")
+            elif code == b"330" and not owner and not in_app_data:
+                owner = value.upper()
+            elif code in (b"350", b"360") and section == b"ENTITIES":
+                references.append(value.upper())
+            elif code == b"67":
+                paperspace = value not in (b"", b"0")
+
+    output.write(view[copy_from:])
+    return removed
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import numpy as np
+import shapely
+from ezdxf import disassemble
+from ezdxf.disassemble import HatchPrimitive
+
+# Точность аппроксимации кривых относительно диагонали габаритов сущности
+_FLATTENING_RATIO = 1e-3
+_MIN_FLATTENING_DISTANCE = 1e-9
+
+
+def build_geometry_parts(entity, extent: tuple[float, float, float, float]) -> np.ndarray:
+    """
+    Точная 2D-геометрия сущности в виде массива простых частей (точки, линии, полигоны).
+
+    Блоки и составные сущности раскладываются на примитивы ezdxf; заливки (HATCH, SOLID,
+    ширина полилинии) становятся полигонами, остальное — линиями. Если геометрию получить
+    не удалось, используется прямоугольник габаритов.
+    """
+    min_x, min_y, max_x, max_y = extent
+    distance = max(float(np.hypot(max_x - min_x, max_y - min_y)) * _FLATTENING_RATIO, _MIN_FLATTENING_DISTANCE)
+
+    parts = []
+    try:
+        for primitive in disassemble.to_primitives(disassemble.recursive_decompose((entity,))):
+            primitive.max_flattening_distance = distance
+            parts.extend(_primitive_parts(primitive, distance))
+    except Exception:
+        parts = []
+
+    if not parts:
+        parts = [shapely.box(min_x, min_y, max_x, max_y)]
+    return np.array(parts, dtype=object)
+
+
+def _primitive_parts(primitive, distance: float) -> list:
+    if primitive.mesh is not None:
+        return [
+            shapely.Polygon([(vertex.x, vertex.y) for vertex in face])
+            for face in primitive.mesh.faces_as_vertices()
+            if len(face) >= 3
+        ]
+
+    if primitive.path is None:
+        return []
+
+    is_filled = isinstance(primitive, HatchPrimitive)
+    parts = []
+    for sub_path in primitive.path.sub_paths():
+        coords = [(vertex.x, vertex.y) for vertex in sub_path.flattening(distance)]
+        part = _coords_to_geometry(coords, is_filled)
+        if part is not None:
+            parts.append(part)
+    return parts
+
+
+def _coords_to_geometry(coords: list[tuple[float, float]], is_filled: bool):
+    unique = set(coords)
+    if not unique:
+        return None
+    if len(unique) == 1:
+        return shapely.Point(coords[0])
+    if is_filled and len(unique) >= 3:
+        return shapely.Polygon(coords)
+    return shapely.LineString(coords)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+
+import numpy as np
+import shapely
+from ezdxf import bbox
+
+from ...domain.value_objects import SelectionRule
+from .entity_geometry import build_geometry_parts
+
+
+class EntitySpatialIndex:
+    """
+    Пространственный индекс (STRtree) по ограничивающим прямоугольникам сущностей modelspace.
+
+    Строится один раз на документ, после чего выбор по области не требует
+    повторного чтения DXF-файла. Индекс хранит только handle и габариты, а не сущности
+    ezdxf, поэтому не удерживает документ в памяти. Для точных правил индекс отбирает
+    кандидатов, их сущности запрашиваются по handle через resolve, а реальная геометрия
+    строится лениво и кэшируется по порядковому номеру сущности.
+    """
+
+    def __init__(self, handles: np.ndarray, boxes: np.ndarray, extents: np.ndarray | None = None):
+        self._handles = handles
+        self._boxes = boxes
+        self._tree = shapely.STRtree(boxes)
+        self._extents = extents
+        self._geometry_parts: list[np.ndarray | None] = [None] * len(handles)
+
+    @classmethod
+    def from_modelspace(cls, model_space) -> EntitySpatialIndex:
+        cache = bbox.Cache()
+        handles: list[str] = []
+        extents: list[tuple[float, float, float, float]] = []
+
+        for entity in model_space:
+            box = bbox.extents((entity,), fast=True, cache=cache)
+            # Сущности без габаритов не участвуют в выборе (как в ezdxf.select)
+            if not box.has_data:
+                continue
+            handle = str(getattr(entity.dxf, "handle", "") or "").strip().lower()
+            if not handle:
+                continue
+            handles.append(handle)
+            extents.append((box.extmin.x, box.extmin.y, box.extmax.x, box.extmax.y))
+
+        extents_array = np.array(extents, dtype=float).reshape(-1, 4)
+        return cls(np.array(handles, dtype=object), cls._build_boxes(extents_array), extents_array)
+
+    @staticmethod
+    def _build_boxes(extents: np.ndarray) -> np.ndarray:
+        """Прямоугольники габаритов; вырожденные габариты становятся точками и отрезками."""
+        boxes = np.empty(len(extents), dtype=object)
+        if len(extents) == 0:
+            return boxes
+
+        min_x, min_y, max_x, max_y = extents.T
+        is_point = (min_x == max_x) & (min_y == max_y)
+        is_line = ~is_point & ((min_x == max_x) | (min_y == max_y))
+        is_box = ~(is_point | is_line)
+
+        boxes[is_box] = shapely.box(min_x[is_box], min_y[is_box], max_x[is_box], max_y[is_box])
+        boxes[is_point] = shapely.points(min_x[is_point], min_y[is_point])
+        if is_line.any():
+            coords = np.stack(
+                [np.column_stack([min_x[is_line], min_y[is_line]]), np.column_stack([max_x[is_line], max_y[is_line]])],
+                axis=1,
+            )
+            boxes[is_line] = shapely.linestrings(coords)
+        return boxes
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+    @property
+    def handles(self) -> np.ndarray:
+        return self._handles
+
+    def query_indices(self, shape, selection_rule: SelectionRule, resolve: Callable | None = None) -> np.ndarray:
+        """
+        Индексы сущностей, габариты которых удовлетворяют правилу выбора.
+
+        resolve(handle) возвращает сущность ezdxf и нужен только точным правилам.
+        """
+        if len(self._handles) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        # Самопересекающийся контур области дает неверные ответы предикатов GEOS
+        if not shapely.is_valid(shape):
+            shape = shapely.make_valid(shape)
+
+        if selection_rule == SelectionRule.INSIDE:
+            return np.sort(self._tree.query(shape, predicate="covers"))
+
+        overlapping = self._tree.query(shape, predicate="intersects")
+        if selection_rule == SelectionRule.INTERSECT:
+            return np.sort(overlapping)
+
+        if selection_rule == SelectionRule.OUTSIDE:
+            mask = np.ones(len(self._handles), dtype=bool)
+            mask[overlapping] = False
+            return np.flatnonzero(mask)
+
+        if selection_rule in (SelectionRule.INSIDE_EXACT, SelectionRule.INTERSECT_EXACT):
+            # Габариты целиком внутри области: геометрия тоже внутри, точная проверка не нужна.
+            # Геометрия строится только для кандидатов, габариты которых пересекают границу
+            shapely.prepare(shape)
+            covered = shapely.covers(shape, self._boxes[overlapping])
+            crossing = overlapping[~covered]
+            exact = self._exact_match(shape, crossing, selection_rule, resolve)
+            return np.sort(np.concatenate([overlapping[covered], crossing[exact]]))
+
+        raise ValueError(f"Unsupported selection rule: {selection_rule}")
+
+    def _exact_match(self, shape, candidates: np.ndarray, selection_rule: SelectionRule,
+                     resolve: Callable | None) -> np.ndarray:
+        """Маска кандидатов, реальная геометрия которых удовлетворяет точному правилу."""
+        if len(candidates) == 0:
+            return np.zeros(0, dtype=bool)
+
+        parts = [self._parts(ordinal, resolve) for ordinal in candidates]
+        owners = np.repeat(np.arange(len(candidates)), [len(part) for part in parts])
+        geometries = np.concatenate(parts)
+
+        if selection_rule == SelectionRule.INTERSECT_EXACT:
+            hits = shapely.intersects(shape, geometries)
+            return np.bincount(owners, weights=hits, minlength=len(candidates)) > 0
+
+        misses = ~shapely.covers(shape, geometries)
+        return np.bincount(owners, weights=misses, minlength=len(candidates)) == 0
+
+    def _parts(self, ordinal: int, resolve: Callable | None) -> np.ndarray:
+        parts = self._geometry_parts[ordinal]
+        if parts is None:
+            if resolve is None:
+                raise ValueError("Exact selection requires entity geometry")
+            entity = resolve(self._handles[ordinal])
+            if entity is None:
+                # Сущность исчезла из документа: остается прямоугольник габаритов
+                parts = np.array([self._boxes[ordinal]], dtype=object)
+            else:
+                parts = _make_valid(build_geometry_parts(entity, tuple(self._extents[ordinal])))
+            self._geometry_parts[ordinal] = parts
+        return parts
+
+    def query(self, shape, selection_rule: SelectionRule, resolve: Callable | None = None) -> list[str]:
+        """Handle сущностей (в нижнем регистре), удовлетворяющих правилу выбора."""
+        return self._handles[self.query_indices(shape, selection_rule, resolve)].tolist()
+
+
+def _make_valid(geometries: np.ndarray) -> np.ndarray:
+    """Исправляет невалидные части (самопересекающиеся заливки) для предикатов covers/intersects."""
+    invalid = ~shapely.is_valid(geometries)
+    if invalid.any():
+        geometries = geometries.copy()
+        geometries[invalid] = shapely.make_valid(geometries[invalid])
+    return geometries
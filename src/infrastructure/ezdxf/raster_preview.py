@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+
+from ezdxf.addons.drawing import Frontend, RenderContext
+from ezdxf.addons.drawing.config import Configuration, HatchPolicy, TextPolicy
+from ezdxf.addons.drawing.properties import BackendProperties
+from ezdxf.addons.drawing.recorder import (
+    DataRecord,
+    FilledPathsRecord,
+    ImageRecord,
+    PathRecord,
+    Player,
+    PointsRecord,
+    Recorder,
+    SolidLinesRecord,
+)
+from ezdxf.math import Matrix44
+
+from ...domain.value_objects import Result
+
+# Отступ от края изображения, px
+_MARGIN_PX = 2
+
+# Точность аппроксимации кривых в пикселях итогового изображения
+_FLATTENING_PX = 0.5
+
+
+@dataclass
+class RasterPreviewStats:
+    """Что попало в растровое превью и что было отброшено"""
+    records: int = 0
+    drawn: int = 0
+    skipped_small: int = 0
+    skipped_entities: int = 0
+    budget_exceeded: bool = False
+
+
+class RasterPreviewRenderer:
+    """
+    Растровое превью DXF (PNG) с уровнем детализации.
+
+    Frontend ezdxf записывает примитивы в Recorder, после чего они переводятся
+    в пиксели итогового изображения: примитивы меньше пикселя не рисуются, кривые
+    аппроксимируются с точностью до половины пикселя. Текст и узоры штриховок
+    можно отключить. Когда бюджет времени исчерпан, оставшиеся сущности
+    пропускаются и превью получается неполным, но время отрисовки ограничено.
+
+    Запись и отбор примитивов не зависят от Qt; рисование выполняется QPainter
+    на QImage, что допустимо и вне GUI-потока.
+    """
+
+    def __init__(
+        self,
+        size_px: int,
+        skip_text: bool = False,
+        skip_hatch_patterns: bool = True,
+        time_budget_s: float = 10.0,
+    ):
+        self._size_px = max(16, int(size_px))
+        self._skip_text = skip_text
+        self._skip_hatch_patterns = skip_hatch_patterns
+        self._time_budget_s = time_budget_s
+        self.stats = RasterPreviewStats()
+
+    def render(self, drawing, entity_filter: Callable | None = None) -> Result[bytes]:
+        """Отрисовывает уже разобранный документ; entity_filter отбирает сущности модели"""
+        try:
+            # Бюджет ограничивает отрисовку; разбор файла в него не входит
+            deadline = time.perf_counter() + self._time_budget_s
+            player = self.record(drawing, deadline, entity_filter)
+            width, height = self.fit(player)
+            return Result.success(self._paint(player, width, height, deadline))
+        except Exception as e:
+            return Result.fail(f"Failed to render PNG preview: {e}")
+
+    def record(self, drawing, deadline: float, entity_filter: Callable | None = None) -> Player:
+        """Записывает примитивы модели, пока не исчерпан бюджет времени"""
+        self.stats = RasterPreviewStats()
+        msp = drawing.modelspace()
+
+        recorder = Recorder()
+        frontend = Frontend(RenderContext(drawing), recorder, config=self._configuration(drawing))
+
+        def within_budget(entity) -> bool:
+            if entity_filter is not None and not entity_filter(entity):
+                return False
+            if time.perf_counter() <= deadline:
+                return True
+            self.stats.skipped_entities += 1
+            self.stats.budget_exceeded = True
+            return False
+
+        frontend.draw_layout(msp, filter_func=within_budget)
+        player = recorder.player()
+        self.stats.records = len(player.records)
+        return player
+
+    def fit(self, player: Player) -> tuple[int, int]:
+        """Переводит записи в пиксели изображения (ось Y вниз) и возвращает его размер"""
+        bbox = player.bbox()
+        if not bbox.has_data:
+            if self.stats.budget_exceeded:
+                raise TimeoutError("Time budget exceeded before any entity was drawn")
+            raise ValueError("Drawing has no visible entities")
+
+        extent_x, extent_y = bbox.size.x, bbox.size.y
+        drawable_px = self._size_px - 2 * _MARGIN_PX
+        scale = drawable_px / max(extent_x, extent_y, 1e-9)
+
+        player.transform(Matrix44.chain(
+            Matrix44.translate(-bbox.extmin.x, -bbox.extmax.y, 0),
+            Matrix44.scale(scale, -scale, 1),
+            Matrix44.translate(_MARGIN_PX, _MARGIN_PX, 0),
+        ))
+        width = max(1, round(extent_x * scale)) + 2 * _MARGIN_PX
+        height = max(1, round(extent_y * scale)) + 2 * _MARGIN_PX
+        return width, height
+
+    def visible_records(self, player: Player, deadline: float) -> Iterator[tuple[DataRecord, BackendProperties]]:
+        """Записи не меньше пикселя; после исчерпания бюджета перебор прекращается"""
+        for record, properties in player.recordings():
+            if time.perf_counter() > deadline:
+                self.stats.budget_exceeded = True
+                return
+            size = record.bbox().size
+            if size.x < 1.0 and size.y < 1.0:
+                self.stats.skipped_small += 1
+                continue
+            self.stats.drawn += 1
+            yield record, properties
+
+    def _configuration(self, drawing) -> Configuration:
+        changes = {}
+        if self._skip_text:
+            changes["text_policy"] = TextPolicy.IGNORE
+        if self._skip_hatch_patterns:
+            changes["hatch_policy"] = HatchPolicy.SHOW_OUTLINE
+
+        # Кривые точнее пикселя не нужны: шаг аппроксимации по габаритам из заголовка
+        extmin, extmax = drawing.header.get("$EXTMIN"), drawing.header.get("$EXTMAX")
+        if extmin is not None and extmax is not None:
+            extent = max(extmax[0] - extmin[0], extmax[1] - extmin[1])
+            if 0 < extent < 1e20:
+                units_per_px = extent / self._size_px
+                default_distance = Configuration().max_flattening_distance
+                changes["max_flattening_distance"] = max(default_distance, units_per_px * _FLATTENING_PX)
+
+        return Configuration().with_changes(**changes)
+
+    def _paint(self, player: Player, width: int, height: int, deadline: float) -> bytes:
+        # Qt нужен только для рисования, поэтому импортируется здесь
+        from qgis.PyQt.QtCore import QBuffer, QByteArray, QIODevice, QLineF, QPointF, Qt
+        from qgis.PyQt.QtGui import QBrush, QColor, QImage, QPainter, QPainterPath, QPen, QPolygonF
+
+        colors: dict[str, QColor] = {}
+
+        def to_color(color: str) -> QColor:
+            qt_color = colors.get(color)
+            if qt_color is None:
+                # ezdxf: '#RRGGBB' или '#RRGGBBAA', Qt: '#AARRGGBB'
+                qt_color = QColor(color if len(color) == 7 else f"#{color[7:9]}{color[1:7]}")
+                colors[color] = qt_color
+            return qt_color
+
+        def to_polygon(vertices) -> QPolygonF:
+            return QPolygonF([QPointF(v.x, v.y) for v in vertices])
+
+        image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        image.fill(to_color(player.background))
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        try:
+            for record, properties in self.visible_records(player, deadline):
+                color = to_color(properties.color)
+                pen = QPen(color)
+                pen.setCosmetic(True)
+                painter.setPen(pen)
+                painter.setBrush(Qt.NoBrush)
+
+                if isinstance(record, PointsRecord):
+                    vertices = record.points.vertices()
+                    if len(vertices) == 2:
+                        painter.drawLine(QPointF(vertices[0].x, vertices[0].y), QPointF(vertices[1].x, vertices[1].y))
+                    elif len(vertices) > 2:
+                        painter.setPen(Qt.NoPen)
+                        painter.setBrush(QBrush(color))
+                        painter.drawPolygon(to_polygon(vertices))
+                elif isinstance(record, SolidLinesRecord):
+                    vertices = record.lines.vertices()
+                    painter.drawLines([
+                        QLineF(vertices[i].x, vertices[i].y, vertices[i + 1].x, vertices[i + 1].y)
+                        for i in range(0, len(vertices) - 1, 2)
+                    ])
+                elif isinstance(record, PathRecord):
+                    for sub_path in record.path.sub_paths():
+                        painter.drawPolyline(to_polygon(sub_path.flattening(_FLATTENING_PX)))
+                elif isinstance(record, FilledPathsRecord):
+                    painter_path = QPainterPath()
+                    painter_path.setFillRule(Qt.OddEvenFill)
+                    for path in record.paths:
+                        for sub_path in path.sub_paths():
+                            painter_path.addPolygon(to_polygon(sub_path.flattening(_FLATTENING_PX)))
+                            painter_path.closeSubpath()
+                    painter.fillPath(painter_path, QBrush(color))
+                elif isinstance(record, ImageRecord):
+                    # Растровые вложения в превью обозначаются только рамкой
+                    painter.drawPolygon(to_polygon(record.boundary.vertices()))
+        finally:
+            painter.end()
+
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, "PNG")
+        buffer.close()
+        return bytes(data)
@@ -1,7 +1,7 @@
 
 from .logger import Logger
 from .settings import Settings
-from .qt_event import QtEvent
+from .qt_event import QtEvent, QtEventGroup, EventMetrics, SubscriberMetrics
 from .qt_app_events import QtAppEvents
 from .qgis_connection_provider import QgisConnectionProvider
 
@@ -9,6 +9,9 @@ __all__ = [
     'Logger',
     'Settings',
     'QtEvent',
+    'QtEventGroup',
+    'EventMetrics',
+    'SubscriberMetrics',
     'QtAppEvents',
     'QgisConnectionProvider'
 ]
@@ -1,9 +1,26 @@
 
 from uuid import UUID
 from ...application.events import IEvent
-from ...application.dtos import DXFDocumentDTO
+from ...application.dtos import DXFDocumentDTO, DocumentChangeSetDTO
 from ...application.events import IAppEvents
-from ...infrastructure.qgis import QtEvent 
+from ...infrastructure.qgis import QtEvent, QtEventGroup, EventMetrics
+
+# События изменения выбора отправляются не чаще раза в кадр (~60 Гц)
+SELECTION_MIN_INTERVAL_MS = 16
+
+
+def _merge_documents(first: list[DXFDocumentDTO], second: list[DXFDocumentDTO]) -> list[DXFDocumentDTO]:
+    """Объединяет списки документов: по каждому id остается последнее представление"""
+    merged = {doc.id: doc for doc in first}
+    merged.update((doc.id, doc) for doc in second)
+    return list(merged.values())
+
+
+def _merge_change_sets(
+    first: list[DocumentChangeSetDTO],
+    second: list[DocumentChangeSetDTO],
+) -> list[DocumentChangeSetDTO]:
+    return DocumentChangeSetDTO.merge_all([*first, *second])
 
 
 class QtAppEvents(IAppEvents):
@@ -11,12 +28,38 @@ class QtAppEvents(IAppEvents):
     def __init__(self):
         super().__init__()
         
-        # Инициализация событий
-        self._on_document_opened = QtEvent[list[DXFDocumentDTO]]()
-        self._on_document_saved = QtEvent[list[DXFDocumentDTO]]()
-        self._on_document_closed = QtEvent[list[UUID]]()
-        self._on_document_modified = QtEvent[list[DXFDocumentDTO]]()
-        self._on_language_changed = QtEvent[str]()
+        # Инициализация событий. События со списками объединяются в одну отправку
+        # за итерацию цикла событий; закрытие и смена языка отправляются сразу,
+        # но после накопленных ранее событий, чтобы подписчики видели их в порядке emit
+        order = QtEventGroup()
+        self._on_document_opened = QtEvent[list[DXFDocumentDTO]](
+            merge=_merge_documents, name="on_document_opened", group=order)
+        self._on_document_saved = QtEvent[list[DXFDocumentDTO]](
+            merge=_merge_documents, name="on_document_saved", group=order)
+        self._on_document_closed = QtEvent[list[UUID]](name="on_document_closed", group=order)
+        self._on_document_modified = QtEvent[list[DXFDocumentDTO]](
+            merge=_merge_documents, min_interval_ms=SELECTION_MIN_INTERVAL_MS, name="on_document_modified", group=order)
+        self._on_document_changes = QtEvent[list[DocumentChangeSetDTO]](
+            merge=_merge_change_sets, min_interval_ms=SELECTION_MIN_INTERVAL_MS, name="on_document_changes", group=order)
+        self._on_language_changed = QtEvent[str](name="on_language_changed", group=order)
+
+    def get_metrics(self) -> dict[str, EventMetrics]:
+        """Метрики отправок и времени подписчиков по каждому событию"""
+        return {event.metrics.name: event.metrics for event in self._events()}
+
+    def reset_metrics(self) -> None:
+        for event in self._events():
+            event.reset_metrics()
+
+    def _events(self) -> list[QtEvent]:
+        return [
+            self._on_document_opened,
+            self._on_document_saved,
+            self._on_document_closed,
+            self._on_document_modified,
+            self._on_document_changes,
+            self._on_language_changed,
+        ]
 
     @property
     def on_document_opened(self) -> IEvent[list[DXFDocumentDTO]]:
@@ -38,6 +81,11 @@ class QtAppEvents(IAppEvents):
         """Событие модификации документа"""
         return self._on_document_modified
 
+    @property
+    def on_document_changes(self) -> IEvent[list[DocumentChangeSetDTO]]:
+        """Событие с дельтой изменений документов"""
+        return self._on_document_changes
+
     @property
     def on_language_changed(self) -> IEvent[str]:
         """Событие изменения языка"""
@@ -1,32 +1,247 @@
+from __future__ import annotations
 
-from typing import TypeVar, Callable
-from qgis.PyQt.QtCore import QObject, pyqtSignal
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable, TypeVar
+
+from qgis.PyQt import sip
+from qgis.PyQt.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
 from ...application.events import IEvent
 
 T = TypeVar('T', covariant=True)
 
+_NO_DATA = object()
+
+
+def _is_deleted(obj) -> bool:
+    return isinstance(obj, QObject) and sip.isdeleted(obj)
+
+
+def _receiver_key(receiver) -> Any:
+    """Ключ слота без сильной ссылки на владельца связанного метода"""
+    if hasattr(receiver, '__self__') and hasattr(receiver, '__func__'):
+        return id(receiver.__self__), receiver.__func__
+    return receiver
+
+
+@dataclass
+class SubscriberMetrics:
+    """Время работы одного подписчика в UI-потоке"""
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+
+@dataclass
+class EventMetrics:
+    """
+    Метрики события: сколько раз вызван emit, сколько реальных отправок,
+    сколько emit объединено и задержка от первого emit до отправки.
+    """
+    name: str = ""
+    emits: int = 0
+    dispatches: int = 0
+    coalesced: int = 0
+    total_latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+    subscribers: dict[str, SubscriberMetrics] = field(default_factory=dict)
+
+    @property
+    def avg_latency_ms(self) -> float:
+        return self.total_latency_ms / self.dispatches if self.dispatches else 0.0
+
+
+class QtEventGroup:
+    """
+    События с общим порядком отправки.
+
+    Событие без объединения перед отправкой отправляет накопленные данные остальных
+    событий группы: отложенное "открыт" не придет подписчикам позже немедленного "закрыт".
+    """
+
+    def __init__(self):
+        self._events: list[weakref.ref] = []
+
+    def add(self, event: QtEvent) -> None:
+        self._events.append(weakref.ref(event))
+
+    def flush_pending(self, source: QtEvent) -> None:
+        """Отправить накопленные данные всех событий группы, кроме source, в порядке добавления"""
+        for event_ref in self._events:
+            event = event_ref()
+            if event is not None and event is not source:
+                event.flush()
+
+
 class QtEvent(IEvent[T]):
-    
+    """
+    Событие на сигнале Qt.
+
+    Без merge и min_interval_ms emit отправляется сразу. С merge повторные emit
+    до следующей итерации цикла событий объединяются в одну отправку; min_interval_ms
+    дополнительно ограничивает частоту отправок (данные объединяются до отправки).
+
+    emit можно вызывать из любого потока (например, из LongTaskWorker): данные передаются
+    в поток, где создано событие, и объединение, таймер и метрики работают только там.
+    flush и clear вызываются из потока события.
+
+    group - общий порядок с другими событиями (см. QtEventGroup).
+    """
+
     class _SignalHolder(QObject):
         """Внутренний класс для хранения сигнала"""
         event = pyqtSignal(object)
-    
-    def __init__(self):
-        self._signal_holder = self._SignalHolder()
+        # emit из чужого потока ставится в очередь потока владельца (AutoConnection),
+        # из своего потока слот вызывается сразу
+        requested = pyqtSignal(object, float)
+
+        def __init__(self, owner: QtEvent):
+            super().__init__()
+            self._owner = weakref.ref(owner)
+            self.requested.connect(self._on_requested)
+
+        @pyqtSlot(object, float)
+        def _on_requested(self, data, emitted_at: float):
+            owner = self._owner()
+            if owner is not None:
+                owner._enqueue(data, emitted_at)
+
+    def __init__(
+        self,
+        merge: Callable[[T, T], T] | None = None,
+        min_interval_ms: int = 0,
+        name: str = "",
+        group: QtEventGroup | None = None,
+    ):
+        self._signal_holder = self._SignalHolder(self)
+        self._group = group
+        self._merge = merge
+        self._min_interval_ms = min_interval_ms
+        self._receivers: dict[Any, Callable[[T], None]] = {}
+        self.metrics = EventMetrics(name)
+
+        self._pending: Any = _NO_DATA
+        self._pending_since = 0.0
+        self._last_dispatch = 0.0
+        self._timer: QTimer | None = None
+        if merge is not None or min_interval_ms > 0:
+            self._timer = QTimer(self._signal_holder)
+            self._timer.setSingleShot(True)
+            self._timer.timeout.connect(self.flush)
+        if group is not None:
+            group.add(self)
 
     def connect(self, receiver: Callable[[T], None]) -> None:
         """Подключить слот к сигналу"""
-        self._signal_holder.event.connect(receiver)
+        wrapper = self._timed_receiver(receiver)
+        self._receivers[_receiver_key(receiver)] = wrapper
+        self._signal_holder.event.connect(wrapper)
 
     def disconnect(self, receiver: Callable[[T], None]) -> None:
         """Отключить слот от сигнала"""
         if receiver:
-            self._signal_holder.event.disconnect(receiver)
+            wrapper = self._receivers.pop(_receiver_key(receiver), None)
+            if wrapper is not None:
+                self._signal_holder.event.disconnect(wrapper)
 
     def emit(self, data: T) -> None:
-        """Испустить сигнал с данными"""
-        self._signal_holder.event.emit(data)
+        """Испустить сигнал с данными (из любого потока)"""
+        self._signal_holder.requested.emit(data, time.perf_counter())
+
+    def _enqueue(self, data: T, now: float) -> None:
+        """Прием emit в потоке события: только здесь меняются _pending, таймер и метрики"""
+        self.metrics.emits += 1
+
+        if self._timer is None:
+            if self._group is not None:
+                self._group.flush_pending(self)
+            self._dispatch(data, now)
+            return
+
+        if self._pending is _NO_DATA:
+            self._pending = data
+            self._pending_since = now
+        else:
+            self._pending = self._merge(self._pending, data) if self._merge else data
+            self.metrics.coalesced += 1
+
+        if not self._timer.isActive():
+            wait_ms = (self._last_dispatch - time.perf_counter()) * 1000 + self._min_interval_ms
+            self._timer.start(max(0, int(wait_ms)))
+
+    def flush(self) -> None:
+        """Отправить накопленные данные немедленно"""
+        if self._timer is not None:
+            self._timer.stop()
+        if self._pending is _NO_DATA:
+            return
+        data, self._pending = self._pending, _NO_DATA
+        self._dispatch(data, self._pending_since)
 
     def clear(self) -> None:
         """Отключить все слоты"""
-        self._signal_holder.event.disconnect()
+        self._receivers.clear()
+        self._pending = _NO_DATA
+        if self._timer is not None:
+            self._timer.stop()
+        try:
+            self._signal_holder.event.disconnect()
+        except TypeError:
+            # Нет подключенных слотов
+            pass
+
+    def reset_metrics(self) -> None:
+        self.metrics = EventMetrics(self.metrics.name)
+
+    def _dispatch(self, data: T, emitted_at: float) -> None:
+        now = time.perf_counter()
+        latency_ms = (now - emitted_at) * 1000
+        self._last_dispatch = now
+        self.metrics.dispatches += 1
+        self.metrics.total_latency_ms += latency_ms
+        self.metrics.max_latency_ms = max(self.metrics.max_latency_ms, latency_ms)
+        self._signal_holder.event.emit(data)
+
+    def _timed_receiver(self, receiver: Callable[[T], None]) -> Callable[[T], None]:
+        """
+        Обертка слота с замером времени.
+
+        Связанный метод хранится по слабой ссылке, а для удаленного QObject слот
+        отключается - так же, как Qt поступает со слотами-методами напрямую.
+        """
+        owner = getattr(receiver, '__self__', None)
+        if owner is not None and hasattr(receiver, '__func__'):
+            method_ref = weakref.WeakMethod(receiver)
+            name = f"{type(owner).__qualname__}.{receiver.__func__.__name__}"
+        else:
+            method_ref = lambda: receiver
+            name = getattr(receiver, '__qualname__', repr(receiver))
+
+        event_ref = weakref.ref(self)
+
+        def wrapper(data):
+            method = method_ref()
+            event = event_ref()
+            if method is None or _is_deleted(getattr(method, '__self__', None)):
+                if event is not None:
+                    event._signal_holder.event.disconnect(wrapper)
+                    event._receivers = {key: value for key, value in event._receivers.items() if value is not wrapper}
+                return
+
+            started = time.perf_counter()
+            try:
+                method(data)
+            finally:
+                if event is not None:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    stats = event.metrics.subscribers.setdefault(name, SubscriberMetrics())
+                    stats.calls += 1
+                    stats.total_ms += elapsed_ms
+                    stats.max_ms = max(stats.max_ms, elapsed_ms)
+
+        return wrapper
@@ -14,9 +14,9 @@ from qgis.core import QgsProviderRegistry, QgsDataSourceUri
 from functools import partial
 
 from ...application.interfaces import ILocalization, ISettings, ILogger
-from ...application.dtos import DXFDocumentDTO
+from ...application.dtos import DXFDocumentDTO, DocumentChangeSetDTO
 from ...application.events import IAppEvents
-from ...application.services import ActiveDocumentService, ConnectionConfigService
+from ...application.services import ActiveDocumentService, ConnectionConfigService, PreviewCacheService
 from ...application.use_cases import (
     OpenDocumentUseCase,
     SelectEntityUseCase,
@@ -48,6 +48,7 @@ class ConverterDialog(QDialog, FORM_CLASS):
         'save_selected_to_file_use_case',
         'active_doc_service',
         'connection_service',
+        'preview_cache',
         'app_events',
         'localization',
         'settings',
@@ -64,6 +65,7 @@ class ConverterDialog(QDialog, FORM_CLASS):
         save_selected_to_file_use_case: SaveSelectedToFileUseCase,
         active_doc_service: ActiveDocumentService,
         connection_service: ConnectionConfigService,
+        preview_cache: PreviewCacheService,
         app_events: IAppEvents,
         localization: ILocalization,
         settings: ISettings,
@@ -80,6 +82,7 @@ class ConverterDialog(QDialog, FORM_CLASS):
         self._save_selected_to_file_use_case = save_selected_to_file_use_case
         self._active_doc_service = active_doc_service
         self._connection_service = connection_service
+        self._preview_cache = preview_cache
         self._app_events = app_events
         self._localization = localization
         self._settings = settings
@@ -91,6 +94,7 @@ class ConverterDialog(QDialog, FORM_CLASS):
             connection_service=self._connection_service,
             data_viewer_use_case=self._data_viewer_use_case,
             export_use_case=self._export_use_case,
+            preview_cache=self._preview_cache,
             localization=self._localization,
             logger=self._logger,
             on_qgis_export_ready=self._on_export_qgis_files_ready,
@@ -162,7 +166,7 @@ class ConverterDialog(QDialog, FORM_CLASS):
         # Buttons
         self._app_events.on_document_opened.connect(self._on_document_opened)
         self._app_events.on_document_closed.connect(self._on_document_closed)
-        self._app_events.on_document_modified.connect(self._on_document_modified)
+        self._app_events.on_document_changes.connect(self._on_document_changes)
 
         self.open_dxf_button.clicked.connect(self._on_open_dxf_button_click)
         self.select_area_button.clicked.connect(self._on_select_area_button_click)
@@ -211,6 +215,8 @@ class ConverterDialog(QDialog, FORM_CLASS):
         self.type_selection.addItem(self._localization.tr("MAIN_DIALOG", "selection_inside"))
         self.type_selection.addItem(self._localization.tr("MAIN_DIALOG", "selection_outside"))
         self.type_selection.addItem(self._localization.tr("MAIN_DIALOG", "selection_intersect"))
+        self.type_selection.addItem(self._localization.tr("MAIN_DIALOG", "selection_inside_exact"))
+        self.type_selection.addItem(self._localization.tr("MAIN_DIALOG", "selection_intersect_exact"))
 
         self.selection_mode.clear()
         self.selection_mode.addItem(self._localization.tr("MAIN_DIALOG", "mode_join"))
@@ -244,7 +250,6 @@ class ConverterDialog(QDialog, FORM_CLASS):
         self.tree_widget_handler.rebuild_tree(
             self._active_doc_service.get_all()
         )
-        self._qgis_layer_sync_manager.sync_now()
 
     def _on_document_closed(self, document: list[DXFDocumentDTO]):
         self._switch_ui()
@@ -252,12 +257,19 @@ class ConverterDialog(QDialog, FORM_CLASS):
         self.tree_widget_handler.rebuild_tree(
             self._active_doc_service.get_all()
         )
-        self._qgis_layer_sync_manager.sync_now()
 
-    def _on_document_modified(self, document: list[DXFDocumentDTO]):
-        self._update_file_check()
-        self._reset_selection_layers()
-        self.tree_widget_handler.update_tree()
+    def _on_document_changes(self, change_sets: list[DocumentChangeSetDTO]):
+        # Открытие и закрытие обрабатываются полной перестройкой в своих обработчиках
+        selection_changes = [change_set for change_set in change_sets if not change_set.is_structural]
+        if not selection_changes:
+            return
+
+        self.tree_widget_handler.apply_changes(selection_changes)
+
+        current_filename = self.file_filter_combo.currentText()
+        if any(change_set.filename == current_filename for change_set in selection_changes):
+            self._update_file_check()
+            self._reset_selection_layers()
 
     # ========== filter_groupbox ==========
 
@@ -1,6 +1,7 @@
 
 from .dialog_translator import DialogTranslator
 from .area_selection_controller import AreaSelectionController
+from .thumbnail_renderer import ThumbnailRenderer, PixmapLRUCache
 from .export_tab_controller import ExportTabController
 from .progress_task_runner import ProgressTaskRunner
 
@@ -9,4 +10,6 @@ __all__ = [
     'AreaSelectionController',
     'ExportTabController',
     'ProgressTaskRunner',
+    'ThumbnailRenderer',
+    'PixmapLRUCache',
 ]
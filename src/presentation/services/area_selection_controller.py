@@ -121,6 +121,8 @@ class AreaSelectionController:
             0: SelectionRule.INSIDE,
             1: SelectionRule.OUTSIDE,
             2: SelectionRule.INTERSECT,
+            3: SelectionRule.INSIDE_EXACT,
+            4: SelectionRule.INTERSECT_EXACT,
         }
         mode_by_index = {
             0: SelectionMode.JOIN,
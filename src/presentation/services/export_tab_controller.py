@@ -8,8 +8,8 @@ from datetime import datetime
 from pathlib import Path
 from time import perf_counter
 
-from PyQt5.QtGui import QColor, QFont, QIcon, QImage, QPainter, QPixmap
-from PyQt5.QtSvg import QSvgRenderer
+from PyQt5 import sip
+from PyQt5.QtGui import QColor, QFont, QIcon, QPainter, QPixmap
 from PyQt5.QtWidgets import (
     QMessageBox,
     QTreeWidgetItem,
@@ -26,9 +26,10 @@ from PyQt5.QtCore import QTimer
 
 from ...application.dtos import ConnectionConfigDTO, ExportConfigDTO, ExportMode
 from ...application.interfaces import ILocalization, ILogger
-from ...application.services import ConnectionConfigService
+from ...application.services import ConnectionConfigService, PreviewCacheService
 from ...application.use_cases import DataViewerUseCase, ExportUseCase
 from ...presentation.services.progress_task_runner import ProgressTaskRunner
+from ...presentation.services.thumbnail_renderer import ThumbnailRenderer
 from ...presentation.widgets import SvgPreviewDialog
 
 
@@ -94,6 +95,8 @@ class ExportTabController:
 
     _PREVIEW_SIZE = 128
     _ACTION_BUTTON_SIZE = 36
+    _DB_FILES_PAGE_SIZE = 200
+    _PIXMAP_CACHE_BYTES = 32 * 1024 * 1024
 
     def __init__(
         self,
@@ -102,6 +105,7 @@ class ExportTabController:
         connection_service: ConnectionConfigService,
         data_viewer_use_case: DataViewerUseCase,
         export_use_case: ExportUseCase,
+        preview_cache: PreviewCacheService,
         localization: ILocalization,
         logger: ILogger,
         on_qgis_export_ready: Callable[[list[str]], None] | None = None,
@@ -111,20 +115,29 @@ class ExportTabController:
         self._connection_service = connection_service
         self._data_viewer_use_case = data_viewer_use_case
         self._export_use_case = export_use_case
+        self._preview_cache = preview_cache
         self._localization = localization
         self._logger = logger
         self._on_qgis_export_ready = on_qgis_export_ready
 
         self._selected_connection: ConnectionConfigDTO | None = None
         self._export_schema = ""
-        self._preview_dir = Path(__file__).resolve().parents[3] / "previews"
-        self._thumbs_dir = self._preview_dir / ".thumbs"
         self._doc_info_cache: dict[str, dict] = {}
-        self._pixmap_cache: dict[str, QPixmap] = {}
         self._pending_thumb_buttons: dict[str, list[_PreviewButton]] = {}
-        self._thumb_queue: list[Path] = []
-        self._thumb_queue_set: set[str] = set()
-        self._thumb_generation_active = False
+        self._thumb_renderer = ThumbnailRenderer(
+            self._preview_cache.thumbnails,
+            self._PREVIEW_SIZE,
+            self._PIXMAP_CACHE_BYTES,
+            parent=self._dialog,
+        )
+        # filename -> путь превью: по видимым строкам списка находятся видимые миниатюры
+        self._thumb_key_by_filename: dict[str, str] = {}
+        self._dialog.db_tree_widget.verticalScrollBar().valueChanged.connect(
+            lambda _value: self._update_visible_thumbs()
+        )
+        self._thumb_renderer.thumbnail_ready.connect(self._on_thumbnail_ready)
+        self._thumb_renderer.thumbnail_failed.connect(self._on_thumbnail_failed)
+        self._db_files_generation = 0
 
     def update_ui_language(self):
         self._dialog.db_tree_widget.setColumnCount(2)
@@ -213,21 +226,30 @@ class ExportTabController:
         self._run_export(destination, source_mode)
 
     def refresh_db_files(self):
-        t0 = perf_counter()
+        self._db_files_generation += 1
         self._dialog.db_tree_widget.clear()
         self._doc_info_cache = {}
         self._pending_thumb_buttons = {}
-        self._thumb_queue = []
-        self._thumb_queue_set = set()
-        self._thumb_generation_active = False
+        self._thumb_key_by_filename = {}
+        self._thumb_renderer.cancel_pending()
 
         if self._selected_connection is None or not self._export_schema:
             self._update_export_ui()
             return
 
-        result = self._data_viewer_use_case.get_filenames(
+        self._load_db_files_page(self._db_files_generation, None, perf_counter())
+
+    def _load_db_files_page(self, generation: int, after_filename: str | None, t0: float):
+        """Загружает очередную страницу документов (keyset по filename) и планирует следующую."""
+        if generation != self._db_files_generation:
+            return
+
+        t_page = perf_counter()
+        result = self._data_viewer_use_case.get_documents(
             self._selected_connection,
             self._export_schema,
+            after_filename=after_filename,
+            limit=self._DB_FILES_PAGE_SIZE,
         )
         t_fetch = perf_counter()
 
@@ -236,42 +258,52 @@ class ExportTabController:
             self._update_export_ui()
             return
 
+        documents = result.value
         self._dialog.db_tree_widget.setUpdatesEnabled(False)
         preview_present = 0
-        for filename in result.value:
+        for doc_meta in documents:
+            filename = doc_meta.get("filename")
             if not filename:
                 continue
+            self._doc_info_cache[filename] = doc_meta
             item = QTreeWidgetItem([filename])
             item.setFlags(item.flags() | Qt.ItemIsUserCheckable | Qt.ItemIsSelectable | Qt.ItemIsEnabled)
             item.setCheckState(0, Qt.Unchecked)
             self._dialog.db_tree_widget.addTopLevelItem(item)
-            has_preview = (self._preview_dir / f"{Path(filename).stem}.svg").exists()
-            if has_preview:
+            preview_path = self._preview_cache.find_document_preview(
+                self._selected_connection,
+                self._export_schema,
+                filename,
+                int(doc_meta.get("file_size") or 0),
+            )
+            if preview_path:
                 preview_present += 1
-            self._dialog.db_tree_widget.setItemWidget(item, 1, self._build_actions_widget(item, has_preview))
+            self._dialog.db_tree_widget.setItemWidget(item, 1, self._build_actions_widget(item, preview_path))
 
-        if self._dialog.db_tree_widget.topLevelItemCount() == 0:
+        has_more = len(documents) >= self._DB_FILES_PAGE_SIZE
+        if not has_more and self._dialog.db_tree_widget.topLevelItemCount() == 0:
             empty_item = QTreeWidgetItem([self._localization.tr("MAIN_DIALOG", "db_files_empty")])
             empty_item.setFlags(Qt.ItemIsEnabled)
             self._dialog.db_tree_widget.addTopLevelItem(empty_item)
 
         self._dialog.db_tree_widget.setUpdatesEnabled(True)
+        self._update_visible_thumbs()
         self._update_export_ui()
 
-        if self._thumb_queue:
-            self._thumb_generation_active = True
-            QTimer.singleShot(0, self._process_thumb_queue_step)
-
         t_done = perf_counter()
         self._logger.message(
-            "Export list refresh timings: "
-            f"fetch={t_fetch - t0:.3f}s, "
+            "Export list page timings: "
+            f"fetch={t_fetch - t_page:.3f}s, "
             f"render={t_done - t_fetch:.3f}s, "
             f"total={t_done - t0:.3f}s, "
-            f"files={len(result.value)}, previews={preview_present}"
+            f"files={len(documents)}, previews={preview_present}"
         )
 
-    def _build_actions_widget(self, item: QTreeWidgetItem, has_preview: bool) -> QWidget:
+        if has_more:
+            last_filename = documents[-1].get("filename")
+            QTimer.singleShot(0, partial(self._load_db_files_page, generation, last_filename, t0))
+
+    def _build_actions_widget(self, item: QTreeWidgetItem, preview_path: str | None) -> QWidget:
         container = QWidget(self._dialog.db_tree_widget)
         layout = QHBoxLayout(container)
         layout.setContentsMargins(4, 2, 4, 2)
@@ -282,7 +314,6 @@ class ExportTabController:
         preview_column.setSpacing(4)
 
         filename = item.text(0)
-        preview_path = self._preview_dir / f"{Path(filename).stem}.svg"
 
         preview_button = _PreviewButton(container)
         preview_button.setFixedSize(self._PREVIEW_SIZE, self._PREVIEW_SIZE)
@@ -291,7 +322,7 @@ class ExportTabController:
             "border: 1px solid #C9C9C9; border-radius: 4px; background: #FAFAFA;"
             "font-size: 12px; font-weight: 600; color: #606060;"
         )
-        preview_button.clicked.connect(lambda: self._show_preview(str(preview_path)))
+        preview_button.clicked.connect(lambda: self._show_preview(preview_path or ""))
 
         load_preview_button = QPushButton("Подгрузить превью", container)
         load_preview_button.setFixedHeight(24)
@@ -299,23 +330,20 @@ class ExportTabController:
             partial(
                 self._on_load_preview_click,
                 filename,
-                preview_path,
                 preview_button,
                 load_preview_button,
             )
         )
 
-        if has_preview:
-            pixmap = self._get_cached_thumb_pixmap(preview_path)
+        if preview_path:
+            pixmap = self._thumb_renderer.cache.get(preview_path)
             if pixmap is not None:
                 preview_button.set_preview_pixmap(pixmap)
             else:
                 preview_button.set_placeholder("SVG")
-                key = str(preview_path)
-                self._pending_thumb_buttons.setdefault(key, []).append(preview_button)
-                if key not in self._thumb_queue_set:
-                    self._thumb_queue.append(preview_path)
-                    self._thumb_queue_set.add(key)
+                self._pending_thumb_buttons.setdefault(preview_path, []).append(preview_button)
+                self._thumb_key_by_filename[filename] = preview_path
+                self._thumb_renderer.request(Path(preview_path))
             load_preview_button.setVisible(False)
         else:
             preview_button.set_placeholder("N/A")
@@ -345,7 +373,6 @@ class ExportTabController:
     def _on_load_preview_click(
         self,
         filename: str,
-        preview_path: Path,
         preview_button: _PreviewButton,
         load_button: QPushButton,
     ) -> None:
@@ -353,23 +380,19 @@ class ExportTabController:
             self._selected_connection,
             self._export_schema,
             filename,
-            str(self._preview_dir),
         )
         if result.is_fail:
             QMessageBox.critical(self._dialog, "Ошибка", f"Не удалось создать превью: {result.error}")
             return
 
         created_path = Path(result.value)
-        pixmap = self._get_cached_thumb_pixmap(created_path)
-        if pixmap is None:
-            self._build_thumb_to_disk(created_path)
-            pixmap = self._get_cached_thumb_pixmap(created_path)
+        pixmap = self._get_thumb_pixmap(created_path)
 
         if pixmap is not None:
             preview_button.setEnabled(True)
             preview_button.set_preview_pixmap(pixmap)
             preview_button.clicked.disconnect()
-            preview_button.clicked.connect(lambda: self._show_preview(str(preview_path)))
+            preview_button.clicked.connect(lambda: self._show_preview(str(created_path)))
         else:
             preview_button.setEnabled(True)
             preview_button.set_placeholder("SVG")
@@ -404,8 +427,13 @@ class ExportTabController:
         update_date = self._format_datetime(doc_meta.get("update_date"))
         size_text = self._format_size(doc_meta.get("file_size", 0))
         layer_count = doc_meta.get("layer_count", 0)
-        preview_path = self._preview_dir / f"{Path(filename).stem}.svg"
-        preview_state = "есть" if preview_path.exists() else "нет"
+        preview_path = self._preview_cache.find_document_preview(
+            self._selected_connection,
+            self._export_schema,
+            filename,
+            int(doc_meta.get("file_size") or 0),
+        )
+        preview_state = "есть" if preview_path else "нет"
 
         message = QMessageBox(self._dialog)
         message.setWindowTitle("Информация о файле")
@@ -450,71 +478,35 @@ class ExportTabController:
             return f"{int(size)} {units[idx]}"
         return f"{size:.2f} {units[idx]}"
 
-    def _get_cached_thumb_pixmap(self, svg_path: Path) -> QPixmap | None:
-        cache_key = str(svg_path)
-        cached = self._pixmap_cache.get(cache_key)
-        if cached is not None and not cached.isNull():
-            return cached
-
+    def _get_thumb_pixmap(self, svg_path: Path) -> QPixmap | None:
         try:
-            self._thumbs_dir.mkdir(parents=True, exist_ok=True)
-            thumb_path = self._thumbs_dir / f"{svg_path.stem}_{self._PREVIEW_SIZE}.png"
-
-            if thumb_path.exists() and thumb_path.stat().st_mtime >= svg_path.stat().st_mtime:
-                pixmap = QPixmap(str(thumb_path))
-                if not pixmap.isNull():
-                    self._pixmap_cache[cache_key] = pixmap
-                    return pixmap
-        except Exception as exc:
-            self._logger.warning(f"Failed to load preview thumbnail '{svg_path}': {exc}")
-            return None
-
-        return None
-
-    def _build_thumb_to_disk(self, svg_path: Path) -> bool:
-        try:
-            self._thumbs_dir.mkdir(parents=True, exist_ok=True)
-            thumb_path = self._thumbs_dir / f"{svg_path.stem}_{self._PREVIEW_SIZE}.png"
-
-            renderer = QSvgRenderer(str(svg_path))
-            if not renderer.isValid():
-                return False
-
-            image = QImage(self._PREVIEW_SIZE, self._PREVIEW_SIZE, QImage.Format_ARGB32)
-            image.fill(Qt.transparent)
-            painter = QPainter(image)
-            renderer.render(painter)
-            painter.end()
-
-            return image.save(str(thumb_path), "PNG")
+            return self._thumb_renderer.render_now(svg_path)
         except Exception as exc:
             self._logger.warning(f"Failed to build preview thumbnail '{svg_path}': {exc}")
-            return False
-
-    def _process_thumb_queue_step(self) -> None:
-        if not self._thumb_queue:
-            self._thumb_generation_active = False
-            return
-
-        svg_path = self._thumb_queue.pop(0)
-        key = str(svg_path)
-        self._thumb_queue_set.discard(key)
-
-        if svg_path.exists():
-            self._build_thumb_to_disk(svg_path)
+            return None
 
-        pixmap = self._get_cached_thumb_pixmap(svg_path)
-        if pixmap is not None:
-            for button in self._pending_thumb_buttons.get(key, []):
-                if button is not None and button.parent() is not None:
-                    button.setEnabled(True)
-                    button.set_preview_pixmap(pixmap)
+    def _update_visible_thumbs(self) -> None:
+        """Передает рендереру миниатюры строк, попавших в область просмотра (обход только видимых строк)"""
+        tree = self._dialog.db_tree_widget
+        height = tree.viewport().height()
+        keys = []
+        item = tree.itemAt(0, 0)
+        while item is not None and tree.visualItemRect(item).top() < height:
+            key = self._thumb_key_by_filename.get(item.text(0))
+            if key is not None:
+                keys.append(key)
+            item = tree.itemBelow(item)
+        self._thumb_renderer.set_visible(keys)
+
+    def _on_thumbnail_ready(self, key: str, pixmap: QPixmap) -> None:
+        for button in self._pending_thumb_buttons.pop(key, []):
+            if button is not None and not sip.isdeleted(button) and button.parent() is not None:
+                button.setEnabled(True)
+                button.set_preview_pixmap(pixmap)
+
+    def _on_thumbnail_failed(self, key: str, message: str) -> None:
         self._pending_thumb_buttons.pop(key, None)
-
-        if self._thumb_queue:
-            QTimer.singleShot(0, self._process_thumb_queue_step)
-        else:
-            self._thumb_generation_active = False
+        self._logger.warning(f"Failed to build preview thumbnail '{key}': {message}")
 
     def _delete_document(self, filename: str) -> None:
         if not filename:
@@ -541,12 +533,8 @@ class ExportTabController:
 
         if result.value:
             self._doc_info_cache.pop(filename, None)
-            preview_path = self._preview_dir / f"{Path(filename).stem}.svg"
-            if preview_path.exists():
-                try:
-                    preview_path.unlink()
-                except Exception as exc:
-                    self._logger.warning(f"Failed to delete preview '{preview_path}': {exc}")
+            # Превью адресовано содержимым и может принадлежать другому документу: удаляется только ссылка
+            self._preview_cache.unlink_document(self._selected_connection, self._export_schema, filename)
             self.refresh_db_files()
         else:
             QMessageBox.information(self._dialog, "Информация", "Файл уже отсутствует в БД")
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+
+from qgis.PyQt.QtCore import QObject, QThreadPool, pyqtSignal
+from qgis.PyQt.QtGui import QImage, QPixmap
+
+from ...application.interfaces import IFileCache
+from ..workers.thumbnail_worker import ThumbnailWorker, render_thumbnail
+
+
+class PixmapLRUCache:
+    """Кэш QPixmap в памяти, ограниченный суммарным размером в байтах; вытесняются давно не использованные."""
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._items: OrderedDict[str, tuple[QPixmap, int]] = OrderedDict()
+        self._total_bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, key: str) -> QPixmap | None:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        self._items.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, pixmap: QPixmap) -> None:
+        self.discard(key)
+        size = pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+        if size > self._max_bytes:
+            return
+        self._items[key] = (pixmap, size)
+        self._total_bytes += size
+        while self._total_bytes > self._max_bytes:
+            _, (_, evicted_size) = self._items.popitem(last=False)
+            self._total_bytes -= evicted_size
+
+    def discard(self, key: str) -> None:
+        entry = self._items.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._total_bytes = 0
+
+
+class ThumbnailRenderer(QObject):
+    """
+    Растеризация миниатюр SVG в пуле потоков.
+
+    Одновременно в пул отдается не больше задач, чем в нем потоков; следующая
+    задача выбирается при освобождении потока, и видимые миниатюры идут первыми:
+    они лежат в отдельной очереди, которую обновляет set_visible при изменении области просмотра.
+    Готовые изображения превращаются в QPixmap в GUI-потоке и попадают в LRU-кэш;
+    PNG-файлы миниатюр хранятся в дисковом кэше с ограничением объема.
+    """
+
+    thumbnail_ready = pyqtSignal(str, QPixmap)  # key, pixmap
+    thumbnail_failed = pyqtSignal(str, str)  # key, message
+
+    def __init__(
+        self,
+        thumb_cache: IFileCache,
+        size: int,
+        cache_bytes: int,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._thumb_cache = thumb_cache
+        self._size = size
+        self.cache = PixmapLRUCache(cache_bytes)
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(1, QThreadPool.globalInstance().maxThreadCount() - 1))
+        self._pending: OrderedDict[str, Path] = OrderedDict()
+        # Очередь видимых миниатюр - подмножество _pending, выбирается первой
+        self._visible: OrderedDict[str, None] = OrderedDict()
+        self._visible_keys: set[str] = set()
+        self._in_flight: dict[str, ThumbnailWorker] = {}
+
+    def request(self, svg_path: Path) -> None:
+        """Ставит миниатюру в очередь, если ее нет в кэше и она еще не готовится."""
+        key = str(svg_path)
+        if key in self._pending or key in self._in_flight or self.cache.get(key) is not None:
+            return
+        self._pending[key] = svg_path
+        if key in self._visible_keys:
+            self._visible[key] = None
+        self._pump()
+
+    def set_visible(self, keys: Iterable[str]) -> None:
+        """Задает видимые миниатюры (сверху вниз); вызывается при прокрутке и изменении списка."""
+        keys = list(keys)
+        self._visible_keys = set(keys)
+        self._visible = OrderedDict((key, None) for key in keys if key in self._pending)
+
+    def render_now(self, svg_path: Path) -> QPixmap | None:
+        """Синхронная миниатюра для единичного запроса (например, сразу после создания превью)."""
+        key = str(svg_path)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        image = render_thumbnail(svg_path, self._size, self._thumb_cache)
+        if image.isNull():
+            return None
+        pixmap = QPixmap.fromImage(image)
+        self.cache.put(key, pixmap)
+        return pixmap
+
+    def cancel_pending(self) -> None:
+        """Сбрасывает очередь; уже запущенные задачи доработают и попадут в кэш."""
+        self._pending.clear()
+        self._visible.clear()
+
+    def _pump(self) -> None:
+        while self._pending and len(self._in_flight) < self._pool.maxThreadCount():
+            if self._visible:
+                key, _ = self._visible.popitem(last=False)
+            else:
+                key = next(iter(self._pending))
+            svg_path = self._pending.pop(key)
+
+            worker = ThumbnailWorker(key, svg_path, self._size, self._thumb_cache)
+            worker.signals.finished.connect(self._on_worker_finished)
+            worker.signals.error.connect(self._on_worker_error)
+            self._in_flight[key] = worker
+            self._pool.start(worker)
+
+    def _on_worker_finished(self, key: str, image: QImage) -> None:
+        self._in_flight.pop(key, None)
+        if image.isNull():
+            self.thumbnail_failed.emit(key, "SVG could not be rendered")
+        else:
+            pixmap = QPixmap.fromImage(image)
+            self.cache.put(key, pixmap)
+            self.thumbnail_ready.emit(key, pixmap)
+        self._pump()
+
+    def _on_worker_error(self, key: str, message: str) -> None:
+        self._in_flight.pop(key, None)
+        self.thumbnail_failed.emit(key, message)
+        self._pump()
@@ -1,10 +1,12 @@
 
+from .dxf_tree_model import DxfTreeModel
 from .selectable_dxf_tree_handler import SelectableDxfTreeHandler
 from .viewer_dxf_tree_handler import ViewerDxfTreeHandler
 from .qgis_layer_sync_manager import QGISLayerSyncManager
 from .svg_preview_dialog import SvgPreviewDialog
 
 __all__ = [
+    'DxfTreeModel',
     'SelectableDxfTreeHandler',
     'ViewerDxfTreeHandler',
     'QGISLayerSyncManager',
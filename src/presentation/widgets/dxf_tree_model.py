@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+from uuid import UUID
+
+from qgis.PyQt.QtCore import QAbstractItemModel, QModelIndex, Qt, pyqtSignal
+
+from ...application.dtos import DXFBaseDTO, DXFDocumentDTO, DXFLayerDTO
+from ...application.interfaces import ILocalization
+
+# Сколько строк сущностей добавляется в слой за один fetchMore
+FETCH_BATCH_SIZE = 1000
+
+_ROOT, _DOCUMENT, _LAYER = range(3)
+
+
+class _TreeNode:
+    """
+    Узел корня, документа или слоя.
+
+    Для сущностей узлы не создаются: строка сущности адресуется индексом,
+    internalPointer которого - узел слоя, а DTO берется из слоя по номеру строки.
+    """
+
+    __slots__ = ('kind', 'dto', 'parent', 'row', 'children', 'entities', 'fetched')
+
+    def __init__(self, kind: int, dto: DXFBaseDTO | None = None, parent: _TreeNode | None = None, row: int = 0):
+        self.kind = kind
+        self.dto = dto
+        self.parent = parent
+        self.row = row
+        self.children: list[_TreeNode] = []
+        self.entities = dto.entities if kind == _LAYER else ()
+        self.fetched = 0
+
+
+class DxfTreeModel(QAbstractItemModel):
+    """
+    Ленивая модель дерева документов DXF: файл -> слои -> сущности.
+
+    Узлы создаются только для документов и слоев; строки сущностей появляются
+    порциями при раскрытии слоя (canFetchMore/fetchMore). Текст и состояние
+    чекбоксов читаются из DTO-представлений при отрисовке, поэтому модель
+    не хранит копию флагов выбора.
+    """
+
+    # (id объекта, выбран) - пользователь изменил чекбокс
+    check_state_changed = pyqtSignal(object, bool)
+
+    def __init__(self, localization: ILocalization, parent=None):
+        super().__init__(parent)
+        self._localization = localization
+        self._root = _TreeNode(_ROOT)
+        self._nodes_by_id: dict[UUID, _TreeNode] = {}
+
+    def reset(self, documents: list[DXFDocumentDTO]):
+        """Полностью заменяет содержимое модели; стоимость пропорциональна числу документов и слоев"""
+        self.beginResetModel()
+        self._root = _TreeNode(_ROOT)
+        self._nodes_by_id = {}
+        for doc_row, doc in enumerate(documents):
+            doc_node = _TreeNode(_DOCUMENT, doc, self._root, doc_row)
+            self._root.children.append(doc_node)
+            self._nodes_by_id[doc.id] = doc_node
+            for layer_row, layer in enumerate(doc.layers):
+                layer_node = _TreeNode(_LAYER, layer, doc_node, layer_row)
+                doc_node.children.append(layer_node)
+                self._nodes_by_id[layer.id] = layer_node
+        self.endResetModel()
+
+    def refresh_documents(self, document_ids=None):
+        """
+        Сообщает представлению об изменении выбора в документах.
+
+        На слой отправляется один сигнал dataChanged для всех загруженных строк;
+        перерисовываются только видимые строки.
+        """
+        roles = [Qt.DisplayRole, Qt.CheckStateRole]
+        if document_ids is None:
+            doc_nodes = self._root.children
+        else:
+            doc_nodes = [self._nodes_by_id[doc_id] for doc_id in document_ids if doc_id in self._nodes_by_id]
+
+        for doc_node in doc_nodes:
+            doc_index = self.createIndex(doc_node.row, 0, self._root)
+            self.dataChanged.emit(doc_index, doc_index, roles)
+            if not doc_node.children:
+                continue
+
+            first = self.createIndex(0, 0, doc_node)
+            last = self.createIndex(len(doc_node.children) - 1, 0, doc_node)
+            self.dataChanged.emit(first, last, roles)
+            for layer_node in doc_node.children:
+                if layer_node.fetched:
+                    self.dataChanged.emit(
+                        self.createIndex(0, 0, layer_node),
+                        self.createIndex(layer_node.fetched - 1, 0, layer_node),
+                        roles,
+                    )
+
+    def document_index(self, document_id: UUID, column: int = 0) -> QModelIndex:
+        node = self._nodes_by_id.get(document_id)
+        if node is None or node.kind != _DOCUMENT:
+            return QModelIndex()
+        return self.createIndex(node.row, column, self._root)
+
+    # ========== QAbstractItemModel ==========
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self._node_at(parent))
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        container = index.internalPointer()
+        if container is self._root:
+            return QModelIndex()
+        return self.createIndex(container.row, 0, container.parent)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        node = self._node_at(parent)
+        if node is None:
+            return 0
+        return node.fetched if node.kind == _LAYER else len(node.children)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 2
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.column() > 0:
+            return False
+        node = self._node_at(parent)
+        if node is None:
+            return False
+        return len(node.entities) > 0 if node.kind == _LAYER else bool(node.children)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        node = self._node_at(parent)
+        return node is not None and node.kind == _LAYER and node.fetched < len(node.entities)
+
+    def fetchMore(self, parent: QModelIndex):
+        node = self._node_at(parent)
+        if node is None or node.kind != _LAYER:
+            return
+        count = min(FETCH_BATCH_SIZE, len(node.entities) - node.fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(parent, node.fetched, node.fetched + count - 1)
+        node.fetched += count
+        self.endInsertRows()
+
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == 0:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or index.column() != 0:
+            return None
+
+        dto = self._dto_at(index)
+        if role == Qt.DisplayRole:
+            return self._label(dto)
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if dto.selected else Qt.Unchecked
+        return None
+
+    def setData(self, index: QModelIndex, value, role: int = Qt.EditRole) -> bool:
+        if not index.isValid() or index.column() != 0 or role != Qt.CheckStateRole:
+            return False
+        # Флаг хранится в доменной модели: дерево обновится по событию изменения документа
+        self.check_state_changed.emit(self._dto_at(index).id, Qt.CheckState(value) == Qt.Checked)
+        return True
+
+    # ========== helpers ==========
+
+    def _node_at(self, index: QModelIndex) -> _TreeNode | None:
+        """Узел документа/слоя для индекса (корень для невалидного), None - для строки сущности"""
+        if not index.isValid():
+            return self._root
+        container = index.internalPointer()
+        if container.kind == _LAYER:
+            return None
+        return container.children[index.row()]
+
+    def _dto_at(self, index: QModelIndex) -> DXFBaseDTO:
+        container = index.internalPointer()
+        if container.kind == _LAYER:
+            return container.entities[index.row()]
+        return container.children[index.row()].dto
+
+    def _label(self, dto: DXFBaseDTO) -> str:
+        if isinstance(dto, DXFDocumentDTO):
+            return self._localization.tr("TREE_WIDGET_HANDLER", "file_text",
+                dto.filename,
+                dto.selected_layers_count,
+                len(dto.layers),
+                dto.selected_entities_count,
+                dto.entities_count
+            )
+        if isinstance(dto, DXFLayerDTO):
+            return self._localization.tr("TREE_WIDGET_HANDLER", "layer_text",
+                dto.name,
+                dto.selected_count,
+                len(dto.entities)
+            )
+        return dto.name
@@ -2,22 +2,30 @@ from __future__ import annotations
 
 import os
 from typing import Any
+from uuid import UUID
 
 import inject
 
-from qgis.PyQt.QtCore import QObject
+from qgis.PyQt.QtCore import QObject, QTimer
 from qgis.core import QgsProject, QgsLayerTreeGroup, QgsLayerTreeLayer
 
+from ...application.dtos import DXFDocumentDTO, DocumentChangeSetDTO
 from ...application.events import IAppEvents
 from ...application.interfaces import ILogger
 from ...application.services import ActiveDocumentService
 from ...application.use_cases import SelectEntityUseCase
 
+# Пауза, за которую пачка событий изменения документов объединяется в одну синхронизацию
+SYNC_DEBOUNCE_MS = 50
+
 
 class QGISLayerSyncManager(QObject):
     """
     Менеджер синхронизации между деревом плагина и панелью слоев QGIS.
     Обеспечивает двустороннюю синхронизацию состояния checkbox-ов.
+
+    События изменения документов накапливаются и применяются одной синхронизацией
+    после короткой паузы; заново ищутся узлы только изменившихся документов.
     """
     
     @inject.autoparams(
@@ -41,74 +49,73 @@ class QGISLayerSyncManager(QObject):
         self.project = QgsProject.instance()
         self.layer_tree = self.project.layerTreeRoot()
         self.sync_mapping: dict[str, dict[str, Any]] = {}
-        self._connected_nodes: list[Any] = []
+        # Подключенный узел QGIS -> (имя файла, имя слоя или None для группы файла)
+        self._node_targets: dict[Any, tuple[str, str | None]] = {}
         self._sync_guard = False
 
-        self._app_events.on_document_opened.connect(self._on_documents_changed)
-        self._app_events.on_document_closed.connect(self._on_documents_changed)
-        self._app_events.on_document_modified.connect(self._on_documents_changed)
+        # Отложенные изменения: файлы, чьи узлы нужно найти заново, и изменившиеся объекты по файлам
+        self._dirty_filenames: set[str] = set()
+        self._changed_ids: dict[str, set[UUID]] = {}
+        self._sync_timer = QTimer(self)
+        self._sync_timer.setSingleShot(True)
+        self._sync_timer.setInterval(SYNC_DEBOUNCE_MS)
+        self._sync_timer.timeout.connect(self._flush_pending)
+
+        self._app_events.on_document_changes.connect(self._on_document_changes)
 
     def sync_now(self) -> None:
         """Полная синхронизация состояния слоёв между моделью и деревом QGIS."""
-        self._rebuild_mapping()
-        self._apply_model_state_to_qgis()
-    
-    def _find_group_by_name(self, group_name: str):
-        """
-        Ищет группу по имени в корне дерева слоев QGIS.
-        
-        Args:
-            group_name: Имя группы для поиска
-            
-        Returns:
-            QgsLayerTreeGroup или None если не найдено
-        """
-        for child in self.layer_tree.children():
-            if isinstance(child, QgsLayerTreeGroup) and child.name() == group_name:
-                return child
-        return None
+        self._sync_timer.stop()
+        self._dirty_filenames.clear()
+        self._changed_ids.clear()
 
-    def _find_child_group_by_name(self, parent_group: QgsLayerTreeGroup, group_name: str):
-        """
-        Ищет дочернюю группу по имени в родительской группе.
-        
-        Args:
-            parent_group: Родительская группа
-            group_name: Имя дочерней группы для поиска
-            
-        Returns:
-            QgsLayerTreeGroup или None если не найдено
+        self._disconnect_all_nodes()
+        self.sync_mapping = {}
+
+        documents = self._active_doc_service.get_all()
+        root_groups, _ = self._index_children(self.layer_tree)
+        for doc in documents:
+            self._resolve_document(doc, root_groups)
+        self._apply_model_state_to_qgis(documents)
+
+    def _index_children(self, parent_group) -> tuple[dict[str, Any], dict[str, Any]]:
         """
-        for child in parent_group.children():
-            if isinstance(child, QgsLayerTreeGroup) and child.name() == group_name:
-                return child
-        return None
+        Дочерние группы и слои узла по имени.
 
-    def _find_child_layer_by_name(self, parent_group: QgsLayerTreeGroup, layer_name: str):
+        При совпадении имен остается первый узел, как при последовательном поиске.
+        """
+        groups: dict[str, Any] = {}
+        layers: dict[str, Any] = {}
         for child in parent_group.children():
-            if not isinstance(child, QgsLayerTreeLayer):
-                continue
-            layer = child.layer()
-            if layer and layer.name() == layer_name:
-                return child
-        return None
-
-    def _connect_node(self, node) -> None:
-        if node in self._connected_nodes:
+            if isinstance(child, QgsLayerTreeGroup):
+                groups.setdefault(child.name(), child)
+            elif isinstance(child, QgsLayerTreeLayer):
+                layer = child.layer()
+                if layer:
+                    layers.setdefault(layer.name(), child)
+        return groups, layers
+
+    def _connect_node(self, node, file_name: str, layer_name: str | None) -> None:
+        if node in self._node_targets:
+            self._node_targets[node] = (file_name, layer_name)
             return
         try:
             node.visibilityChanged.connect(self._on_qgis_visibility_changed)
-            self._connected_nodes.append(node)
+            self._node_targets[node] = (file_name, layer_name)
         except Exception as e:
             self._logger.warning(f"Cannot connect node visibility signal: {e}")
 
+    def _disconnect_node(self, node) -> None:
+        if self._node_targets.pop(node, None) is None:
+            return
+        try:
+            node.visibilityChanged.disconnect(self._on_qgis_visibility_changed)
+        except Exception:
+            pass
+
     def _disconnect_all_nodes(self) -> None:
-        for node in self._connected_nodes:
-            try:
-                node.visibilityChanged.disconnect(self._on_qgis_visibility_changed)
-            except Exception:
-                pass
-        self._connected_nodes = []
+        for node in list(self._node_targets):
+            self._disconnect_node(node)
 
     def _make_file_name_candidates(self, file_name: str) -> list[str]:
         stem = os.path.splitext(file_name)[0]
@@ -120,45 +127,47 @@ class QGISLayerSyncManager(QObject):
                 unique.append(candidate)
         return unique
 
-    def _find_file_group(self, file_name: str):
+    def _find_file_group(self, file_name: str, root_groups: dict[str, Any]):
         for candidate in self._make_file_name_candidates(file_name):
-            group = self._find_group_by_name(candidate)
+            group = root_groups.get(candidate)
             if group is not None:
                 return group
         return None
 
-    def _find_layer_node(self, file_group: QgsLayerTreeGroup, layer_name: str):
-        layer_group = self._find_child_group_by_name(file_group, layer_name)
-        if layer_group is not None:
-            return layer_group
-        return self._find_child_layer_by_name(file_group, layer_name)
+    def _resolve_document(self, doc: DXFDocumentDTO, root_groups: dict[str, Any]) -> None:
+        """Находит группу файла и узлы слоев документа и подключается к ним."""
+        file_group = self._find_file_group(doc.filename, root_groups)
+        if file_group is None:
+            return
 
-    def _rebuild_mapping(self) -> None:
-        self._disconnect_all_nodes()
-        self.sync_mapping = {}
+        child_groups, child_layers = self._index_children(file_group)
+        layers: dict[str, Any] = {}
+        layer_ids: dict[str, Any] = {}
 
-        for doc in self._active_doc_service.get_all():
-            file_group = self._find_file_group(doc.filename)
-            if file_group is None:
+        for layer in doc.layers:
+            layer_node = child_groups.get(layer.name)
+            if layer_node is None:
+                layer_node = child_layers.get(layer.name)
+            if layer_node is None:
                 continue
-
-            layers: dict[str, Any] = {}
-            layer_ids: dict[str, Any] = {}
-
-            for layer in doc.layers:
-                layer_node = self._find_layer_node(file_group, layer.name)
-                if layer_node is None:
-                    continue
-                layers[layer.name] = layer_node
-                layer_ids[layer.name] = layer.id
-                self._connect_node(layer_node)
-
-            self._connect_node(file_group)
-            self.sync_mapping[doc.filename] = {
-                "file_group": file_group,
-                "layers": layers,
-                "layer_ids": layer_ids,
-            }
+            layers[layer.name] = layer_node
+            layer_ids[layer.name] = layer.id
+            self._connect_node(layer_node, doc.filename, layer.name)
+
+        self._connect_node(file_group, doc.filename, None)
+        self.sync_mapping[doc.filename] = {
+            "file_group": file_group,
+            "layers": layers,
+            "layer_ids": layer_ids,
+        }
+
+    def _forget_document(self, file_name: str) -> None:
+        mapping = self.sync_mapping.pop(file_name, None)
+        if not mapping:
+            return
+        for node in [mapping.get("file_group"), *mapping.get("layers", {}).values()]:
+            if node is not None and self._node_targets.get(node, (None,))[0] == file_name:
+                self._disconnect_node(node)
 
     def _set_node_checked(self, node, checked: bool) -> None:
         if bool(node.itemVisibilityChecked()) == bool(checked):
@@ -172,10 +181,10 @@ class QGISLayerSyncManager(QObject):
         any_checked = any(bool(node.itemVisibilityChecked()) for node in layer_nodes.values())
         self._set_node_checked(file_group, any_checked)
 
-    def _apply_model_state_to_qgis(self) -> None:
+    def _apply_model_state_to_qgis(self, documents: list[DXFDocumentDTO]) -> None:
         self._sync_guard = True
         try:
-            for doc in self._active_doc_service.get_all():
+            for doc in documents:
                 mapping = self.sync_mapping.get(doc.filename)
                 if not mapping:
                     continue
@@ -193,53 +202,94 @@ class QGISLayerSyncManager(QObject):
         finally:
             self._sync_guard = False
 
-    def _on_documents_changed(self, _payload) -> None:
-        self.sync_now()
-
-    def _find_doc_layer_id(self, file_name: str, layer_name: str):
+    def _apply_layer_changes(self, file_name: str, object_ids: set[UUID]) -> None:
+        """Переносит в QGIS выбор только тех слоев, чьи id есть среди изменившихся."""
         mapping = self.sync_mapping.get(file_name)
         if not mapping:
-            return None
-        layer_ids = mapping.get("layer_ids", {})
-        return layer_ids.get(layer_name)
+            return
+
+        layer_nodes = mapping.get("layers", {})
+        changed_layers = False
+        self._sync_guard = True
+        try:
+            for layer_name, layer_id in mapping.get("layer_ids", {}).items():
+                if layer_id not in object_ids:
+                    continue
+                layer = self._active_doc_service.get_by_id(layer_id)
+                if layer is None:
+                    continue
+                self._set_node_checked(layer_nodes[layer_name], bool(layer.selected))
+                changed_layers = True
+
+            file_group = mapping.get("file_group")
+            if changed_layers and file_group is not None:
+                self._update_file_group_state(file_group, layer_nodes)
+        finally:
+            self._sync_guard = False
+
+    def _on_document_changes(self, change_sets: list[DocumentChangeSetDTO]) -> None:
+        """Копит изменения и откладывает синхронизацию, чтобы пачка событий применилась один раз."""
+        for change_set in change_sets:
+            if change_set.is_structural:
+                self._dirty_filenames.add(change_set.filename)
+            elif change_set.selection_changed_ids:
+                self._changed_ids.setdefault(change_set.filename, set()).update(change_set.selection_changed_ids)
+        self._sync_timer.start()
+
+    def _flush_pending(self) -> None:
+        dirty = self._dirty_filenames
+        changed = self._changed_ids
+        self._dirty_filenames = set()
+        self._changed_ids = {}
+
+        # Файлы без найденной группы ищутся заново: группа могла появиться в QGIS позже
+        dirty.update(file_name for file_name in changed if file_name not in self.sync_mapping)
+
+        if dirty:
+            documents = {doc.filename: doc for doc in self._active_doc_service.get_all()}
+            root_groups, _ = self._index_children(self.layer_tree)
+            resolved = []
+            for file_name in dirty:
+                self._forget_document(file_name)
+                doc = documents.get(file_name)
+                if doc is not None:
+                    self._resolve_document(doc, root_groups)
+                    resolved.append(doc)
+            self._apply_model_state_to_qgis(resolved)
+
+        for file_name, object_ids in changed.items():
+            if file_name not in dirty:
+                self._apply_layer_changes(file_name, object_ids)
 
     def _on_qgis_visibility_changed(self, node) -> None:
         if self._sync_guard:
             return
 
         try:
-            checked = bool(node.itemVisibilityChecked())
+            target = self._node_targets.get(node)
+            if target is None:
+                return
 
-            for file_name, mapping in self.sync_mapping.items():
-                file_group = mapping.get("file_group")
-                layers = mapping.get("layers", {})
-
-                if file_group == node:
-                    entities = {}
-                    for layer_name in layers.keys():
-                        layer_id = self._find_doc_layer_id(file_name, layer_name)
-                        if layer_id is not None:
-                            entities[layer_id] = checked
-
-                    if entities:
-                        result = self._select_entity_use_case.execute(entities)
-                        if result.is_fail:
-                            self._logger.error(f"QGIS->plugin sync failed for file '{file_name}': {result.error}")
-                    return
-
-                for layer_name, layer_node in layers.items():
-                    if layer_node != node:
-                        continue
-
-                    layer_id = self._find_doc_layer_id(file_name, layer_name)
-                    if layer_id is None:
-                        return
+            checked = bool(node.itemVisibilityChecked())
+            file_name, layer_name = target
+            layer_ids = self.sync_mapping.get(file_name, {}).get("layer_ids", {})
 
-                    result = self._select_entity_use_case.execute_single(layer_id, checked)
+            if layer_name is None:
+                entities = {layer_id: checked for layer_id in layer_ids.values()}
+                if entities:
+                    result = self._select_entity_use_case.execute(entities)
                     if result.is_fail:
-                        self._logger.error(
-                            f"QGIS->plugin sync failed for layer '{file_name}/{layer_name}': {result.error}"
-                        )
-                    return
+                        self._logger.error(f"QGIS->plugin sync failed for file '{file_name}': {result.error}")
+                return
+
+            layer_id = layer_ids.get(layer_name)
+            if layer_id is None:
+                return
+
+            result = self._select_entity_use_case.execute_single(layer_id, checked)
+            if result.is_fail:
+                self._logger.error(
+                    f"QGIS->plugin sync failed for layer '{file_name}/{layer_name}': {result.error}"
+                )
         except Exception as e:
             self._logger.error(f"QGIS visibility sync error: {e}")
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 from qgis.PyQt.QtCore import Qt, QTimer
-from qgis.PyQt.QtGui import QPainter
+from qgis.PyQt.QtGui import QPainter, QPixmap
 from qgis.PyQt.QtSvg import QGraphicsSvgItem, QSvgRenderer
 from qgis.PyQt.QtWidgets import (
     QDialog,
+    QGraphicsPixmapItem,
     QGraphicsScene,
     QGraphicsView,
     QHBoxLayout,
@@ -44,7 +45,7 @@ class _ZoomPanGraphicsView(QGraphicsView):
 
 
 class SvgPreviewDialog(QDialog):
-    """Simple SVG preview dialog with zoom controls."""
+    """Simple SVG/PNG preview dialog with zoom controls."""
 
     def __init__(self, svg_path: str, parent=None):
         super().__init__(parent)
@@ -53,9 +54,15 @@ class SvgPreviewDialog(QDialog):
         self._initial_fit_done = False
 
         self._scene = QGraphicsScene(self)
-        self._renderer = QSvgRenderer(svg_path)
-        self._svg_item = QGraphicsSvgItem()
-        self._svg_item.setSharedRenderer(self._renderer)
+        if svg_path.lower().endswith(".png"):
+            # Растровое превью больших чертежей
+            self._renderer = None
+            self._svg_item = QGraphicsPixmapItem(QPixmap(svg_path))
+            self._svg_item.setTransformationMode(Qt.SmoothTransformation)
+        else:
+            self._renderer = QSvgRenderer(svg_path)
+            self._svg_item = QGraphicsSvgItem()
+            self._svg_item.setSharedRenderer(self._renderer)
         self._scene.addItem(self._svg_item)
 
         bounds = self._scene.itemsBoundingRect()
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+from uuid import UUID
+
 from qgis.PyQt.QtWidgets import QTreeWidget, QTreeWidgetItem
-from qgis.PyQt.QtCore import QObject
+from qgis.PyQt.QtCore import Qt, QObject
 
 from ...application.dtos import DXFBaseDTO, DXFDocumentDTO, DXFLayerDTO
 
@@ -16,35 +18,46 @@ class ViewerDxfTreeHandler(QObject):
         self._tree_widget = tree_widget
         self._only_selected = True
 
-        self._item_to_dto: list[tuple[QTreeWidgetItem, DXFBaseDTO]] = []
+        # id объекта хранится в элементе (Qt.UserRole), по id - DTO и элемент
+        self._dto_by_id: dict[UUID, DXFBaseDTO] = {}
+        self._item_by_id: dict[UUID, QTreeWidgetItem] = {}
         self._tree_widget.itemExpanded.connect(self._on_item_expanded)
     
     def _get_dto_for_item(self, item: QTreeWidgetItem) -> DXFBaseDTO | None:
-        """Находит селектор для элемента дерева"""
-        for stored_item, stored_selector in self._item_to_dto:
-            if stored_item is item:  # Сравнение по идентичности объекта
-                return stored_selector
-        return None
+        """Находит DTO для элемента дерева"""
+        return self._dto_by_id.get(item.data(0, Qt.UserRole))
+
+    def get_item_by_id(self, object_id: UUID) -> QTreeWidgetItem | None:
+        """Находит элемент дерева по id объекта"""
+        return self._item_by_id.get(object_id)
+
+    def _create_item(self, dto: DXFBaseDTO, text: str) -> QTreeWidgetItem:
+        item = QTreeWidgetItem([text])
+        item.setData(0, Qt.UserRole, dto.id)
+        self._dto_by_id[dto.id] = dto
+        self._item_by_id[dto.id] = item
+        return item
     
     def rebuild_tree(self, documents: list[DXFDocumentDTO], only_selected = False):
         """Создаёт только верхний уровень (файлы)"""
 
         self._only_selected = only_selected
         self._tree_widget.clear()
-        self._item_to_dto.clear()
+        self._dto_by_id.clear()
+        self._item_by_id.clear()
         
+        doc_items = []
         for doc in documents:
             
             if self._only_selected and not doc.selected:
                 continue
             
-            doc_item = QTreeWidgetItem([doc.filename])
+            doc_item = self._create_item(doc, doc.filename)
             doc_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
-            
-            # Сохраняем связь item -> selector
-            self._item_to_dto.append((doc_item, doc))
-            
-            self._tree_widget.addTopLevelItem(doc_item)
+            doc_items.append(doc_item)
+        
+        # Элементы добавляются одним вызовом, без перерисовки на каждый элемент
+        self._tree_widget.addTopLevelItems(doc_items)
     
     def _on_item_expanded(self, item: QTreeWidgetItem):
         """Заполняет дочерние элементы при раскрытии"""
@@ -58,25 +71,28 @@ class ViewerDxfTreeHandler(QObject):
         if dto is None:
             return
         
+        children = []
         if isinstance(dto, DXFDocumentDTO):
             # Заполняем слои для файла
             for layer in dto.layers:
                 if self._only_selected and not layer.selected:
                     continue
-                layer_item = QTreeWidgetItem([layer.name])
+                layer_item = self._create_item(layer, layer.name)
                 layer_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
-                item.addChild(layer_item)
-                
-                # Сохраняем связь
-                self._item_to_dto.append((layer_item, layer))
+                children.append(layer_item)
         
         elif isinstance(dto, DXFLayerDTO):
             # Заполняем сущности для слоя
             for entity in dto.entities:
                 if self._only_selected and not entity.selected:
                     continue   
-                entity_item = QTreeWidgetItem([entity.name])
-                item.addChild(entity_item)
-                
-                # Сохраняем связь
-                self._item_to_dto.append((entity_item, entity))
\ No newline at end of file
+                children.append(self._create_item(entity, entity.name))
+
+        if not children:
+            return
+
+        self._tree_widget.setUpdatesEnabled(False)
+        try:
+            item.addChildren(children)
+        finally:
+            self._tree_widget.setUpdatesEnabled(True)
\ No newline at end of file
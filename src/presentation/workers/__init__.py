@@ -1,6 +1,8 @@
 
 from .long_task_worker import LongTaskWorker
+from .thumbnail_worker import ThumbnailWorker
 
 __all__ = [
-    'LongTaskWorker'
+    'LongTaskWorker',
+    'ThumbnailWorker',
 ]
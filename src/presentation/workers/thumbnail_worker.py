@@ -0,0 +1,77 @@
+from pathlib import Path
+
+from qgis.PyQt.QtCore import QBuffer, QByteArray, QIODevice, QObject, QRunnable, Qt, pyqtSignal
+from qgis.PyQt.QtGui import QImage, QPainter
+from qgis.PyQt.QtSvg import QSvgRenderer
+
+from ...application.interfaces import IFileCache
+
+
+def thumbnail_key(svg_path: Path, size: int) -> str:
+    """Ключ миниатюры: имя SVG в кэше превью уже адресует содержимое DXF"""
+    return f"{svg_path.name}|{size}"
+
+
+def render_thumbnail(svg_path: Path, size: int, thumb_cache: IFileCache) -> QImage:
+    """
+    Миниатюра превью (SVG или растрового PNG) размером size x size.
+
+    PNG-миниатюра берется из thumb_cache, при промахе превью растеризуется
+    или масштабируется и PNG кладется в кэш. QImage, QPainter и QSvgRenderer можно использовать вне
+    GUI-потока. При ошибке возвращается пустой QImage.
+    """
+    key = thumbnail_key(svg_path, size)
+    cached_path = thumb_cache.get_path(key)
+    if cached_path:
+        image = QImage(cached_path)
+        if not image.isNull():
+            return image
+
+    if svg_path.suffix.lower() == ".png":
+        source = QImage(str(svg_path))
+        if source.isNull():
+            return QImage()
+        image = source.scaled(size, size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    else:
+        renderer = QSvgRenderer(str(svg_path))
+        if not renderer.isValid():
+            return QImage()
+
+        image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        renderer.render(painter)
+        painter.end()
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    buffer.close()
+    thumb_cache.put(key, bytes(data))
+    return image
+
+
+class ThumbnailWorker(QRunnable):
+    """Задача пула потоков: готовит миниатюру одного SVG и отдает QImage сигналом."""
+
+    class Signals(QObject):
+        finished = pyqtSignal(str, QImage)  # key, image (пустой при ошибке)
+        error = pyqtSignal(str, str)  # key, message
+
+    def __init__(self, key: str, svg_path: Path, size: int, thumb_cache: IFileCache):
+        super().__init__()
+        self.key = key
+        self.svg_path = svg_path
+        self.size = size
+        self.thumb_cache = thumb_cache
+        self.signals = ThumbnailWorker.Signals()
+        # Сигналы живут в GUI-потоке; пул не должен удалять задачу до их доставки
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            image = render_thumbnail(self.svg_path, self.size, self.thumb_cache)
+            self.signals.finished.emit(self.key, image)
+        except Exception as e:
+            self.signals.error.emit(self.key, str(e))
@@ -63,8 +63,8 @@ class TestDebugReports(unittest.TestCase):
         logger = _Logger()
         dxf_reader = MagicMock()
         dxf_writer = MagicMock()
-        dxf_reader.save_svg_preview.return_value = AppResult.success("preview.svg")
-        dxf_writer.save_selected_by_handles.return_value = AppResult.success(0)
+        dxf_reader.render_svg_preview.return_value = AppResult.success("<svg/>")
+        dxf_writer.serialize_selected.return_value = AppResult.success(b"0\nEOF\n")
         use_case = ImportUseCase(active_repo, dxf_reader, dxf_writer, logger)
 
         doc = DXFDocument(filename="debug.dxf", filepath="C:/tmp/debug.dxf")
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 """Unit tests for services and use cases in the new implementation."""
 
+import io
 import os
 import sys
 import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 from uuid import uuid4
@@ -12,9 +15,15 @@ plugin_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if plugin_path not in sys.path:
     sys.path.insert(0, plugin_path)
 
+from psycopg2 import sql
+
 from src.application.dtos import (
     AreaSelectionRequestDTO,
     ConnectionConfigDTO,
+    DocumentChangeSetDTO,
+    DXFDocumentDTO,
+    DXFEntityDTO,
+    DXFLayerDTO,
     ExportConfigDTO,
     ExportMode,
     ImportConfigDTO,
@@ -24,8 +33,9 @@ from src.application.dtos import (
     ShapeType,
 )
 from src.application.interfaces import ILogger
+from src.application.mappers import DXFEntityView, DXFMapper
 from src.application.results import AppResult, Unit
-from src.application.services import ConnectionConfigService
+from src.application.services import ConnectionConfigService, PreviewCacheService
 from src.application.use_cases import (
     CloseDocumentUseCase,
     DataViewerUseCase,
@@ -38,10 +48,22 @@ from src.application.use_cases import (
 )
 from src.domain.entities import DXFContent, DXFDocument, DXFEntity, DXFLayer
 from src.domain.value_objects import (
+    AreaSelectionParams,
     DxfEntityType,
+    Result,
+    SelectionMask,
 )
+from src.infrastructure.cache import DiskLRUCache
 from src.infrastructure.database import ActiveDocumentRepository
-from src.infrastructure.ezdxf import DXFReader, DXFWriter
+from src.infrastructure.database.postgis import PostGISEntityRepository, PostGISLayerRepository
+from src.infrastructure.ezdxf import DXFReader, DXFWriter, EzdxfAreaSelector, EzdxfDrawingStore
+from src.infrastructure.ezdxf.raster_preview import RasterPreviewRenderer
+
+try:
+    from qgis.PyQt.QtCore import QCoreApplication
+    from src.infrastructure.qgis import QtEvent, QtEventGroup
+except ImportError:
+    QtEvent = None
 
 EXAMPLES_DIR = os.path.join(plugin_path, "dxf_examples")
 EXAMPLE_1 = os.path.join(EXAMPLES_DIR, "ex1.dxf")
@@ -64,6 +86,7 @@ class _DummyAppEvents:
         self.on_document_saved = _DummyEvent()
         self.on_document_closed = _DummyEvent()
         self.on_document_modified = _DummyEvent()
+        self.on_document_changes = _DummyEvent()
         self.on_language_changed = _DummyEvent()
 
 
@@ -84,6 +107,18 @@ class _DummyLogger(ILogger):
         return None
 
 
+def _write_reconstructed_stub(definitions, batches, stream):
+    for batch in batches:
+        for _ in batch:
+            pass
+    stream.write(b"0\nEOF\n")
+    return AppResult.success("ok")
+
+
+def _entity_batches(*batches):
+    return lambda **kwargs: AppResult.success(iter([list(batch) for batch in batches]))
+
+
 class TestConnectionConfigService(unittest.TestCase):
     def setUp(self):
         self.temp_dir = tempfile.TemporaryDirectory()
@@ -244,6 +279,101 @@ class TestOpenDocumentUseCase(unittest.TestCase):
                 self.assertEqual(result.value.filename, os.path.basename(fixture_path))
 
 
+class TestDXFReaderCompactModel(unittest.TestCase):
+    def test_reader_builds_compact_entities_with_shared_styles(self):
+        """Сущности читаются в компактную модель, одинаковые стили хранятся одним объектом."""
+        if not os.path.exists(EXAMPLE_1):
+            self.skipTest("Fixture ex1.dxf not found")
+
+        result = DXFReader().open(EXAMPLE_1)
+        self.assertTrue(result.is_success)
+        document = result.value
+
+        for layer in document.layers.values():
+            entities = list(layer.entities.values())
+            self.assertFalse(hasattr(layer, "__dict__"))
+            self.assertTrue(all(not hasattr(entity, "__dict__") for entity in entities))
+
+            styles = {id(entity.extra_data.get("layer_dxf_attribs")) for entity in entities}
+            self.assertEqual(len(styles), 1, layer.name)
+
+        polylines = [
+            entity
+            for layer in document.layers.values()
+            for entity in layer.entities.values()
+            if entity.entity_type == DxfEntityType.LWPOLYLINE
+        ]
+        self.assertTrue(polylines)
+        points = polylines[0].geometries["points"]
+        self.assertEqual(points.dtype.kind, "f")
+        self.assertEqual(points.shape[1], 5)
+
+
+class TestDXFMapperViews(unittest.TestCase):
+    def test_to_dto_returns_lazy_read_only_views(self):
+        """to_dto возвращает ленивые представления только для чтения, а не копии документа."""
+        document = DXFDocument(filename="view.dxf", filepath="/tmp/view.dxf")
+        layer = DXFLayer(document_id=document.id, name="L1", schema_name="s", table_name="l1")
+        entities = [DXFEntity(entity_type=DxfEntityType.LINE, attributes={"handle": str(i)}) for i in range(1000)]
+        layer.add_entities(entities)
+        document.add_layers([layer])
+
+        with patch("src.application.mappers.dxf_views.DXFEntityView", wraps=DXFEntityView) as entity_view:
+            dto = DXFMapper.to_dto(document)
+            layer_dto = dto.layers[0]
+            self.assertEqual(len(layer_dto.entities), 1000)
+            self.assertEqual(entity_view.call_count, 0)
+
+            first = layer_dto.entities[0]
+            self.assertEqual(entity_view.call_count, 1)
+
+        self.assertIs(layer_dto.entities, layer_dto.entities)
+        extra = DXFEntity(entity_type=DxfEntityType.POINT)
+        layer.add_entities([extra])
+        self.assertEqual(len(layer_dto.entities), 1001)
+        self.assertEqual(layer_dto.entities[-1].id, extra.id)
+
+        self.assertIsInstance(dto, DXFDocumentDTO)
+        self.assertIsInstance(layer_dto, DXFLayerDTO)
+        self.assertIsInstance(first, DXFEntityDTO)
+        self.assertEqual(first.id, entities[0].id)
+        self.assertEqual(first.typename, "LINE")
+
+        entities[0].set_selected(False)
+        self.assertFalse(first.selected)
+
+        with self.assertRaises(TypeError):
+            first.attributes["handle"] = "X"
+        with self.assertRaises(AttributeError):
+            first.selected = True
+
+
+class TestActiveDocumentRepository(unittest.TestCase):
+    def test_indexes_objects_by_id_and_documents_by_filename(self):
+        """Объекты находятся по id, документы — по имени файла, без обхода всех документов."""
+        repo = ActiveDocumentRepository()
+        document = DXFDocument(filename="indexed.dxf")
+        layer = DXFLayer(document_id=document.id, name="L1", schema_name="s", table_name="l1")
+        entity = DXFEntity(entity_type=DxfEntityType.LINE)
+        layer.add_entities([entity])
+        document.add_layers([layer])
+        repo.create(document)
+
+        self.assertEqual(repo.find_object(document.id).value, (document, None, document))
+        self.assertEqual(repo.find_object(layer.id).value, (document, layer, layer))
+        self.assertEqual(repo.find_object(entity.id).value, (document, layer, entity))
+        self.assertIs(repo.get_by_filename("indexed.dxf").value, document)
+
+        late_entity = DXFEntity(entity_type=DxfEntityType.CIRCLE)
+        layer.add_entities([late_entity])
+        repo.update(document)
+        self.assertEqual(repo.find_object(late_entity.id).value, (document, layer, late_entity))
+
+        repo.remove(document.id)
+        self.assertTrue(repo.find_object(entity.id).is_fail)
+        self.assertTrue(repo.get_by_filename("indexed.dxf").is_fail)
+
+
 class TestSelectEntityUseCase(unittest.TestCase):
     def setUp(self):
         self.active_repo = MagicMock()
@@ -262,6 +392,10 @@ class TestSelectEntityUseCase(unittest.TestCase):
         layer.add_entities([self.entity])
         self.document.add_layers([layer])
 
+        index = ActiveDocumentRepository()
+        index.create(self.document)
+        self.active_repo.find_object.side_effect = index.find_object
+
     def test_execute_updates_entity_selection_and_emits(self):
         """
         Проверяет базовый сценарий выбора одной сущности.
@@ -383,6 +517,20 @@ class TestCloseDocumentUseCase(unittest.TestCase):
         self.active_repo.remove.assert_called_once_with(doc_id)
         self.assertEqual(self.events.on_document_closed.emitted, [doc_id])
 
+    def test_execute_invalidates_area_selection_index(self):
+        """Закрытие документа сбрасывает его индекс выбора по области."""
+        area_selector = MagicMock()
+        use_case = CloseDocumentUseCase(self.active_repo, self.writer, self.events, area_selector)
+        document = DXFDocument(filename="closing.dxf", filepath="C:/tmp/closing.dxf")
+        self.active_repo.get_by_id.return_value = AppResult.success(document)
+        self.active_repo.remove.return_value = AppResult.success(Unit())
+
+        result = use_case.execute(document.id)
+
+        self.assertTrue(result.is_success)
+        area_selector.invalidate.assert_called_once_with("C:/tmp/closing.dxf")
+        self.writer.release.assert_called_once_with("C:/tmp/closing.dxf")
+
     def test_execute_failure_returns_error_and_no_event(self):
         """
         Проверяет обработку ошибки при закрытии документа.
@@ -495,6 +643,250 @@ class TestDataViewerUseCase(unittest.TestCase):
         fake_session._get_document_repository.assert_not_called()
         fake_session.close.assert_called_once()
 
+    def test_get_documents_loads_metadata_page_with_single_query(self):
+        """Страница метаданных (размер, число слоев) читается одним запросом с keyset-пагинацией."""
+        fake_session = MagicMock()
+        fake_session.connect.return_value = AppResult.success(Unit())
+        fake_session.schema_exists.return_value = AppResult.success(True)
+
+        docs_repo = MagicMock(table_name="files")
+        content_repo = MagicMock(table_name="content")
+        layer_repo = MagicMock(table_name="layers")
+        fake_session._get_document_repository.return_value = AppResult.success(docs_repo)
+        fake_session._get_content_repository.return_value = AppResult.success(content_repo)
+        fake_session._get_layer_repository.return_value = AppResult.success(layer_repo)
+        fake_session.get_table_columns.return_value = AppResult.success(["id", "document_id", "content"])
+        fake_session.execute_read_query.return_value = AppResult.success([
+            {"id": "1", "filename": "b.dxf", "upload_date": None, "update_date": None,
+             "file_size": 2048, "layer_count": 3},
+        ])
+
+        with patch("src.application.use_cases.data_viewer_use_case.inject.instance", return_value=fake_session):
+            result = self.use_case.get_documents(self.connection, "file_schema", after_filename="a.dxf", limit=50)
+
+        self.assertTrue(result.is_success)
+        self.assertEqual(result.value[0]["file_size"], 2048)
+        self.assertEqual(result.value[0]["layer_count"], 3)
+
+        fake_session.execute_read_query.assert_called_once()
+        query, params = fake_session.execute_read_query.call_args[0]
+        self.assertIn("OCTET_LENGTH", query)
+        self.assertIn("COUNT(*)", query)
+        self.assertIn("d.filename > %s", query)
+        self.assertEqual(params, ("a.dxf", 50))
+        docs_repo.get_all.assert_not_called()
+        fake_session.close.assert_called_once()
+
+    def test_document_info_is_one_metadata_query(self):
+        """Карточка документа читает размер и число слоев тем же запросом, что и список."""
+        fake_session = MagicMock()
+        fake_session.connect.return_value = AppResult.success(Unit())
+        fake_session._get_document_repository.return_value = AppResult.success(MagicMock(table_name="files"))
+        fake_session._get_content_repository.return_value = AppResult.success(MagicMock(table_name="content"))
+        fake_session._get_layer_repository.return_value = AppResult.success(MagicMock(table_name="layers"))
+        fake_session.get_table_columns.return_value = AppResult.success(["id", "document_id", "content"])
+        fake_session.execute_read_query.return_value = AppResult.success([
+            {"id": "1", "filename": "a.dxf", "upload_date": None, "update_date": None,
+             "file_size": 512, "layer_count": 2},
+        ])
+
+        with patch("src.application.use_cases.data_viewer_use_case.inject.instance", return_value=fake_session):
+            result = self.use_case.get_document_info(self.connection, "file_schema", "a.dxf")
+
+        self.assertTrue(result.is_success)
+        self.assertEqual((result.value["file_size"], result.value["layer_count"]), (512, 2))
+        fake_session.execute_read_query.assert_called_once()
+        query, params = fake_session.execute_read_query.call_args[0]
+        self.assertIn("d.filename = %s", query)
+        self.assertEqual(params, ("a.dxf",))
+
+    def test_delete_document_cascades_and_drops_layer_tables(self):
+        """Удаление — один DELETE ... RETURNING документа и один DROP его таблиц слоев без DDL ключей."""
+        doc_repo = MagicMock(table_name="files")
+        doc_repo.remove_by_filename.return_value = AppResult.success([
+            ("layer_schema", "labc123_roads"),
+            ("layer_schema", "labc123_text"),
+        ])
+        content_repo = MagicMock()
+        layer_repo = MagicMock(table_name="layers")
+
+        fake_session = MagicMock()
+        fake_session.connect.return_value = AppResult.success(Unit())
+        fake_session._get_document_repository.return_value = AppResult.success(doc_repo)
+        fake_session._get_content_repository.return_value = AppResult.success(content_repo)
+        fake_session._get_layer_repository.return_value = AppResult.success(layer_repo)
+        fake_session.drop_tables.return_value = AppResult.success(Unit())
+        fake_session.commit.return_value = AppResult.success(Unit())
+
+        with patch("src.application.use_cases.data_viewer_use_case.inject.instance", return_value=fake_session):
+            result = self.use_case.delete_document_by_filename(self.connection, "file_schema", "gone.dxf")
+
+        self.assertTrue(result.is_success)
+        self.assertTrue(result.value)
+        doc_repo.remove_by_filename.assert_called_once_with("gone.dxf", "layers")
+        fake_session.drop_tables.assert_called_once_with([
+            ("layer_schema", "labc123_roads"),
+            ("layer_schema", "labc123_text"),
+        ])
+        content_repo.link_to_document_table.assert_not_called()
+        layer_repo.link_to_document_table.assert_not_called()
+        doc_repo.remove.assert_not_called()
+        fake_session.commit.assert_called_once()
+
+    def test_delete_missing_document_drops_nothing(self):
+        """Если DELETE ... RETURNING ничего не удалил, таблицы не трогаются."""
+        doc_repo = MagicMock(table_name="files")
+        doc_repo.remove_by_filename.return_value = Result.success(None)
+        fake_session = MagicMock()
+        fake_session.connect.return_value = AppResult.success(Unit())
+        fake_session._get_document_repository.return_value = AppResult.success(doc_repo)
+        fake_session._get_layer_repository.return_value = AppResult.success(MagicMock(table_name="layers"))
+
+        with patch("src.application.use_cases.data_viewer_use_case.inject.instance", return_value=fake_session):
+            result = self.use_case.delete_document_by_filename(self.connection, "file_schema", "none.dxf")
+
+        self.assertTrue(result.is_success)
+        self.assertFalse(result.value)
+        fake_session.drop_tables.assert_not_called()
+
+
+class TestDXFDocumentHandleIndex(unittest.TestCase):
+    def test_handle_index_and_selected_handles_follow_entity_changes(self):
+        """Индекс handle и набор выбранных handle обновляются вместе с сущностями."""
+        document = DXFDocument(filename="indexed.dxf")
+        layer = DXFLayer(document_id=document.id, name="L1", schema_name="s", table_name="l1")
+        document.add_layers([layer])
+
+        entity_a = DXFEntity(entity_type=DxfEntityType.LINE, attributes={"handle": " a1 "})
+        entity_b = DXFEntity(entity_type=DxfEntityType.LINE, selected=False, attributes={"handle": "B2"})
+        layer.add_entities([entity_a, entity_b])
+
+        self.assertIs(document.find_entity_by_handle("A1"), entity_a)
+        self.assertIs(document.find_entity_by_handle("b2"), entity_b)
+        self.assertEqual(document.get_selected_handles(), {"A1"})
+
+        entity_a.set_selected(False)
+        entity_b.set_selected(True)
+        self.assertEqual(document.get_selected_handles(), {"B2"})
+
+        entity_b.add_attributes({"handle": "C3"})
+        self.assertIsNone(document.find_entity_by_handle("B2"))
+        self.assertEqual(document.get_selected_handles(), {"C3"})
+
+    def test_selection_counters_follow_selection_and_structure(self):
+        """Счетчики выбора слоя и документа следуют за выбором и составом сущностей."""
+        document = DXFDocument(filename="counters.dxf")
+        layer_a = DXFLayer(
+            document_id=document.id, name="A", schema_name="s", table_name="a",
+            entities=[DXFEntity(), DXFEntity(selected=False)],
+        )
+        layer_b = DXFLayer(document_id=document.id, name="B", schema_name="s", table_name="b", selected=False)
+        document.add_layers([layer_a, layer_b])
+        entity_c = DXFEntity(selected=False)
+        layer_b.add_entities([entity_c])
+
+        self.assertEqual(layer_a.selected_count, 1)
+        self.assertEqual(layer_b.selected_count, 0)
+        self.assertEqual(
+            (document.selected_layers_count, document.selected_entities_count, document.entities_count),
+            (1, 1, 3),
+        )
+
+        entity_c.set_selected(True)
+        entity_c.set_selected(True)
+        layer_b.set_selected(True)
+        self.assertEqual(layer_b.selected_count, 1)
+        self.assertEqual((document.selected_layers_count, document.selected_entities_count), (2, 2))
+
+        document.remove_layer(layer_a, recursive=True)
+        self.assertEqual(
+            (document.selected_layers_count, document.selected_entities_count, document.entities_count),
+            (1, 1, 1),
+        )
+
+
+class TestDocumentChangeSetDTO(unittest.TestCase):
+    def test_merge_all_combines_change_sets_per_document(self):
+        """Наборы одного документа сливаются: id без повторов, версия — наибольшая."""
+        doc_id, other_id = uuid4(), uuid4()
+        entity_a, entity_b = uuid4(), uuid4()
+        merged = DocumentChangeSetDTO.merge_all([
+            DocumentChangeSetDTO(doc_id, "a.dxf", 1, selection_changed_ids=(entity_a,)),
+            DocumentChangeSetDTO(other_id, "b.dxf", 1, added_ids=(other_id,)),
+            DocumentChangeSetDTO(doc_id, "a.dxf", 2, selection_changed_ids=(entity_b, entity_a)),
+        ])
+
+        self.assertEqual([change_set.document_id for change_set in merged], [doc_id, other_id])
+        self.assertEqual(merged[0].selection_changed_ids, (entity_a, entity_b))
+        self.assertEqual(merged[0].version, 2)
+        self.assertFalse(merged[0].is_structural)
+        self.assertTrue(merged[1].is_structural)
+
+    def test_merge_all_keeps_each_id_in_its_last_structural_change(self):
+        """Открытие и закрытие в одном кадре не дают один id и в added_ids, и в removed_ids."""
+        doc_id = uuid4()
+        opened = DocumentChangeSetDTO(doc_id, "a.dxf", 1, added_ids=(doc_id,))
+        closed = DocumentChangeSetDTO(doc_id, "a.dxf", 2, removed_ids=(doc_id,))
+
+        [closed_last] = DocumentChangeSetDTO.merge_all([opened, closed])
+        [reopened] = DocumentChangeSetDTO.merge_all([closed, opened])
+
+        self.assertEqual((closed_last.added_ids, closed_last.removed_ids), ((), (doc_id,)))
+        self.assertEqual((reopened.added_ids, reopened.removed_ids), ((doc_id,), ()))
+
+
+@unittest.skipIf(QtEvent is None, "qgis is not installed")
+class TestQtEvent(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def _process_events(self, until, timeout_s: float = 1.0):
+        deadline = time.monotonic() + timeout_s
+        while not until() and time.monotonic() < deadline:
+            QCoreApplication.processEvents()
+
+    def test_emits_within_one_iteration_are_coalesced(self):
+        """Повторные emit до итерации цикла событий приходят одной объединенной отправкой."""
+        event = QtEvent(merge=lambda first, second: first + second)
+        received = []
+        event.connect(received.append)
+
+        for index in range(3):
+            event.emit([index])
+        self.assertEqual(received, [])
+        self._process_events(lambda: received)
+
+        self.assertEqual(received, [[0, 1, 2]])
+        self.assertEqual((event.metrics.emits, event.metrics.dispatches, event.metrics.coalesced), (3, 1, 2))
+
+    def test_immediate_event_is_dispatched_after_pending_group_events(self):
+        """Немедленное "закрыт" не обгоняет отложенное "открыт" той же группы."""
+        group = QtEventGroup()
+        opened = QtEvent(merge=lambda first, second: first + second, group=group)
+        closed = QtEvent(group=group)
+        received = []
+        opened.connect(lambda data: received.append(("opened", data)))
+        closed.connect(lambda data: received.append(("closed", data)))
+
+        opened.emit(["a.dxf"])
+        closed.emit("a.dxf")
+
+        self.assertEqual(received, [("opened", ["a.dxf"]), ("closed", "a.dxf")])
+
+    def test_emit_from_worker_thread_is_dispatched_in_event_thread(self):
+        """emit из рабочего потока доставляется подписчикам в потоке события."""
+        event = QtEvent(merge=lambda first, second: first + second)
+        received = []
+        event.connect(lambda data: received.append((data, threading.get_ident())))
+
+        worker = threading.Thread(target=lambda: [event.emit([index]) for index in range(2)])
+        worker.start()
+        worker.join()
+        self._process_events(lambda: received)
+
+        self.assertEqual(received, [([0, 1], threading.get_ident())])
+
 
 class TestSelectAreaUseCase(unittest.TestCase):
     def setUp(self):
@@ -582,14 +974,265 @@ class TestSelectAreaUseCase(unittest.TestCase):
         self.assertFalse(self.document.is_selected)
 
 
+    def _request(self, mode: SelectionMode) -> AreaSelectionRequestDTO:
+        return AreaSelectionRequestDTO(
+            shape=ShapeType.RECTANGLE,
+            selection_rule=SelectionRule.INTERSECT,
+            selection_mode=mode,
+            shape_args=(0, 0, 10, 10),
+        )
+
+    def test_execute_applies_join_and_subtract_modes(self):
+        """JOIN добавляет сущности области к выбору, SUBTRACT снимает с них выбор."""
+        self.entity_a.set_selected(False)
+        self.entity_b.set_selected(True)
+        self.active_repo.get_by_filename.return_value = AppResult.success(self.document)
+        self.active_repo.update.return_value = AppResult.success(self.document)
+
+        self.area_selector.select_handles.return_value = AppResult.success(["aa11"])
+        result = self.use_case.execute("doc_area.dxf", self._request(SelectionMode.JOIN))
+
+        self.assertTrue(result.is_success)
+        self.assertTrue(self.entity_a.is_selected)
+        self.assertTrue(self.entity_b.is_selected)
+
+        self.area_selector.select_handles.return_value = AppResult.success(["bb22"])
+        result = self.use_case.execute("doc_area.dxf", self._request(SelectionMode.SUBTRACT))
+
+        self.assertTrue(result.is_success)
+        self.assertTrue(self.entity_a.is_selected)
+        self.assertFalse(self.entity_b.is_selected)
+        self.assertTrue(self.layer.is_selected)
+        self.assertEqual(len(self.events.on_document_modified.emitted), 2)
+
+    def test_execute_touches_only_flipped_entities(self):
+        """set_selected вызывается только для сущностей, чей выбор изменился."""
+        self.entity_a.set_selected(False)
+        self.entity_b.set_selected(True)
+        self.active_repo.get_by_filename.return_value = AppResult.success(self.document)
+        self.active_repo.update.return_value = AppResult.success(self.document)
+        self.area_selector.select_handles.return_value = AppResult.success(["aa11"])
+
+        with patch.object(DXFEntity, "set_selected", autospec=True, side_effect=DXFEntity.set_selected) as set_selected:
+            result = self.use_case.execute("doc_area.dxf", self._request(SelectionMode.JOIN))
+            touched = [call.args[0] for call in set_selected.call_args_list]
+
+        self.assertEqual(touched, [self.entity_a])
+
+        self.assertTrue(result.is_success)
+        self.assertTrue(self.entity_a.is_selected)
+
+        result = self.use_case.execute("doc_area.dxf", self._request(SelectionMode.JOIN))
+
+        self.assertTrue(result.is_success)
+        self.assertEqual(self.active_repo.update.call_count, 1)
+        self.assertEqual(len(self.events.on_document_modified.emitted), 1)
+
+    def test_execute_emits_change_set_with_changed_ids_only(self):
+        """Набор изменений содержит только изменившиеся id, повтор без изменений не публикуется."""
+        self.active_repo.get_by_filename.return_value = AppResult.success(self.document)
+        self.active_repo.update.return_value = AppResult.success(self.document)
+        self.area_selector.select_handles.return_value = AppResult.success(["bb22"])
+        self.use_case.execute("doc_area.dxf", self._request(SelectionMode.REPLACE))
+        self.events.on_document_changes.emitted.clear()
+
+        self.area_selector.select_handles.return_value = AppResult.success(["aa11"])
+        self.use_case.execute("doc_area.dxf", self._request(SelectionMode.JOIN))
+        self.use_case.execute("doc_area.dxf", self._request(SelectionMode.JOIN))
+        self.area_selector.select_handles.return_value = AppResult.success([])
+        self.use_case.execute("doc_area.dxf", self._request(SelectionMode.REPLACE))
+
+        emitted = self.events.on_document_changes.emitted
+        self.assertEqual(len(emitted), 2)
+
+        first, second = emitted[0][0], emitted[1][0]
+        self.assertEqual(first.document_id, self.document.id)
+        self.assertEqual(first.selection_changed_ids, (self.entity_a.id,))
+        self.assertFalse(first.is_structural)
+        self.assertEqual(
+            set(second.selection_changed_ids),
+            {self.entity_a.id, self.entity_b.id, self.layer.id, self.document.id},
+        )
+        self.assertEqual((first.version, second.version), (2, 3))
+        self.assertEqual(self.document.version, 3)
+
+    def test_layer_selection_mask_follows_set_selected(self):
+        """Маска выбора слоя меняется вместе с set_selected и при замене сущности."""
+        self.entity_a.set_selected(False)
+        self.entity_b.set_selected(True)
+        self.assertEqual(list(self.layer.selection_mask().ordinals()), [1])
+
+        self.entity_a.set_selected(True)
+        self.assertEqual(self.layer.selection_mask().bits, 0b11)
+
+        replacement = DXFEntity(id=self.entity_a.id, selected=False, entity_type=DxfEntityType.LINE)
+        self.layer.add_entities([replacement])
+        self.assertEqual(self.layer.selection_mask(), SelectionMask(2, 0b10))
+
+        mask = SelectionMask.from_ordinals(20, [0, 9, 19])
+        self.assertEqual(list(mask.ordinals()), [0, 9, 19])
+        self.assertEqual(mask.count(), 3)
+
+
+class TestEzdxfAreaSelector(unittest.TestCase):
+    def setUp(self):
+        if not os.path.exists(EXAMPLE_1):
+            self.skipTest("Fixture ex1.dxf not found")
+        self.selector = EzdxfAreaSelector()
+
+    def _params(self, rule: SelectionRule, shape_args: tuple) -> AreaSelectionParams:
+        return AreaSelectionParams(
+            shape_type=ShapeType.RECTANGLE,
+            selection_rule=rule,
+            selection_mode=SelectionMode.REPLACE,
+            shape_args=shape_args,
+        )
+
+    def test_index_matches_ezdxf_bbox_selection(self):
+        """Правила по габаритам дают тот же набор, что и ezdxf.select."""
+        import ezdxf
+        from ezdxf import bbox, select
+
+        model_space = ezdxf.readfile(EXAMPLE_1).modelspace()
+        extents = bbox.extents(model_space, fast=True)
+        x_min, y_min = extents.extmin.x - 1, extents.extmin.y - 1
+        x_mid, y_mid = (extents.extmin.x + extents.extmax.x) / 2, (extents.extmin.y + extents.extmax.y) / 2
+        window = select.Window((x_min, y_min), (x_mid, y_mid))
+
+        reference = {
+            SelectionRule.INSIDE: select.bbox_inside,
+            SelectionRule.OUTSIDE: select.bbox_outside,
+            SelectionRule.INTERSECT: select.bbox_overlap,
+        }
+        for rule, selector in reference.items():
+            expected = sorted(entity.dxf.handle.lower() for entity in selector(window, model_space))
+            result = self.selector.select_handles(EXAMPLE_1, self._params(rule, (x_min, x_mid, y_min, y_mid)))
+
+            self.assertTrue(result.is_success)
+            self.assertEqual(sorted(result.value), expected, rule.value)
+
+    def test_exact_rules_check_real_geometry_of_candidates(self):
+        """Точные правила проверяют реальную геометрию, а не габариты."""
+        import ezdxf
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "diagonal.dxf")
+            drawing = ezdxf.new()
+            model_space = drawing.modelspace()
+            diagonal = model_space.add_line((0, 0), (10, 10)).dxf.handle.lower()
+            corner = model_space.add_lwpolyline([(2, 0), (10, 0), (10, 8)]).dxf.handle.lower()
+            drawing.saveas(path)
+
+            band = [(-1, 0), (0, -1), (11, 10), (10, 11)]
+
+            def select(rule: SelectionRule) -> set[str]:
+                result = self.selector.select_handles(
+                    path,
+                    AreaSelectionParams(
+                        shape_type=ShapeType.POLYGON,
+                        selection_rule=rule,
+                        selection_mode=SelectionMode.REPLACE,
+                        shape_args=(band,),
+                    ),
+                )
+                self.assertTrue(result.is_success)
+                return set(result.value)
+
+            self.assertEqual(select(SelectionRule.INSIDE), set())
+            self.assertEqual(select(SelectionRule.INSIDE_EXACT), {diagonal})
+            self.assertEqual(select(SelectionRule.INTERSECT), {diagonal, corner})
+            self.assertEqual(select(SelectionRule.INTERSECT_EXACT), {diagonal})
+
+    def test_exact_rules_accept_self_intersecting_region(self):
+        """Самопересекающиеся контур области и заливка исправляются make_valid перед точной проверкой."""
+        import ezdxf
+        import shapely
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "bowtie.dxf")
+            drawing = ezdxf.new()
+            model_space = drawing.modelspace()
+            inner = model_space.add_line((1, 4), (1, 6)).dxf.handle.lower()
+            crossing = model_space.add_line((1, 8), (9, 8)).dxf.handle.lower()
+            hatch = model_space.add_hatch()
+            hatch.paths.add_polyline_path([(12, 0), (20, 8), (20, 0), (12, 8)])
+            drawing.saveas(path)
+
+            bowtie = [(0, 0), (10, 10), (10, 0), (0, 10)]
+
+            def select(rule: SelectionRule, region=bowtie) -> set[str]:
+                result = self.selector.select_handles(
+                    path,
+                    AreaSelectionParams(
+                        shape_type=ShapeType.POLYGON,
+                        selection_rule=rule,
+                        selection_mode=SelectionMode.REPLACE,
+                        shape_args=(region,),
+                    ),
+                )
+                self.assertTrue(result.is_success)
+                return set(result.value)
+
+            self.assertEqual(select(SelectionRule.INSIDE_EXACT), {inner})
+            self.assertEqual(select(SelectionRule.INTERSECT_EXACT), {inner, crossing})
+
+            below_hatch_center = [(11, -1), (21, -1), (21, 3.5), (11, 3.5)]
+            self.assertEqual(len(select(SelectionRule.INTERSECT_EXACT, below_hatch_center)), 1)
+            index = next(iter(self.selector._indexes.values()))[1]
+            parts = [part for part in index._geometry_parts if part is not None]
+            self.assertTrue(all(shapely.is_valid(part).all() for part in parts))
+
+    def test_index_is_built_once_and_dropped_on_invalidate(self):
+        """Индекс строится при первом выборе и сбрасывается invalidate."""
+        from src.infrastructure.ezdxf import area_selector as area_selector_module
+
+        params = self._params(SelectionRule.INTERSECT, (-1e12, 1e12, -1e12, 1e12))
+        with patch.object(area_selector_module, "load_drawing", wraps=area_selector_module.load_drawing) as load:
+            first = self.selector.select_handles(EXAMPLE_1, params)
+            second = self.selector.select_handles(EXAMPLE_1, params)
+            self.assertEqual(load.call_count, 1)
+
+            self.selector.invalidate(EXAMPLE_1)
+            self.selector.select_handles(EXAMPLE_1, params)
+            self.assertEqual(load.call_count, 2)
+
+        self.assertTrue(first.is_success)
+        self.assertEqual(first.value, second.value)
+        self.assertGreater(len(first.value), 0)
+        index = next(iter(self.selector._indexes.values()))[1]
+        self.assertFalse(hasattr(index, "_entities"))
+
+    def test_open_document_from_store_is_reused(self):
+        """Выбор по открытому документу не читает файл повторно."""
+        import ezdxf
+        from src.infrastructure.ezdxf import EzdxfDrawingStore
+        from src.infrastructure.ezdxf import area_selector as area_selector_module
+
+        store = EzdxfDrawingStore()
+        store.put(EXAMPLE_1, ezdxf.readfile(EXAMPLE_1))
+        selector = EzdxfAreaSelector(store)
+
+        with patch.object(area_selector_module, "load_drawing") as load:
+            bbox_result = selector.select_handles(
+                EXAMPLE_1, self._params(SelectionRule.INTERSECT, (-1e12, 1e12, -1e12, 1e12))
+            )
+            exact_result = selector.select_handles(
+                EXAMPLE_1, self._params(SelectionRule.INTERSECT_EXACT, (-1e12, 1e12, -1e12, 1e12))
+            )
+            load.assert_not_called()
+
+        self.assertTrue(exact_result.is_success)
+        self.assertEqual(sorted(exact_result.value), sorted(bbox_result.value))
+
+
 class TestImportUseCase(unittest.TestCase):
     def setUp(self):
         self.active_repo = MagicMock()
         self.logger = _DummyLogger()
         self.dxf_reader = MagicMock()
         self.dxf_writer = MagicMock()
-        self.dxf_reader.save_svg_preview.return_value = AppResult.success("preview.svg")
-        self.dxf_writer.save_selected_by_handles.return_value = AppResult.success(0)
+        self.dxf_reader.render_svg_preview.return_value = AppResult.success("<svg/>")
+        self.dxf_writer.serialize_selected.return_value = AppResult.success(b"0\nEOF\n")
         self.use_case = ImportUseCase(self.active_repo, self.dxf_reader, self.dxf_writer, self.logger)
 
         self.connection = ConnectionConfigDTO(
@@ -691,6 +1334,7 @@ class TestImportUseCase(unittest.TestCase):
         1. В документе есть выбранная и невыбранная сущности.
         2. ImportUseCase вызывает writer для подготовки временного DXF.
         3. В writer передается только handle выбранной сущности.
+        4. Записанная таблица слоя получает индекс и новую ревизию для кэша экспорта.
 
         Почему это важно:
         Это регрессионная проверка на баг, когда в импорт попадал весь файл вместо выбора.
@@ -735,14 +1379,21 @@ class TestImportUseCase(unittest.TestCase):
         fake_session.connect.return_value = AppResult.success(Unit())
         fake_session.schema_exists.return_value = AppResult.success(True)
 
+        entity_repo = MagicMock()
+        layer_repo = MagicMock()
+        fake_session._get_entity_repository.return_value = AppResult.success(entity_repo)
+        fake_session._get_layer_repository.return_value = AppResult.success(layer_repo)
+
         with patch("src.application.use_cases.import_use_case.inject.instance", return_value=fake_session):
             result, report = self.use_case.execute(self.connection, [config])
 
         self.assertTrue(result.is_success, msg=report)
-        self.dxf_writer.save_selected_by_handles.assert_called_once()
-        call_kwargs = self.dxf_writer.save_selected_by_handles.call_args.kwargs
+        self.dxf_writer.serialize_selected.assert_called_once()
+        call_kwargs = self.dxf_writer.serialize_selected.call_args.kwargs
         self.assertEqual(call_kwargs["selected_handles"], {"ABCD12"})
 
+        entity_repo.ensure_spatial_index.assert_called_once()
+
     def test_execute_fails_when_layer_schema_not_found(self):
         """
         Проверяет обработку отсутствующей schema для слоев.
@@ -890,6 +1541,536 @@ class TestExportUseCase(unittest.TestCase):
         self.assertTrue(result.is_fail)
         self.assertIn("not found", report)
 
+    def test_execute_tables_pushes_filters_to_repository(self):
+        """Фильтры по области, типам и слоям передаются в запрос к БД."""
+        document = DXFDocument(id=uuid4(), filename="tables.dxf", filepath="")
+        kept_layer = DXFLayer.create(document_id=document.id, name="roads", schema_name="layer_schema", table_name="roads")
+        skipped_layer = DXFLayer.create(document_id=document.id, name="text", schema_name="layer_schema", table_name="text")
+
+        doc_repo = MagicMock()
+        doc_repo.get_by_filename.return_value = AppResult.success(document)
+        layer_repo = MagicMock()
+        layer_repo.get_all_by_document_id.return_value = AppResult.success([kept_layer, skipped_layer])
+        entity_repo = MagicMock()
+        entity_repo.get_definition_entities.return_value = AppResult.success([])
+        entity_repo.iter_batches.side_effect = _entity_batches([MagicMock()])
+
+        fake_session = MagicMock()
+        fake_session.connect.return_value = AppResult.success(Unit())
+        fake_session.schema_exists.return_value = AppResult.success(True)
+        fake_session._get_document_repository.return_value = AppResult.success(doc_repo)
+        fake_session._get_layer_repository.return_value = AppResult.success(layer_repo)
+        fake_session._get_entity_repository.return_value = AppResult.success(entity_repo)
+
+        self.writer.write_reconstructed_batches.side_effect = _write_reconstructed_stub
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = ExportConfigDTO(
+                filename="tables.dxf",
+                export_mode=ExportMode.TABLES,
+                output_path=os.path.join(tmp_dir, "tables.dxf"),
+                extent_bbox=(0.0, 0.0, 10.0, 5.0),
+                entity_types=["line"],
+                layer_names=["roads"],
+            )
+
+            with patch("src.application.use_cases.export_use_case.inject.instance", return_value=fake_session):
+                result, _ = self.use_case.execute(self.connection, [config])
+
+        self.assertTrue(result.is_success)
+        entity_repo.iter_batches.assert_called_once_with(
+            batch_size=ExportUseCase.ENTITY_BATCH_SIZE,
+            extent_wkt="POLYGON((0.0 0.0, 10.0 0.0, 10.0 5.0, 0.0 5.0, 0.0 0.0))",
+            entity_types=["line"],
+            srid=0,
+        )
+        fake_session._get_entity_repository.assert_called_once_with("layer_schema", "roads")
+        # Таблица без GiST-индекса получает его при первом экспорте с фильтром по области
+        entity_repo.ensure_spatial_index.assert_called_once()
+        fake_session.commit.assert_called_once()
+
+    def test_export_cache_misses_after_out_of_band_table_update(self):
+        """Повтор экспорта берется из кэша, пока PostgreSQL не сообщит о правке таблицы слоя (xmin)."""
+        document = DXFDocument(id=uuid4(), filename="cached.dxf", filepath="")
+        layer = DXFLayer.create(document_id=document.id, name="roads", schema_name="layer_schema", table_name="roads")
+        table_state = {"row_count": 3, "max_xmin": 700}
+
+        def execute_query(query, params=None):
+            if isinstance(query, sql.Composable):
+                return AppResult.success([dict(schema_name="layer_schema", table_name="roads", **table_state)])
+            if "SELECT DISTINCT schema_name, table_name" in query:
+                return AppResult.success([{"schema_name": "layer_schema", "table_name": "roads"}])
+            return AppResult.success([])
+
+        connection = MagicMock()
+        connection.execute_query.side_effect = execute_query
+        layer_repo = PostGISLayerRepository(connection, "file_schema", "layers")
+        doc_repo = MagicMock()
+        doc_repo.get_by_filename.return_value = AppResult.success(document)
+        entity_repo = MagicMock()
+        entity_repo.get_definition_entities.return_value = AppResult.success([])
+        entity_repo.iter_batches.side_effect = _entity_batches([MagicMock()])
+
+        fake_session = MagicMock()
+        fake_session.connect.return_value = AppResult.success(Unit())
+        fake_session.schema_exists.return_value = AppResult.success(True)
+        fake_session._get_document_repository.return_value = AppResult.success(doc_repo)
+        fake_session._get_layer_repository.return_value = AppResult.success(layer_repo)
+        fake_session._get_entity_repository.return_value = AppResult.success(entity_repo)
+        self.writer.write_reconstructed_batches.side_effect = _write_reconstructed_stub
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.object(layer_repo, "get_all_by_document_id", return_value=AppResult.success([layer])), \
+                patch("src.application.use_cases.export_use_case.inject.instance", return_value=fake_session):
+            use_case = ExportUseCase(
+                self.writer,
+                self.logger,
+                DiskLRUCache(os.path.join(tmp_dir, "cache"), 1024 * 1024, suffix=".dxf"),
+            )
+            out_path = os.path.join(tmp_dir, "out.dxf")
+            config = ExportConfigDTO(filename="cached.dxf", export_mode=ExportMode.TABLES, output_path=out_path)
+
+            use_case.execute(self.connection, [config])
+            _, cached_report = use_case.execute(self.connection, [config])
+            self.assertIn("export cache", cached_report)
+            self.assertEqual(self.writer.write_reconstructed_batches.call_count, 1)
+
+            # UPDATE из QGIS/SQL: число строк то же, но новый xmin
+            table_state["max_xmin"] = 815
+            result, report = use_case.execute(self.connection, [config])
+
+        self.assertTrue(result.is_success)
+        self.assertNotIn("export cache", report)
+        self.assertEqual(self.writer.write_reconstructed_batches.call_count, 2)
+        self.assertEqual(entity_repo.iter_batches.call_count, 2)
+
+
+class TestPreviewCacheService(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.reader = MagicMock()
+        self.reader.render_svg_preview.side_effect = lambda path, handles, content: AppResult.success(
+            "<svg>" + "x" * 400 + "</svg>"
+        )
+        self.connection = ConnectionConfigDTO(
+            db_type="postgis",
+            name="local",
+            host="localhost",
+            port="5432",
+            database="dxf",
+            username="postgres",
+            password="secret",
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _service(self, max_bytes: int = 1024 * 1024, svg_max_bytes: int = PreviewCacheService.SVG_MAX_BYTES) -> PreviewCacheService:
+        root = self.tmp_dir.name
+        return PreviewCacheService(
+            DiskLRUCache(os.path.join(root, "previews"), max_bytes, suffix=".svg"),
+            DiskLRUCache(os.path.join(root, "raster"), max_bytes, suffix=".png"),
+            DiskLRUCache(os.path.join(root, "links"), 1024 * 1024, suffix=".link"),
+            DiskLRUCache(os.path.join(root, "thumbs"), 1024 * 1024, suffix=".png"),
+            self.reader,
+            _DummyLogger(),
+            svg_max_bytes=svg_max_bytes,
+        )
+
+    def test_file_preview_reads_content_from_path(self):
+        """Превью файла по пути совпадает с превью тех же байтов."""
+        service = self._service()
+        content = b"0\nSECTION\n0\nEOF\n"
+        path = os.path.join(self.tmp_dir.name, "open.dxf")
+        with open(path, "wb") as dxf_file:
+            dxf_file.write(content)
+
+        result = service.get_or_render_file(path)
+
+        self.assertTrue(result.is_success)
+        self.assertEqual(self.reader.render_svg_preview.call_args.args[0], path)
+        self.assertIsNone(self.reader.render_svg_preview.call_args.args[2])
+        self.assertEqual(service.get_or_render(content).value, result.value)
+        self.assertTrue(service.get_or_render_file(os.path.join(self.tmp_dir.name, "missing.dxf")).is_fail)
+
+    def test_previews_are_addressed_by_content(self):
+        """Превью адресуются хэшем содержимого, измененный файл получает новое."""
+        service = self._service()
+
+        first = service.get_or_render(b"0\nSECTION\n0\nEOF\n")
+        again = service.get_or_render(b"0\nSECTION\n0\nEOF\n")
+        other = service.get_or_render(b"0\nSECTION\n999\nchanged\n0\nEOF\n")
+
+        self.assertTrue(first.is_success and again.is_success and other.is_success)
+        self.assertEqual(first.value, again.value)
+        self.assertNotEqual(first.value, other.value)
+        self.assertEqual(self.reader.render_svg_preview.call_count, 2)
+
+        content = b"0\nSECTION\n0\nEOF\n"
+        service.link_document(self.connection, "file_schema", "plan.dxf", content)
+        self.assertEqual(
+            service.find_document_preview(self.connection, "file_schema", "plan.dxf", len(content)),
+            first.value,
+        )
+        self.assertIsNone(service.find_document_preview(self.connection, "file_schema", "plan.dxf", len(content) + 1))
+        self.assertIsNone(service.find_document_preview(self.connection, "other_schema", "plan.dxf"))
+
+        service.unlink_document(self.connection, "file_schema", "plan.dxf")
+        self.assertIsNone(service.find_document_preview(self.connection, "file_schema", "plan.dxf"))
+
+    def test_previews_respect_disk_quota(self):
+        """Кэш превью не превышает квоту на диске."""
+        service = self._service(max_bytes=1000)
+
+        paths = []
+        for index in range(5):
+            result = service.get_or_render(f"0\nSECTION\n999\n{index}\n0\nEOF\n".encode("utf-8"))
+            self.assertTrue(result.is_success)
+            paths.append(result.value)
+
+        remaining = [path for path in paths if os.path.exists(path)]
+        self.assertIn(paths[-1], remaining)
+        self.assertLess(len(remaining), len(paths))
+        self.assertLessEqual(sum(os.path.getsize(path) for path in remaining), 1000)
+
+
+    def test_large_drawings_get_raster_preview(self):
+        """Большие DXF получают PNG-превью, малые — SVG."""
+        self.reader.render_png_preview.return_value = AppResult.success(b"\x89PNG fake")
+        service = self._service(svg_max_bytes=32)
+
+        large = b"0\nSECTION\n999\n" + b"x" * 64 + b"\n0\nEOF\n"
+        raster = service.get_or_render(large)
+        vector = service.get_or_render(b"0\nEOF\n")
+
+        self.assertTrue(raster.is_success and vector.is_success)
+        self.assertTrue(raster.value.endswith(".png"))
+        self.assertTrue(vector.value.endswith(".svg"))
+        self.assertEqual(self.reader.render_png_preview.call_count, 1)
+        self.assertEqual(self.reader.render_svg_preview.call_count, 1)
+
+        service.link_document(self.connection, "file_schema", "big.dxf", large)
+        self.assertEqual(service.find_document_preview(self.connection, "file_schema", "big.dxf", len(large)), raster.value)
+
+
+class TestEzdxfDrawingStore(unittest.TestCase):
+    def setUp(self):
+        if not os.path.exists(EXAMPLE_1):
+            self.skipTest("Fixture ex1.dxf not found")
+
+    def test_selected_subset_is_serialized_from_open_drawing(self):
+        """Выбранные сущности сериализуются из уже разобранного документа."""
+        import ezdxf
+
+        store = EzdxfDrawingStore()
+        reader = DXFReader(store)
+        writer = DXFWriter(store)
+        self.assertTrue(reader.open(EXAMPLE_1).is_success)
+
+        drawing = store.get(EXAMPLE_1)
+        self.assertIsNotNone(drawing)
+        total = len(drawing.modelspace())
+        handles = {entity.dxf.handle for entity in list(drawing.modelspace())[:3]}
+
+        result = writer.serialize_selected(EXAMPLE_1, handles)
+
+        self.assertTrue(result.is_success, msg=result.error if result.is_fail else "")
+        subset = ezdxf.read(io.StringIO(result.value.decode(drawing.output_encoding)))
+        self.assertEqual({entity.dxf.handle for entity in subset.modelspace()}, handles)
+        self.assertEqual(len(store.get(EXAMPLE_1).modelspace()), total)
+        self.assertTrue(reader.render_svg_preview(EXAMPLE_1, handles).is_success)
+
+        reader.release(EXAMPLE_1)
+        self.assertIsNone(store.get(EXAMPLE_1))
+        with open(EXAMPLE_1, "rb") as source:
+            content = source.read()
+        detached = writer.serialize_selected("", handles, content)
+        self.assertTrue(detached.is_success)
+        detached_subset = ezdxf.read(io.StringIO(detached.value.decode(drawing.output_encoding)))
+        self.assertEqual({entity.dxf.handle for entity in detached_subset.modelspace()}, handles)
+
+
+class TestEntityTagFilter(unittest.TestCase):
+    def test_selected_entities_are_copied_at_tag_level(self):
+        """Выбранные сущности копируются на уровне тегов без разбора ezdxf."""
+        import ezdxf
+
+        source = ezdxf.new()
+        msp = source.modelspace()
+        source.blocks.new("MARK").add_attdef("TAG", (0, 0))
+        kept_insert = msp.add_blockref("MARK", (0, 0))
+        kept_insert.add_attrib("TAG", "kept", (0, 0))
+        dropped_insert = msp.add_blockref("MARK", (5, 0))
+        dropped_insert.add_attrib("TAG", "dropped", (5, 0))
+        kept_polyline = msp.add_polyline3d([(0, 0, 0), (1, 1, 1), (2, 0, 0)])
+        dropped_line = msp.add_line((0, 0), (1, 1))
+        dropped_line.new_extension_dict().add_xrecord("NOTE")
+        dropped_xdict = dropped_line.get_extension_dict().dictionary.dxf.handle
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_path = os.path.join(tmp_dir, "source.dxf")
+            out_path = os.path.join(tmp_dir, "selected.dxf")
+            source.saveas(source_path)
+
+            result = DXFWriter().save_selected_by_handles(
+                source_path,
+                out_path,
+                {kept_insert.dxf.handle, kept_polyline.dxf.handle},
+            )
+
+            self.assertTrue(result.is_success, msg=result.error if result.is_fail else "")
+            self.assertEqual(result.value, 2)
+            selected = ezdxf.readfile(out_path)
+
+        entities = list(selected.modelspace())
+        self.assertEqual([entity.dxf.handle for entity in entities], [kept_insert.dxf.handle, kept_polyline.dxf.handle])
+        self.assertEqual([attrib.dxf.text for attrib in entities[0].attribs], ["kept"])
+        self.assertEqual(len(entities[1].vertices), 3)
+        self.assertNotIn(dropped_xdict, selected.entitydb)
+        self.assertEqual(selected.audit().fixes, [])
+
+
+class TestDXFWriterReconstruction(unittest.TestCase):
+    def test_reconstruction_streams_to_destination(self):
+        """Восстановленный DXF пишется в поток назначения без временных файлов."""
+        if not os.path.exists(EXAMPLE_1):
+            self.skipTest("Fixture ex1.dxf not found")
+        import ezdxf
+
+        open_result = DXFReader().open(EXAMPLE_1)
+        self.assertTrue(open_result.is_success)
+        entities = [
+            entity
+            for layer in open_result.value.layers.values()
+            for entity in layer.entities.values()
+        ]
+        writer = DXFWriter()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_path = os.path.join(tmp_dir, "streamed.dxf")
+            with open(out_path, "wb") as out_file:
+                stream_result = writer.write_reconstructed(entities, out_file)
+            self.assertTrue(stream_result.is_success, msg=stream_result.error if stream_result.is_fail else "")
+            self.assertIn("Reconstruction summary", stream_result.value)
+            streamed_count = len(ezdxf.readfile(out_path).modelspace())
+
+        bytes_result = writer.reconstruct_from_entities(entities)
+        self.assertTrue(bytes_result.is_success)
+        content, report = bytes_result.value
+        in_memory = ezdxf.read(io.StringIO(content.decode("utf-8")))
+        self.assertGreater(streamed_count, 0)
+        self.assertEqual(len(in_memory.modelspace()), streamed_count)
+
+    def test_batched_reconstruction_matches_single_pass(self):
+        """Пачки читаются один раз, HEADER идет до сущностей, а $HANDSEED покрывает все handle."""
+        if not os.path.exists(EXAMPLE_1):
+            self.skipTest("Fixture ex1.dxf not found")
+        import ezdxf
+        from collections import Counter
+
+        open_result = DXFReader().open(EXAMPLE_1)
+        self.assertTrue(open_result.is_success)
+        entities = [
+            entity
+            for layer in open_result.value.layers.values()
+            for entity in layer.entities.values()
+        ]
+        writer = DXFWriter()
+        calls = []
+
+        def batches():
+            for i in range(0, len(entities), 40):
+                calls.append(i)
+                yield entities[i:i + 40]
+
+        streamed = io.BytesIO()
+        result = writer.write_reconstructed_batches(entities, batches(), streamed)
+        self.assertTrue(result.is_success, msg=result.error if result.is_fail else "")
+        self.assertEqual(len(calls), (len(entities) + 39) // 40)
+        self.assertLess(len(result.value.splitlines()), 10)
+
+        single = io.BytesIO()
+        self.assertTrue(writer.write_reconstructed(entities, single).is_success)
+
+        batched_doc = ezdxf.read(io.StringIO(streamed.getvalue().decode("utf-8")))
+        single_doc = ezdxf.read(io.StringIO(single.getvalue().decode("utf-8")))
+        self.assertEqual(
+            Counter(entity.dxftype() for entity in batched_doc.modelspace()),
+            Counter(entity.dxftype() for entity in single_doc.modelspace()),
+        )
+        self.assertEqual(
+            sorted(layer.dxf.name for layer in batched_doc.layers),
+            sorted(layer.dxf.name for layer in single_doc.layers),
+        )
+        max_handle = max(int(entity.dxf.handle, 16) for entity in batched_doc.entitydb.values())
+        self.assertGreater(int(batched_doc.header["$HANDSEED"], 16), max_handle)
+
+    def test_empty_filtered_export_is_a_valid_dxf(self):
+        """Фильтр, не нашедший сущностей, дает корректный DXF без сущностей, а не ошибку."""
+        import ezdxf
+
+        streamed = io.BytesIO()
+        result = DXFWriter().write_reconstructed_batches([], iter([]), streamed)
+
+        self.assertTrue(result.is_success, msg=result.error if result.is_fail else "")
+        self.assertIn("0 entity(ies)", result.value)
+        drawing = ezdxf.read(io.StringIO(streamed.getvalue().decode("utf-8")))
+        self.assertEqual(len(drawing.modelspace()), 0)
+
+
+class TestRasterPreviewRenderer(unittest.TestCase):
+    def setUp(self):
+        if not os.path.exists(EXAMPLE_1):
+            self.skipTest("Fixture ex1.dxf not found")
+
+    def test_small_primitives_are_skipped_at_low_resolution(self):
+        """Примитивы меньше пикселя пропускаются при малом разрешении."""
+        import ezdxf
+
+        drawing = ezdxf.readfile(EXAMPLE_1)
+        visible = {}
+        for size_px in (64, 2048):
+            renderer = RasterPreviewRenderer(size_px)
+            player = renderer.record(drawing, time.perf_counter() + 60)
+            width, height = renderer.fit(player)
+            visible[size_px] = sum(1 for _ in renderer.visible_records(player, time.perf_counter() + 60))
+
+            self.assertLessEqual(max(width, height), size_px)
+            self.assertEqual(renderer.stats.drawn + renderer.stats.skipped_small, renderer.stats.records)
+
+        self.assertLess(visible[64], visible[2048])
+
+    def test_time_budget_stops_recording(self):
+        """Отрисовка останавливается по бюджету времени."""
+        import ezdxf
+
+        drawing = ezdxf.readfile(EXAMPLE_1)
+        renderer = RasterPreviewRenderer(512)
+        renderer.record(drawing, time.perf_counter() - 1)
+
+        self.assertTrue(renderer.stats.budget_exceeded)
+        self.assertGreater(renderer.stats.skipped_entities, 0)
+        self.assertEqual(renderer.stats.records, 0)
+
+
+class TestPostGISEntityRepositoryBulkRead(unittest.TestCase):
+    def test_iter_batches_decodes_filtered_copy_output(self):
+        """Слой читается через COPY ... TO STDOUT с фильтрами в WHERE и разбирается пачками."""
+        ids = [uuid4() for _ in range(3)]
+        csv_rows = "".join(
+            f'{entity_id},"line\n{index}","{{""entity_type"": ""LINE"", ""attributes"": {{""layer"": ""A, B""}}}}"\n'
+            for index, entity_id in enumerate(ids)
+        ).encode("utf-8")
+
+        cursor = MagicMock()
+        cursor.mogrify.side_effect = lambda query, params: query.encode("utf-8")
+        cursor.copy_expert.side_effect = lambda sql, buffer: buffer.write(csv_rows)
+        native = MagicMock()
+        native.cursor.return_value.__enter__.return_value = cursor
+        connection = MagicMock()
+        connection.get_connection.return_value = native
+        repo = PostGISEntityRepository(connection, "layer_schema", "roads")
+        connection.execute_query.reset_mock()
+        connection.execute_query.return_value = AppResult.success([{"srid": 4326}])
+
+        result = repo.iter_batches(batch_size=2, extent_wkt="POINT(0 0)", entity_types=["line"], srid=3857)
+        batches = list(result.value)
+
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual([entity.id for batch in batches for entity in batch], ids)
+        self.assertEqual(batches[1][0].name, "line\n2")
+        self.assertEqual(batches[0][0].attributes["layer"], "A, B")
+        copy_sql = cursor.copy_expert.call_args.args[0]
+        self.assertTrue(copy_sql.startswith("COPY (SELECT id, name, data"))
+        self.assertIn("ST_Intersects", copy_sql)
+        self.assertIn("ST_Transform", copy_sql)
+        self.assertEqual(cursor.mogrify.call_args.args[1]["entity_types"], ["LINE"])
+        self.assertEqual(cursor.mogrify.call_args.args[1]["table_srid"], 4326)
+        # Кроме COPY выполняется только чтение SRID таблицы
+        connection.execute_query.assert_called_once()
+        self.assertIn("ST_SRID(geometry)", connection.execute_query.call_args.args[0])
+
+    def test_spatial_index_is_created_once_under_savepoint(self):
+        """Конструктор не создает индекс; ensure_spatial_index создает его под точкой сохранения и только если его нет."""
+        connection = MagicMock()
+        connection.execute_query.return_value = AppResult.success([])
+        connection.execute_queries.return_value = AppResult.success(Unit())
+        repo = PostGISEntityRepository(connection, "layer_schema", "roads")
+
+        executed = [call.args[0] for call in connection.execute_query.call_args_list]
+        self.assertFalse(any("CREATE INDEX" in query for query in executed))
+        connection.commit.reset_mock()
+
+        result = repo.ensure_spatial_index()
+
+        self.assertTrue(result.is_success)
+        queries = [query for query, _ in connection.execute_queries.call_args[0][0]]
+        self.assertEqual(queries[0], "SAVEPOINT spatial_index")
+        self.assertIn("USING GIST (geometry)", queries[1])
+        connection.commit.assert_not_called()
+
+        connection.execute_queries.reset_mock()
+        connection.execute_query.return_value = AppResult.success([{"index_exists": True}])
+        self.assertTrue(repo.ensure_spatial_index().is_success)
+        connection.execute_queries.assert_not_called()
+
+    def test_extent_uses_table_srid_when_filter_srid_is_unset(self):
+        """Область без SRID получает SRID геометрий таблицы, а не 0."""
+        connection = MagicMock()
+        connection.execute_query.return_value = AppResult.success([])
+        repo = PostGISEntityRepository(connection, "layer_schema", "roads")
+        connection.execute_query.reset_mock()
+        connection.execute_query.return_value = AppResult.success([{"srid": 3857}])
+
+        where, params = repo._filter_clause("POINT(0 0)", None, 0)
+        repo._filter_clause("POINT(0 0)", None, 0)
+
+        self.assertIn("ST_GeomFromText(%(extent)s, %(table_srid)s)", where)
+        self.assertNotIn("ST_Transform", where)
+        self.assertEqual(params["table_srid"], 3857)
+        connection.execute_query.assert_called_once()
+
+
+class TestPostGISDocumentLink(unittest.TestCase):
+    def test_foreign_key_failure_keeps_caller_transaction(self):
+        """Ошибка создания FK откатывает только точку сохранения, идентификаторы экранируются."""
+        connection = MagicMock()
+        connection.execute_query.return_value = AppResult.success([])
+        connection.execute_queries.return_value = AppResult.fail("permission denied")
+        repo = PostGISLayerRepository(connection, "files schema", "layers")
+        connection.rollback.reset_mock()
+
+        result = repo.link_to_document_table('my"files')
+
+        self.assertTrue(result.is_fail)
+        orphans_query = connection.execute_queries.call_args[0][0][1][0]
+        self.assertIn(sql.Identifier("files schema", 'my"files'), orphans_query.seq)
+        connection.execute_query.assert_called_with("ROLLBACK TO SAVEPOINT document_link")
+        connection.rollback.assert_not_called()
+
+    def test_orphans_are_deleted_before_constraint_is_validated(self):
+        """Осиротевшие строки удаляются, затем ключ проверяется; проверенный ключ не трогается."""
+        connection = MagicMock()
+        connection.execute_query.return_value = AppResult.success([])
+        connection.execute_queries.return_value = AppResult.success(Unit())
+        repo = PostGISLayerRepository(connection, "file_schema", "layers")
+        self.assertTrue(repo.link_to_document_table("files").is_success)
+        statements = [repr(query) for query, _ in connection.execute_queries.call_args[0][0]]
+        self.assertIn("DELETE FROM", statements[1])
+        self.assertIn("NOT VALID", statements[2])
+        self.assertIn("VALIDATE CONSTRAINT", statements[3])
+
+        connection.execute_queries.reset_mock()
+        connection.execute_query.return_value = AppResult.success([{"convalidated": False}])
+        self.assertTrue(repo.link_to_document_table("files").is_success)
+        statements = [query for query, _ in connection.execute_queries.call_args[0][0]]
+        self.assertEqual(len(statements), 4)
+
+        connection.execute_queries.reset_mock()
+        connection.execute_query.return_value = AppResult.success([{"convalidated": True}])
+        self.assertTrue(repo.link_to_document_table("files").is_success)
+        connection.execute_queries.assert_not_called()
+
 
 class TestSaveSelectedToFileUseCase(unittest.TestCase):
     def setUp(self):